@@ -0,0 +1,214 @@
+"""End-to-end read -> write throughput and latency, without hardware.
+
+Drives FakeIMU as fast as possible into DataWriter with a stub MQTT client,
+once per sink configuration.
+
+Run with `python -m benchmarks.pipeline [-n SAMPLES] [--json]`
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from imu import DataWriter as data_writer_module
+from imu.DataWriter import DataWriter
+from imu.FakeIMU import FakeIMU
+from imu.IMUBatch import IMUBatch
+from imu.MQTTPublisher import MQTTOptions
+from imu.RecordingSink import RecordingOptions
+
+SAMPLE_FILE = Path(__file__).resolve().parents[1] / "data" / "sample_data.csv"
+
+
+class StubClient:
+    """Accepts every publish without doing any I/O"""
+
+    IMU = "imu"
+
+    def __init__(self, *args, **kwargs):
+        self.published = 0
+        self.bytes = 0
+
+    def publish(self, payload: str):
+        self.published += 1
+        self.bytes += len(payload)
+
+    def disconnect(self):
+        return None
+
+
+class NoBroker(StubClient):
+    def __init__(self, *args, **kwargs):
+        raise ConnectionError("MQTT disabled for this configuration")
+
+
+# name: (mqtt client, DataWriter options, samples per read/write call)
+CONFIGS = {
+    "csv": (NoBroker, {}, 1),
+    "csv+mqtt": (StubClient, {}, 1),
+    "csv+mqtt-batch-delta": (
+        StubClient,
+        {"mqtt": MQTTOptions(batch_size=100, encoding="delta")},
+        1,
+    ),
+    "csv+async-mqtt": (StubClient, {"mqtt": MQTTOptions(asynchronous=True)}, 1),
+    "binary+mqtt": (StubClient, {"recording": RecordingOptions("binary")}, 1),
+    "csv+mqtt blocks": (StubClient, {}, 100),
+    "binary blocks": (NoBroker, {"recording": RecordingOptions("binary")}, 100),
+}
+
+
+def percentiles(values_ns: np.ndarray) -> dict[str, float]:
+    if not len(values_ns):
+        return {"p50_us": 0.0, "p99_us": 0.0, "max_us": 0.0}
+
+    p50, p99 = np.percentile(values_ns, (50, 99)) / 1e3
+    return {"p50_us": p50, "p99_us": p99, "max_us": values_ns.max() / 1e3}
+
+
+def run(client, options: dict, block: int, n: int, out_dir: str) -> dict:
+    data_writer_module.Client = client
+    imu = FakeIMU(sample_filename=str(SAMPLE_FILE))
+    calls = n // block
+    read_ns = np.zeros(calls, dtype=np.int64)
+    write_ns = np.zeros(calls, dtype=np.int64)
+    latency_ms = np.zeros(calls * block, dtype=np.int64)
+    batch = IMUBatch(block)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        writer = DataWriter(csv_fname=os.path.join(out_dir, "bench.csv"), **options)
+        writer.__enter__()
+
+    alloc_baseline = 0
+    if tracemalloc.is_tracing():
+        # Only count what the loop allocates, not the loaded recording
+        tracemalloc.reset_peak()
+        alloc_baseline = tracemalloc.get_traced_memory()[0]
+
+    gc_before = sum(stat["collections"] for stat in gc.get_stats())
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter_ns()
+    for i in range(calls):
+        t0 = time.perf_counter_ns()
+        if block == 1:
+            data = imu.read_data()
+        else:
+            batch.clear()
+            imu.read_batch(block, out=batch)
+        t1 = time.perf_counter_ns()
+        if block == 1:
+            writer.write_data(data)
+            latency_ms[i] = data.recorded_at_time_ms - data.capture_time_ms
+        else:
+            writer.write_batch(batch)
+            latency_ms[i * block : (i + 1) * block] = batch.column(
+                "recorded_at_time_ms"
+            ) - batch.column("capture_time_ms")
+        t2 = time.perf_counter_ns()
+        read_ns[i] = t1 - t0
+        write_ns[i] = t2 - t1
+
+    # Draining buffered rows and queued messages is part of the cost
+    t0 = time.perf_counter_ns()
+    writer.__exit__(None, None, None)
+    close_ns = time.perf_counter_ns() - t0
+    alloc_peak = tracemalloc.get_traced_memory()[1] - alloc_baseline
+    wall_s = (time.perf_counter_ns() - wall_start) / 1e9
+    cpu_s = time.process_time() - cpu_start
+    gc_collections = sum(stat["collections"] for stat in gc.get_stats()) - gc_before
+
+    return {
+        "samples": calls * block,
+        "samples_per_s": calls * block / wall_s,
+        "cpu_percent": 100 * cpu_s / wall_s,
+        "read": percentiles(read_ns / block),
+        "write": percentiles(write_ns / block),
+        "close_ms": close_ns / 1e6,
+        "capture_to_recorded_ms": {
+            "p50": float(np.percentile(latency_ms, 50)),
+            "p99": float(np.percentile(latency_ms, 99)),
+            "max": int(latency_ms.max()),
+        },
+        "gc_collections": gc_collections,
+        "alloc_peak_bytes": alloc_peak,
+    }
+
+
+def allocations(client, options: dict, block: int, n: int, out_dir: str) -> dict:
+    """Separate pass under tracemalloc, which is too slow to time with"""
+    tracemalloc.start()
+    try:
+        peak = run(client, options, block, n, out_dir)["alloc_peak_bytes"]
+    finally:
+        tracemalloc.stop()
+
+    return {"peak_kib": peak / 1024, "peak_bytes_per_sample": peak / n}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--samples", type=int, default=20_000)
+    parser.add_argument(
+        "--alloc-samples",
+        type=int,
+        default=2_000,
+        help="Samples per configuration for the allocation pass",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    original_client = data_writer_module.Client
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as out_dir:
+            for name, (client, options, block) in CONFIGS.items():
+                result = run(client, options, block, args.samples, out_dir)
+                del result["alloc_peak_bytes"]
+                result["alloc"] = allocations(
+                    client, options, block, args.alloc_samples, out_dir
+                )
+                results[name] = result
+    finally:
+        data_writer_module.Client = original_client
+
+    if args.json:
+        print(
+            json.dumps(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "samples": args.samples,
+                    "results": results,
+                },
+                indent=2,
+            )
+        )
+        return
+
+    print(
+        f"{'config':<22} {'samples/s':>10} {'cpu%':>5} "
+        + f"{'read p50/p99/max us':>22} {'write p50/p99/max us':>24} "
+        + f"{'lat p99 ms':>10} {'peak KiB':>9}"
+    )
+    for name, r in results.items():
+        read, write = r["read"], r["write"]
+        print(
+            f"{name:<22} {r['samples_per_s']:>10.0f} {r['cpu_percent']:>5.0f} "
+            + f"{read['p50_us']:>6.1f}/{read['p99_us']:>6.1f}/{read['max_us']:>7.0f} "
+            + f"{write['p50_us']:>7.1f}/{write['p99_us']:>7.1f}/{write['max_us']:>8.0f} "
+            + f"{r['capture_to_recorded_ms']['p99']:>10.1f} {r['alloc']['peak_kib']:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
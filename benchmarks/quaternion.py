@@ -0,0 +1,65 @@
+"""Compare quaternion -> yaw/pitch/roll conversion paths.
+
+Run with `python -m benchmarks.quaternion`
+"""
+
+import timeit
+
+import numpy as np
+
+from imu.BaseIMU import BaseIMU
+
+
+class _BenchIMU(BaseIMU):
+    def read_data(self):
+        raise NotImplementedError
+
+
+def legacy_quat_to_ypr(q):
+    """The original per-quaternion NumPy conversion, kept as the baseline"""
+    w, x, y, z = q
+    magnitude = np.sqrt(w**2 + x**2 + y**2 + z**2)
+    w, x, y, z = w / magnitude, x / magnitude, y / magnitude, z / magnitude
+
+    yaw = np.degrees(np.arctan2(2.0 * (y * z + w * x), 1 - 2 * (x * x + y * y)))
+    pitch = np.degrees(np.arcsin(2.0 * (w * y - x * z)))
+    roll = np.degrees(np.arctan2(2.0 * (x * y + w * z), 1 - 2 * (y * y + z * z)))
+
+    return tuple(np.round((yaw, pitch, roll), decimals=3))
+
+
+def bench(n: int) -> dict[str, float]:
+    """Returns the time per quaternion in microseconds for each conversion path"""
+    imu = _BenchIMU()
+    quats = np.random.default_rng(0).normal(size=(n, 4))
+    quat_tuples = [tuple(q) for q in quats.tolist()]
+
+    paths = {
+        "legacy numpy scalar": lambda: [legacy_quat_to_ypr(q) for q in quat_tuples],
+        "math scalar": lambda: [imu._tared_ypr(q) for q in quat_tuples],
+        "numpy batch": lambda: imu._quat_to_ypr_batch(quats),
+    }
+
+    results = {}
+    for name, fn in paths.items():
+        timer = timeit.Timer(fn)
+        # Large inputs already run long enough to time a single call
+        number = timer.autorange()[0] if n < 1000 else 1
+        best = min(timer.repeat(repeat=3, number=number)) / number
+        results[name] = best / n * 1e6
+
+    return results
+
+
+def main():
+    sizes = (1, 100, 100_000)
+    print(f"{'quaternions':>12} {'path':<20} {'us/quat':>10} {'speedup':>8}")
+    for n in sizes:
+        results = bench(n)
+        baseline = results["legacy numpy scalar"]
+        for name, us in results.items():
+            print(f"{n:>12} {name:<20} {us:>10.3f} {baseline / us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
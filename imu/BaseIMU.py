@@ -1,8 +1,10 @@
+import math
 from abc import ABC, abstractmethod
 from threading import Lock
 
 import numpy as np
 
+from .IMUBatch import IMUBatch
 from .IMUData import IMUData
 
 
@@ -11,24 +13,65 @@ class BaseIMU(ABC):
         self.__sample_counter = counter_start
         self.__counter_lock = Lock()
 
+        # Tare reference, subtracted from yaw/pitch/roll (degrees)
+        self._yaw_offset = 0.0
+        self._pitch_offset = 0.0
+        self._roll_offset = 0.0
+
     @abstractmethod
     def read_data(self) -> IMUData:
         pass
 
+    def read_into(self, batch: IMUBatch) -> None:
+        """
+        Append one sample to `batch`.
+        Implementations can override this to skip building an IMUData.
+        """
+        batch.append(self.read_data())
+
+    def read_batch(self, n: int, out: IMUBatch | None = None) -> IMUBatch:
+        """
+        Read `n` samples into `out` (a new batch if not given) and return it.
+        `out` is appended to, so clear it first to reuse its buffer.
+        """
+        batch = out if out is not None else IMUBatch(n)
+        for _ in range(n):
+            self.read_into(batch)
+
+        return batch
+
+    def read_available(self, out: IMUBatch | None = None) -> IMUBatch:
+        """
+        Append every sample the IMU produced since the last call to `out`
+        (a new batch if not given) and return it.
+        IMUs without a FIFO only have their latest sample to give.
+        """
+        return self.read_batch(1, out)
+
     def _next_counter(self) -> int:
         with self.__counter_lock:
             counter = self.__sample_counter
             self.__sample_counter += 1
             return counter
 
+    @staticmethod
+    def _wrap_angle(deg):
+        return (deg + 180) % 360 - 180
+
+    def _next_counters(self, n: int) -> range:
+        with self.__counter_lock:
+            counters = range(self.__sample_counter, self.__sample_counter + n)
+            self.__sample_counter += n
+            return counters
+
     def _normalize_quaternion(self, q: tuple[float, float, float, float]):
-            w, x, y, z = q
-            magnitude = np.sqrt(w**2 + x**2 + y**2 + z**2)
+        w, x, y, z = q
+        magnitude = math.sqrt(w * w + x * x + y * y + z * z)
 
-            if magnitude == 0:
-                raise ValueError("Cannot normalize a zero quaternion.")
+        if magnitude == 0:
+            raise ValueError("Cannot normalize a zero quaternion.")
 
-            return w / magnitude, x / magnitude, y / magnitude, z / magnitude
+        return w / magnitude, x / magnitude, y / magnitude, z / magnitude
 
     # @cache
     def _quat_to_ypr(
@@ -37,19 +80,60 @@ class BaseIMU(ABC):
         """
         Internal function to convert the quaternion rotation to yaw, pitch, and roll
         quat: quaternion in the form of (w, x, y, z)
+
+        Plain `math` on Python floats, which is much cheaper than NumPy for a single
+        quaternion. Rounds exactly like `_quat_to_ypr_batch`.
         """
         w, x, y, z = self._normalize_quaternion(q)
 
         # Calculate the yaw, pitch, and roll in radians
-        yaw = np.arctan2(2.0 * (y * z + w * x), 1 - 2 * (x * x + y * y))
-        pitch = np.arcsin(2.0 * (w * y - x * z))
-        roll = np.arctan2(2.0 * (x * y + w * z), 1 - 2 * (y * y + z * z))
+        yaw = math.atan2(2.0 * (y * z + w * x), 1 - 2 * (x * x + y * y))
+        # Clamp rounding overshoot so gimbal lock gives +-90 instead of an error
+        pitch = math.asin(max(-1.0, min(1.0, 2.0 * (w * y - x * z))))
+        roll = math.atan2(2.0 * (x * y + w * z), 1 - 2 * (y * y + z * z))
+
+        # Convert from radians to degrees, rounded to 3 decimals the way np.round does
+        return (
+            round(math.degrees(yaw) * 1000.0) / 1000.0,
+            round(math.degrees(pitch) * 1000.0) / 1000.0,
+            round(math.degrees(roll) * 1000.0) / 1000.0,
+        )
+
+    def _tared_ypr(
+        self, q: tuple[float, float, float, float]
+    ) -> tuple[float, float, float]:
+        """Yaw, pitch, and roll of one quaternion relative to the tare reference"""
+        yaw, pitch, roll = self._quat_to_ypr(q)
+        return (
+            self._wrap_angle(yaw - self._yaw_offset),
+            self._wrap_angle(pitch - self._pitch_offset),
+            self._wrap_angle(roll - self._roll_offset),
+        )
+
+    def _quat_to_ypr_batch(self, quats: np.ndarray, tare: bool = True) -> np.ndarray:
+        """
+        Vectorized `_quat_to_ypr` for an (N, 4) array of (w, x, y, z) quaternions.
+        Returns an (N, 3) array of yaw, pitch, and roll in degrees, relative to the
+        tare reference unless `tare` is False.
+        """
+        quats = np.asarray(quats, dtype=np.float64).reshape(-1, 4)
+
+        magnitude = np.sqrt(np.einsum("ij,ij->i", quats, quats))
+        if not magnitude.all():
+            raise ValueError("Cannot normalize a zero quaternion.")
+
+        w, x, y, z = (quats / magnitude[:, None]).T
 
-        # Convert from radians to degrees
-        yaw = np.degrees(yaw)
-        pitch = np.degrees(pitch)
-        roll = np.degrees(roll)
+        ypr = np.empty((len(quats), 3))
+        np.arctan2(2.0 * (y * z + w * x), 1 - 2 * (x * x + y * y), out=ypr[:, 0])
+        np.arcsin(np.clip(2.0 * (w * y - x * z), -1.0, 1.0), out=ypr[:, 1])
+        np.arctan2(2.0 * (x * y + w * z), 1 - 2 * (y * y + z * z), out=ypr[:, 2])
 
-        return tuple(np.round((yaw, pitch, roll), decimals=3))
+        np.degrees(ypr, out=ypr)
+        np.round(ypr, decimals=3, out=ypr)
 
+        if tare:
+            ypr -= (self._yaw_offset, self._pitch_offset, self._roll_offset)
+            ypr = self._wrap_angle(ypr)
 
+        return ypr
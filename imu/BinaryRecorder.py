@@ -0,0 +1,192 @@
+import os
+import struct
+
+import numpy as np
+
+from .IMUBatch import CSV_HEADER, FIELDS, IMUBatch, format_rows
+from .IMUData import IMUData
+
+MAGIC = b"IMUB"
+SCHEMA_VERSION = 1
+
+# magic, schema version, header size, device_id, bytes per sensor value, reserved
+HEADER = struct.Struct("<4sHHiHH")
+
+
+def record_dtype(value_size: int = 8) -> np.dtype:
+    """
+    On-disk record layout: fixed-width little-endian, in `FIELDS` order.
+    Sensor values are float64 (lossless) or float32, which is still exact for
+    the BNO08X's fixed-point accel/gyro/mag outputs.
+    """
+    if value_size not in (4, 8):
+        raise ValueError("Sensor values must be stored with 4 or 8 bytes.")
+
+    return np.dtype(
+        [(name, "<i8") for name in FIELDS[:3]]
+        + [(name, f"<f{value_size}") for name in FIELDS[3:]]
+    )
+
+
+class BinaryRecorder:
+    """Appends IMU samples to a compact binary recording.
+
+    The file is a 16 byte header followed by fixed-width records. Samples are
+    staged in a preallocated chunk and written with a single `write` per chunk.
+    """
+
+    def __init__(
+        self,
+        fname: str,
+        device_id: int = 0,
+        value_size: int = 8,
+        chunk_size: int = 256,
+    ):
+        self.fname = fname
+        self.device_id = device_id
+        self.dtype = record_dtype(value_size)
+
+        self._chunk = np.zeros(chunk_size, dtype=self.dtype)
+        self._chunk_len = 0
+        self.file = None
+        # Optional `IndexWriter` told about every written chunk
+        self.index = None
+        self.records_written = 0
+
+    def header(self) -> bytes:
+        return HEADER.pack(
+            MAGIC,
+            SCHEMA_VERSION,
+            HEADER.size,
+            self.device_id,
+            self.dtype[FIELDS[3]].itemsize,
+            0,
+        )
+
+    def open(self, file=None) -> "BinaryRecorder":
+        """Open `fname`, or record into an already open `file` that wrote the header."""
+        if file is None:
+            file = open(self.fname, "wb")
+            file.write(self.header())
+        self.file = file
+        return self
+
+    def close(self):
+        if self.file:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
+
+    def write_data(self, data: IMUData):
+        if self._chunk_len == len(self._chunk):
+            self.flush()
+
+        self._chunk[self._chunk_len] = (
+            data.counter,
+            data.capture_time_ms,
+            data.recorded_at_time_ms,
+            data.accel_x,
+            data.accel_y,
+            data.accel_z,
+            data.gyro_x,
+            data.gyro_y,
+            data.gyro_z,
+            data.mag_x,
+            data.mag_y,
+            data.mag_z,
+            data.yaw,
+            data.pitch,
+            data.roll,
+        )
+        self._chunk_len += 1
+
+    def write_batch(self, batch: IMUBatch):
+        self.write_records(batch.samples)
+
+    def write_records(self, samples: np.ndarray):
+        """Append structured `IMU_DTYPE` records."""
+        while len(samples):
+            if self._chunk_len == len(self._chunk):
+                self.flush()
+
+            n = min(len(samples), len(self._chunk) - self._chunk_len)
+            # Field-wise cast into the chunk, which may narrow the values to float32
+            self._chunk[self._chunk_len : self._chunk_len + n] = samples[:n].astype(
+                self.dtype
+            )
+            self._chunk_len += n
+            samples = samples[n:]
+
+    def flush(self):
+        """Write the staged chunk to the file in one call."""
+        if self._chunk_len:
+            self.file.write(self._chunk[: self._chunk_len])
+            if self.index is not None:
+                self.index.add_records(self._chunk[: self._chunk_len])
+            self.records_written += self._chunk_len
+            self._chunk_len = 0
+
+        self.file.flush()
+
+
+def read_header(fname: str) -> dict[str, int]:
+    with open(fname, "rb") as f:
+        return parse_header(f.read(HEADER.size), fname)
+
+
+def parse_header(raw: bytes, fname: str, expected_magic: bytes = MAGIC) -> dict[str, int]:
+    if len(raw) < HEADER.size:
+        raise ValueError(f"{fname} is too short to be an IMU recording.")
+
+    magic, version, header_size, device_id, value_size, _ = HEADER.unpack(raw[: HEADER.size])
+    if magic != expected_magic:
+        raise ValueError(f"{fname} is not an IMU recording.")
+    if version > SCHEMA_VERSION:
+        raise ValueError(
+            f"{fname} uses schema version {version}, newer than supported ({SCHEMA_VERSION})."
+        )
+
+    return {
+        "schema_version": version,
+        "header_size": header_size,
+        "device_id": device_id,
+        "value_size": value_size,
+    }
+
+
+def read_recording(fname: str) -> tuple[dict[str, int], np.ndarray]:
+    """
+    Memory-map a binary recording as a NumPy structured array.
+    A partially written last record (e.g. after a power cut) is ignored.
+    """
+    header = read_header(fname)
+    dtype = record_dtype(header["value_size"])
+    count = (os.path.getsize(fname) - header["header_size"]) // dtype.itemsize
+
+    if count <= 0:
+        return header, np.zeros(0, dtype=dtype)
+
+    records = np.memmap(
+        fname, dtype=dtype, mode="r", offset=header["header_size"], shape=(count,)
+    )
+    return header, records
+
+
+def binary_to_csv(src: str, dst: str, chunk_rows: int = 65536) -> int:
+    """Convert a binary recording to the CSV schema. Returns the number of rows."""
+    header, records = read_recording(src)
+
+    with open(dst, "w") as out:
+        out.write(CSV_HEADER)
+        for start in range(0, len(records), chunk_rows):
+            rows = format_rows(records[start : start + chunk_rows], header["device_id"])
+            out.write("\n".join(rows) + "\n")
+
+    return len(records)
@@ -0,0 +1,266 @@
+import json
+import os
+import re
+import socket
+import struct
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from threading import Event, Thread
+
+import numpy as np
+
+from .RotatingFile import SUFFIXES
+
+MAGIC = b"IMUC"
+# magic, client send time (ns); replies add the reference's receive and send time
+REQUEST = struct.Struct("<4sq")
+REPLY = struct.Struct("<4sqqq")
+DEFAULT_PORT = 9871
+
+
+@dataclass
+class ClockEstimate:
+    """The reference clock reads `local time + offset_ms` at local `time_ms`."""
+
+    time_ms: int
+    offset_ms: float
+    # Round trip of the exchange the offset came from, an upper bound of its error
+    delay_ms: float
+    # Rate at which the offset changes, from the recent estimates
+    drift_ppm: float = 0.0
+
+
+@dataclass
+class ClockOptions:
+    """`ClockServer` (`host[:port]`) a `DataWriter` syncs with, every `every_s`"""
+
+    server: str
+    every_s: float = 10.0
+
+
+def parse_address(value: str, default_port: int = DEFAULT_PORT) -> tuple[str, int]:
+    """`host`, `host:port` or `:port` as a UDP address"""
+    host, sep, port = value.rpartition(":")
+    if not sep:
+        host, port = value, ""
+    try:
+        return host or "127.0.0.1", int(port) if port else default_port
+    except ValueError:
+        raise ValueError(f"Clock address {value!r} must look like <host>:<port>.") from None
+
+
+class ClockServer:
+    """Answers `ClockSync` requests over UDP with this host's clock.
+
+    It is the reference clock for all devices.
+    """
+
+    def __init__(self, port: int = DEFAULT_PORT, host: str = "0.0.0.0", clock=time.time_ns):
+        self.clock = clock
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((host, port))
+        self._sock.settimeout(0.2)
+        self._stop = Event()
+        self._thread: Thread | None = None
+        self.requests = 0
+
+    @property
+    def port(self) -> int:
+        return self._sock.getsockname()[1]
+
+    def start(self) -> "ClockServer":
+        self._thread = Thread(target=self.serve_forever, name="clock-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        while not self._stop.is_set():
+            try:
+                request, address = self._sock.recvfrom(64)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            received = self.clock()
+            if len(request) != REQUEST.size:
+                continue
+            magic, sent = REQUEST.unpack(request)
+            if magic != MAGIC:
+                continue
+            self.requests += 1
+            self._sock.sendto(REPLY.pack(MAGIC, sent, received, self.clock()), address)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self._sock.close()
+
+
+class ClockSync:
+    """Estimates the offset and drift of the local clock against a `ClockServer`.
+
+    Every `every_s`, `exchanges` request/reply round trips are made and the
+    one with the shortest round trip (least queuing) gives the offset, the
+    NTP way: ((receive - send) + (reply - arrival)) / 2. The drift is the
+    least squares slope of the last `history` offsets. Runs on its own
+    thread; `poll` hands out the estimates made since the last call.
+    """
+
+    def __init__(
+        self,
+        address: str | tuple[str, int],
+        every_s: float = 10.0,
+        exchanges: int = 8,
+        history: int = 32,
+        timeout_s: float = 0.5,
+        clock=time.time_ns,
+    ):
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.every_s = every_s
+        self.exchanges = exchanges
+        self.timeout_s = timeout_s
+        self.clock = clock
+
+        self.estimates: deque[ClockEstimate] = deque(maxlen=history)
+        self._new: deque[ClockEstimate] = deque()
+        self.failures = 0
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+    def measure(self) -> ClockEstimate | None:
+        """Make one estimate now, None if the reference didn't answer."""
+        best = None
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(self.timeout_s)
+            for _ in range(self.exchanges):
+                sent = self.clock()
+                try:
+                    sock.sendto(REQUEST.pack(MAGIC, sent), self.address)
+                    while True:
+                        reply = sock.recv(64)
+                        if len(reply) == REPLY.size:
+                            magic, echoed, received, replied = REPLY.unpack(reply)
+                            # Skip late replies to earlier requests
+                            if magic == MAGIC and echoed == sent:
+                                break
+                except OSError:
+                    continue
+                arrived = self.clock()
+
+                delay = (arrived - sent) - (replied - received)
+                if best is None or delay < best[0]:
+                    offset = ((received - sent) + (replied - arrived)) / 2
+                    best = (delay, offset, sent + (arrived - sent) // 2)
+
+        if best is None:
+            self.failures += 1
+            return None
+
+        delay, offset, at = best
+        estimate = ClockEstimate(at // 1_000_000, offset / 1e6, delay / 1e6)
+        self.estimates.append(estimate)
+        estimate.drift_ppm = self._drift_ppm()
+        self._new.append(estimate)
+        return estimate
+
+    def _drift_ppm(self) -> float:
+        if len(self.estimates) < 2:
+            return 0.0
+        times = np.array([e.time_ms for e in self.estimates], dtype=np.float64)
+        offsets = np.array([e.offset_ms for e in self.estimates])
+        if np.ptp(times) == 0:
+            return 0.0
+        return float(np.polyfit(times - times[0], offsets, 1)[0] * 1e6)
+
+    def offset_at(self, time_ms: int) -> float | None:
+        """Predicted offset in ms at local `time_ms`, from the latest estimate and the drift."""
+        if not self.estimates:
+            return None
+        latest = self.estimates[-1]
+        return latest.offset_ms + (time_ms - latest.time_ms) * latest.drift_ppm / 1e6
+
+    def poll(self) -> list[ClockEstimate]:
+        """Estimates made since the last call, cheap enough for the sampling loop."""
+        if not self._new:
+            return []
+        new = []
+        while self._new:
+            new.append(self._new.popleft())
+        return new
+
+    def start(self) -> "ClockSync":
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="clock-sync", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stop()
+        return False
+
+    def _run(self):
+        while True:
+            self.measure()
+            if self._stop.wait(self.every_s):
+                break
+
+
+def clock_fname(recording: str) -> str:
+    """Clock sidecar of a recording, shared by all segments of a rotated one."""
+    fname = recording + ".clock"
+    if os.path.exists(fname):
+        return fname
+
+    for suffix in SUFFIXES.values():
+        if recording.endswith(suffix):
+            recording = recording[: -len(suffix)]
+    base, ext = os.path.splitext(recording)
+    segment = re.fullmatch(r"(.*)-\d{4}", base)
+    if segment and os.path.exists(segment.group(1) + ext + ".clock"):
+        return segment.group(1) + ext + ".clock"
+    return fname
+
+
+def append_estimate(fname: str, estimate: ClockEstimate, device_id: int):
+    with open(fname, "a") as f:
+        f.write(json.dumps({"device_id": device_id, **asdict(estimate)}) + "\n")
+
+
+def read_clock(fname: str) -> list[ClockEstimate]:
+    with open(fname) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return [
+        ClockEstimate(e["time_ms"], e["offset_ms"], e["delay_ms"], e["drift_ppm"])
+        for e in entries
+    ]
+
+
+def correct_times(times_ms: np.ndarray, estimates: list[ClockEstimate]) -> np.ndarray:
+    """
+    Local capture times on the reference clock: offsets are interpolated
+    between estimates, and extrapolated with the drift before the first and
+    after the last one.
+    """
+    if not estimates:
+        return np.asarray(times_ms, dtype=np.int64)
+
+    times = np.asarray(times_ms, dtype=np.float64)
+    at = np.array([e.time_ms for e in estimates], dtype=np.float64)
+    offsets = np.interp(times, at, [e.offset_ms for e in estimates])
+
+    before, after = times < at[0], times > at[-1]
+    offsets[before] += (times[before] - at[0]) * estimates[0].drift_ppm / 1e6
+    offsets[after] += (times[after] - at[-1]) * estimates[-1].drift_ppm / 1e6
+    return np.round(times + offsets).astype(np.int64)
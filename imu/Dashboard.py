@@ -0,0 +1,198 @@
+import curses
+import math
+import time
+from threading import Event, Thread
+from typing import Any
+
+import numpy as np
+
+from .IMUData import IMUData
+from .MQTTPublisher import AsyncPublisher
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+# Sample fields drawn with a sparkline of their recent history
+SPARK_FIELDS = ("accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z")
+
+
+def sparkline(values: np.ndarray, width: int | None = None) -> str:
+    """Draw values (oldest first) as block characters scaled to their own range, NaN as blank."""
+    if width is not None:
+        values = values[-width:]
+    finite = values[np.isfinite(values)]
+    if not len(finite):
+        return " " * len(values)
+
+    low, high = finite.min(), finite.max()
+    span = high - low
+    chars = []
+    for value in values:
+        if not math.isfinite(value):
+            chars.append(" ")
+        elif span == 0:
+            chars.append(SPARK_CHARS[0])
+        else:
+            chars.append(SPARK_CHARS[int((value - low) / span * (len(SPARK_CHARS) - 1))])
+    return "".join(chars)
+
+
+class Dashboard:
+    """Live curses view of the acquisition, drawn from its own thread.
+
+    The acquisition loop only hands each sample to `update`, which stores it
+    in a preallocated history and never touches the screen. The dashboard
+    thread redraws at `refresh_hz` from the latest sample, the history, and
+    the stats of the optional `scheduler` and `writer`.
+    """
+
+    def __init__(
+        self,
+        scr: Any,
+        refresh_hz: float = 15.0,
+        history: int = 60,
+        scheduler=None,
+        writer=None,
+        title: str = "Basic reading",
+    ):
+        if refresh_hz <= 0:
+            raise ValueError("Dashboard refresh rate must be positive.")
+
+        self.scr = scr
+        self.refresh_interval = 1 / refresh_hz
+        self.scheduler = scheduler
+        self.writer = writer
+        self.title = title
+
+        self._history = np.full((history, len(SPARK_FIELDS)), np.nan)
+        self._write = 0
+        self.latest: IMUData | None = None
+        self.samples = 0
+        self.last_interval_ms = 0.0
+        self._last_update_ns = 0
+
+        self._rate_hz = 0.0
+        self._rate_samples = 0
+        self._rate_time = time.monotonic()
+
+        self.frames = 0
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+    def update(self, data: IMUData):
+        """Record one sample. Cheap and lock free, called from the acquisition loop."""
+        now = time.perf_counter_ns()
+        if self._last_update_ns:
+            self.last_interval_ms = (now - self._last_update_ns) / 1e6
+        self._last_update_ns = now
+
+        row = self._history[self._write]
+        for i, name in enumerate(SPARK_FIELDS):
+            row[i] = getattr(data, name)
+        self._write = (self._write + 1) % len(self._history)
+        self.latest = data
+        self.samples += 1
+
+    def start(self) -> "Dashboard":
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="dashboard", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stop()
+        return False
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            self.draw()
+        # Leave the final state on screen
+        self.draw()
+
+    def history(self) -> np.ndarray:
+        """(history, SPARK_FIELDS) recent samples, oldest first"""
+        return np.roll(self._history, -self._write, axis=0)
+
+    def lines(self) -> list[str]:
+        """The dashboard's text, one string per screen line"""
+        now = time.monotonic()
+        elapsed = now - self._rate_time
+        if elapsed >= 0.5:
+            self._rate_hz = (self.samples - self._rate_samples) / elapsed
+            self._rate_samples = self.samples
+            self._rate_time = now
+
+        lines = [self.title]
+        data = self.latest
+        history = self.history()
+        width = len(history)
+
+        def value_lines(labels, names):
+            for label, name in zip(labels, names):
+                value = getattr(data, name) if data is not None else math.nan
+                line = f"{label}:{value: 08.3F}"
+                if name in SPARK_FIELDS:
+                    line = f"{line:<16}{sparkline(history[:, SPARK_FIELDS.index(name)], width)}"
+                lines.append(line)
+
+        value_lines(("Accel X", "Accel Y", "Accel Z"), ("accel_x", "accel_y", "accel_z"))
+        value_lines(("Gyro X", "Gyro Y", "Gyro Z"), ("gyro_x", "gyro_y", "gyro_z"))
+        value_lines(("Mag X", "Mag Y", "Mag Z"), ("mag_x", "mag_y", "mag_z"))
+        value_lines(("Yaw (z)", "Pitch (y)", "Roll (x)"), ("yaw", "pitch", "roll"))
+
+        lines.append(
+            f"Sample rate: {self._rate_hz:6.1f} Hz  samples: {self.samples}  "
+            + f"ms since last iteration: {self.last_interval_ms: 08.3F}"
+        )
+        if self.scheduler is not None:
+            lines.append(
+                f"Overruns: {self.scheduler.overruns}  missed slots: {self.scheduler.missed}"
+            )
+        if self.writer is not None:
+            queues = "  ".join(f"{name}: {depth}" for name, depth in _queue_depths(self.writer))
+            lines.append(f"Queues: {queues}")
+            lines.append(f"MQTT: {_mqtt_state(self.writer)}")
+        return lines
+
+    def draw(self):
+        for y, line in enumerate(self.lines()):
+            try:
+                self.scr.addstr(y, 0, line)
+                self.scr.clrtoeol()
+            except curses.error:
+                # Terminal too small for the line, skip it
+                pass
+        self.scr.refresh()
+        self.frames += 1
+
+
+def _queue_depths(writer) -> list[tuple[str, int]]:
+    depths = []
+    recording = getattr(writer, "recording", None)
+    if recording is not None:
+        depths.append(("rows", recording.pending))
+    fanout = getattr(writer, "fanout", None)
+    if fanout is not None:
+        for name, stats in fanout.stats().items():
+            depths.append((name, stats["queued"]))
+    client = getattr(writer, "mqtt_client", None)
+    if isinstance(client, AsyncPublisher):
+        depths.append(("mqtt publisher", len(client.queue)))
+    return depths
+
+
+def _mqtt_state(writer) -> str:
+    client = getattr(writer, "mqtt_client", None)
+    if client is None:
+        return "not connected"
+    if isinstance(client, AsyncPublisher):
+        state = "connected" if client.connected else "reconnecting"
+        return f"{state}, {client.sent} sent, {client.failed} failed"
+    return "connected"
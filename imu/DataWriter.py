@@ -8,20 +8,100 @@ try:
 except ModuleNotFoundError:
     window = Any
 
+import numpy as np
 from package.client import Client
 
 from .BaseIMU import IMUData
+from .ClockSync import ClockOptions, ClockSync, append_estimate, clock_fname
+from .encoding import encode_clock, encode_quality, encode_spectrum, encode_status
+from .FanOutWriter import Block, FanOutWriter, MQTTSink, Sink, parse_sink
+from .MQTTPublisher import (
+    CLOCK_TOPIC,
+    QUALITY_TOPIC,
+    SPECTRUM_TOPIC,
+    STATUS_TOPIC,
+    AsyncPublisher,
+    MQTTOptions,
+)
+from .Pipeline import Pipeline
+from .QualityMonitor import MARK, QualityMonitor, QualityOptions
+from .RecordingSink import EXTENSIONS, FORMATS, RecordingOptions, RecordingSink
+from .SpectrumAnalyzer import SpectrumAnalyzer, SpectrumOptions
+from .RingBuffer import RingBuffer
+from .TriggerCapture import TriggerCapture, TriggerOptions
+from .IMUBatch import IMUBatch
+from .Metrics import METRICS
+
+
+class CounterGaps:
+    """Counts jumps in one device's sample counter into `METRICS`."""
+
+    def __init__(self, device: str):
+        self._gaps = METRICS.counter(
+            "sample_gaps_total", "Jumps in the sample counter", device=device
+        )
+        self._missing = METRICS.counter(
+            "samples_missing_total", "Samples skipped by the sample counter", device=device
+        )
+        self.last: int | None = None
+
+    def observe_one(self, counter: int):
+        if self.last is not None and counter > self.last + 1:
+            self._gaps.inc()
+            self._missing.inc(counter - self.last - 1)
+        self.last = counter
+
+    def observe(self, counters: np.ndarray):
+        if not len(counters):
+            return
+        previous = counters[0] if self.last is None else self.last
+        steps = np.diff(counters, prepend=previous)
+        jumps = steps[steps > 1]
+        if len(jumps):
+            self._gaps.inc(len(jumps))
+            self._missing.inc(int(jumps.sum()) - len(jumps))
+        self.last = int(counters[-1])
 
 
 class DataWriter(ContextManager):
     """Writes IMU samples to CSV and MQTT.
 
     Output schema is intentionally stable and starts with `counter`.
+    Every output is a `Sink` of one `FanOutWriter`: the recording
+    (`RecordingSink`), MQTT (`MQTTSink`) and any extra `sinks` (`Sink`s or
+    `parse_sink` specs) each write from their own queue of `sink_queue_size`
+    blocks on their own thread, which overflows according to `sink_overflow`
+    (the recording's blocks instead). A stuck broker only fills its own queue
+    and never delays the caller.
+
+    Every feature is configured by its own options object, off when None:
+
+    - `recording` (`RecordingOptions`): format, flush policy, rotation, index
+    - `mqtt` (`MQTTOptions`): batching, background publishing, status
+    - `processing` (a `Pipeline.from_spec` spec, for samples arriving at
+      `sample_rate_hz`): filters/decimates samples before they are output
+    - `spectrum` (`SpectrumOptions`): vibration spectra of the unprocessed
+      acceleration, on the `spectrum` subtopic
+    - `trigger` (`TriggerOptions`): only output samples around events
+    - `quality` (`QualityOptions`): duplicates, stale readings and gaps, on
+      the `quality` subtopic
+    - `clock` (`ClockOptions`): clock offset estimates, in the
+      `<csv_fname>.clock` sidecar and on the `clock` subtopic
+
+    Flush and publish times, written samples and gaps in the sample counter
+    go to the process' `METRICS`. Set `count_gaps` to False when the writer
+    only gets part of the stream (e.g. one of several worker processes).
+
+    The `DEVICE_ID` environment variable overrides `device_id`, unless
+    `use_env_device_id` is False (e.g. when one process drives several IMUs).
     """
 
+    RECORDING_FORMATS = FORMATS
+    EXTENSIONS = EXTENSIONS
+
     @staticmethod
-    def _resolve_device_id(device_id):
-        env_device_id = os.getenv("DEVICE_ID")
+    def _resolve_device_id(device_id, use_env: bool = True):
+        env_device_id = os.getenv("DEVICE_ID") if use_env else None
 
         for candidate in (env_device_id, device_id, 0):
             if candidate is None:
@@ -41,115 +121,282 @@ class DataWriter(ContextManager):
         mqtt_broker_port=1883,
         device_id=0,
         scr: window | None = None,
+        recording: RecordingOptions | None = None,
+        mqtt: MQTTOptions | None = None,
+        processing: str | None = None,
+        sample_rate_hz: float = 100.0,
+        spectrum: SpectrumOptions | None = None,
+        trigger: TriggerOptions | None = None,
+        quality: QualityOptions | None = None,
+        clock: ClockOptions | None = None,
+        sinks: list[Sink | str] | None = None,
+        sink_queue_size: int = 1000,
+        sink_overflow: str = RingBuffer.DROP_OLDEST,
+        use_env_device_id: bool = True,
+        count_gaps: bool = True,
     ):
-        self.csv_fname = csv_fname
+        if quality is not None and quality.action == MARK and spectrum is not None:
+            # A NaN sample in the window would turn the whole spectrum into NaN
+            raise ValueError("Marking duplicates can't be combined with spectra.")
+
         self.mqtt_broker_ip = mqtt_broker_ip
         self.mqtt_broker_port = mqtt_broker_port
-        self.device_id = self._resolve_device_id(device_id)
+        self.device_id = self._resolve_device_id(device_id, use_env_device_id)
+
+        self.recording = RecordingSink(csv_fname, self.device_id, recording)
+        self.recording_format = self.recording.recording_format
+        self.csv_fname = self.recording.fname
+        self.mqtt_options = mqtt = mqtt or MQTTOptions()
+        self.mqtt = MQTTSink(
+            lambda: self.mqtt_client,
+            device_id=self.device_id,
+            batch_size=mqtt.batch_size,
+            batch_ms=mqtt.batch_ms,
+            encoding=mqtt.encoding,
+            raw=mqtt.raw,
+        )
+
+        self.pipeline = (
+            Pipeline.from_spec(processing, sample_rate_hz) if processing else None
+        )
+        self.spectrum = None
+        if spectrum is not None:
+            self.spectrum = SpectrumAnalyzer(
+                sample_rate_hz,
+                segment=spectrum.segment,
+                every_s=spectrum.every_s,
+                bands=spectrum.bands,
+            )
+        self.quality = None
+        if quality is not None:
+            self.quality = QualityMonitor(
+                1000 / sample_rate_hz, quality.action, quality.window_s
+            )
+        self.trigger = None
+        if trigger is not None:
+            self.trigger = TriggerCapture(
+                accel_threshold=trigger.accel,
+                gyro_threshold=trigger.gyro,
+                orientation_deg=trigger.orientation_deg,
+                pre_samples=round(trigger.pre_s * sample_rate_hz),
+                post_samples=round(trigger.post_s * sample_rate_hz),
+                heartbeat_ms=(
+                    None if trigger.heartbeat_s is None else round(trigger.heartbeat_s * 1000)
+                ),
+            )
+        self.sinks = [
+            parse_sink(sink, self.device_id) if isinstance(sink, str) else sink
+            for sink in sinks or ()
+        ]
+        self.sink_queue_size = sink_queue_size
+        self.sink_overflow = sink_overflow
+        self.clock_options = clock
+
+        device = str(self.device_id)
+        self._samples_written = METRICS.counter(
+            "samples_written_total", "Samples handed to the outputs", device=device
+        )
+        self.gaps = CounterGaps(device) if count_gaps else None
         self.scr = scr
 
+    @property
+    def rotation(self):
+        return self.recording.rotation
+
     def __enter__(self):
-        self.csv_file = open(self.csv_fname, "w+")
-        self.csv_file.write(
-            "counter,capture_time_ms,recorded_at_time_ms,"
-            + "accel_x,accel_y,accel_z,"
-            + "gyro_x,gyro_y,gyro_z,"
-            + "mag_x,mag_y,mag_z,"
-            + "yaw,pitch,roll,device_id\n"
-        )
+        # Here, so a recording that can't be created fails right away
+        self.recording.open()
+        self._connect()
+
+        sinks = [self.recording] + self.sinks
+        if self.mqtt_client is not None:
+            sinks.insert(1, self.mqtt)
+        self.fanout = FanOutWriter(
+            sinks,
+            self.sink_queue_size,
+            self.sink_overflow,
+            labels={"device": str(self.device_id)},
+        ).start()
+
+        # Reused blocks for samples going through the pipeline
+        self._unprocessed = IMUBatch(1)
+        self._checked = IMUBatch()
+        self._processed = IMUBatch()
+        self._captured = IMUBatch()
+        self._last_status = time.monotonic()
+
+        self.clock = None
+        if self.clock_options:
+            self.clock = ClockSync(
+                self.clock_options.server, every_s=self.clock_options.every_s
+            ).start()
+
+        return self
+
+    def _connect(self):
+        broker = f"{self.mqtt_broker_ip}:{self.mqtt_broker_port}"
+        if self.mqtt_options.asynchronous:
+            self.mqtt_client = AsyncPublisher(
+                self._connect_mqtt,
+                queue_size=self.mqtt_options.queue_size,
+                spill_fname=self.mqtt_options.spill_fname,
+                spill_max_bytes=self.mqtt_options.spill_max_bytes,
+            ).start()
+            self._show(20, f"Publishing to MQTT at {broker} in the background")
+            return
+
         try:
-            if self.scr:
-                self.scr.addstr(20, 0, "Initializing MQTT connection...")
-                self.scr.refresh()
-            else:
-                print("Initializing MQTT connection...")
-            self.mqtt_client = Client(
-                broker_ip=self.mqtt_broker_ip,
-                broker_port=self.mqtt_broker_port,
-                client_type=Client.IMU,
-                device_id=str(self.device_id),
-            )
-            if self.scr:
-                self.scr.addstr(
-                    21,
-                    0,
-                    f"Established MQTT connection to {self.mqtt_broker_ip}:{self.mqtt_broker_port}",
-                )
-            else:
-                print(
-                    f"Established MQTT connection to {self.mqtt_broker_ip}:{self.mqtt_broker_port}"
-                )
+            self._show(20, "Initializing MQTT connection...")
+            self.mqtt_client = self._connect_mqtt()
+            self._show(21, f"Established MQTT connection to {broker}")
         except Exception as _:
             self.mqtt_client = None
-            if self.scr:
-                self.scr.addstr(
-                    22,
-                    0,
-                    f"Could not establish MQTT connection to {self.mqtt_broker_ip}:{self.mqtt_broker_port}",
-                )
-            else:
+            self._show(22, f"Could not establish MQTT connection to {broker}")
+
+    def _show(self, y: int, message: str):
+        if self.scr:
+            self.scr.addstr(y, 0, message)
+            self.scr.refresh()
+        else:
+            print(message)
+
+    def _connect_mqtt(self) -> Client:
+        return Client(
+            broker_ip=self.mqtt_broker_ip,
+            broker_port=self.mqtt_broker_port,
+            client_type=Client.IMU,
+            device_id=str(self.device_id),
+        )
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if getattr(self, "clock", None):
+            self.clock.stop()
+            self._record_clock()
+            if self.clock.estimates:
+                latest = self.clock.estimates[-1]
                 print(
-                    f"Could not establish MQTT connection to {self.mqtt_broker_ip}:{self.mqtt_broker_port}"
+                    f"Clock offset: {latest.offset_ms:.3f} ms "
+                    + f"(round trip {latest.delay_ms:.3f} ms, "
+                    + f"drift {latest.drift_ppm:.1f} ppm), see {clock_fname(self.csv_fname)}"
                 )
-        finally:
-            if self.scr:
-                self.scr.refresh()
 
-        return self
+        if self.quality is not None:
+            window = self.quality.flush()
+            if window is not None and getattr(self, "mqtt_client", None):
+                self._publish(encode_quality(window, self.device_id), QUALITY_TOPIC)
+            stats = self.quality.stats()
+            print(
+                f"Samples checked: {stats['samples']}, duplicates: {stats['duplicates']}, "
+                + f"stale: {stats['stale']}, gaps: {stats['gaps']}, "
+                + f"missing: {stats['missing']}, dropped: {stats['dropped']}"
+            )
 
-    def __exit__(self, exc_type, exc_value, tb):
-        # Always close CSV
-        try:
-            if getattr(self, "csv_file", None):
-                self.csv_file.close()
-        except Exception:
-            pass
+        if self.trigger is not None:
+            self.trigger.flush()
+            stats = self.trigger.stats()
+            print(
+                f"Trigger events: {stats['events']}, samples captured: {stats['captured']}, "
+                + f"suppressed: {stats['suppressed']}, heartbeats: {stats['heartbeats']}"
+            )
 
-        # Never raise on disconnect
-        if getattr(self, "mqtt_client", None):
-            try:
-                self.mqtt_client.disconnect()
-            except Exception:
-                pass
+        if getattr(self, "fanout", None):
+            # Every sink writes what is queued, then flushes and closes
+            self.fanout.close()
+            for name, stats in self.fanout.stats().items():
+                print(
+                    f"Sink {name}: {stats['samples']} samples, {stats['bytes']} bytes, "
+                    + f"{stats['dropped']} dropped, {stats['errors']} errors, "
+                    + f"mean latency {stats['mean_latency_ms']:.2f} ms"
+                )
+
+        if self.rotation:
+            stats = self.rotation.stats()
+            print(
+                f"Recorded {stats['segments']} segments ({stats['stored_bytes']} bytes kept, "
+                + f"{stats['deleted']} deleted), see {self.rotation.manifest_fname}"
+            )
 
         return False
 
     def write_data(self, data: IMUData):
-        data.recorded_at_time_ms = int(time.time_ns() / 1e6)
-        self._output_to_csv(data)
-
-        if self.mqtt_client:
-            self._output_mqtt(data)
-
-    def _output_to_csv(self, data: IMUData):
-        """Write one CSV row.
-
-        CSV field order:
-        counter,capture_time_ms,recorded_at_time_ms,
-        accel_x,accel_y,accel_z,
-        gyro_x,gyro_y,gyro_z,
-        mag_x,mag_y,mag_z,
-        yaw,pitch,roll,device_id
-        """
-        out = (
-            f"{data.counter},{data.capture_time_ms},{data.recorded_at_time_ms},{data.accel_x},{data.accel_y},{data.accel_z},"
-            + f"{data.gyro_x},{data.gyro_y},{data.gyro_z},{data.mag_x},{data.mag_y},"
-            + f"{data.mag_z},{data.yaw},{data.pitch},{data.roll},{self.device_id}"
-        )
-        self.csv_file.write(out + "\n")
-
-    def _output_mqtt(self, data: IMUData):
-        """Publish one MQTT payload.
-
-        MQTT field order:
-        counter,capture_time_ms,recorded_at_time_ms,
-        accel_x,accel_y,accel_z,
-        gyro_x,gyro_y,gyro_z,
-        mag_x,mag_y,mag_z,
-        yaw,pitch,roll,device_id
-        """
-        self.mqtt_client.publish(
-            f"{data.counter},{data.capture_time_ms},{data.recorded_at_time_ms},{data.accel_x},{data.accel_y},{data.accel_z},"
-            + f"{data.gyro_x},{data.gyro_y},{data.gyro_z},{data.mag_x},{data.mag_y},"
-            + f"{data.mag_z},{data.yaw},{data.pitch},{data.roll},{self.device_id}"
-        )
+        if self.gaps:
+            self.gaps.observe_one(data.counter)
+
+        self._unprocessed.clear()
+        self._unprocessed.append(data)
+        self._write_batch(self._unprocessed)
+        # The caller's sample carries its recording time, like a written block
+        data.recorded_at_time_ms = int(self._unprocessed.column("recorded_at_time_ms")[0])
+
+    def write_batch(self, batch: IMUBatch):
+        """Write every sample of `batch`, handing the whole block to the sinks at once."""
+        if self.gaps:
+            self.gaps.observe(batch.column("counter"))
+
+        self._write_batch(batch)
+
+    def _write_batch(self, batch: IMUBatch):
+        if self.quality is not None:
+            checked, windows = self.quality.process(batch.samples)
+            for window in windows:
+                if self.mqtt_client:
+                    self._publish(encode_quality(window, self.device_id), QUALITY_TOPIC)
+            batch = self._checked
+            batch.clear()
+            batch.extend(checked)
+
+        if self.spectrum is not None:
+            for summary in self.spectrum.push(batch.samples):
+                if self.mqtt_client:
+                    self._publish(encode_spectrum(summary, self.device_id), SPECTRUM_TOPIC)
+
+        if self.pipeline is not None:
+            processed = self.pipeline.process(batch.samples)
+            batch = self._processed
+            batch.clear()
+            batch.extend(processed)
+
+        if self.trigger is not None:
+            captured = self.trigger.process(batch.samples)
+            batch = self._captured
+            batch.clear()
+            batch.extend(captured)
+
+        if not len(batch):
+            return
+
+        batch.column("recorded_at_time_ms")[:] = int(time.time_ns() / 1e6)
+        # The sinks keep the block after `batch` is reused
+        records = batch.samples.copy()
+        self.fanout.write_block(Block(records, self.device_id))
+
+        self._samples_written.inc(len(records))
+        self._maybe_publish_status()
+        if self.clock:
+            self._record_clock()
+
+    def sync(self, timeout: float | None = None) -> bool:
+        """Wait until every sink wrote (or dropped) what was written so far."""
+        return self.fanout.sync(timeout)
+
+    def flush_stats(self) -> dict[str, float]:
+        return self.recording.flush_stats()
+
+    def _maybe_publish_status(self):
+        every_s = self.mqtt_options.status_every_s
+        if every_s and self.mqtt_client and time.monotonic() - self._last_status >= every_s:
+            self._last_status = time.monotonic()
+            time_ms = int(time.time_ns() / 1e6)
+            self._publish(
+                encode_status(METRICS.snapshot(), self.device_id, time_ms), STATUS_TOPIC
+            )
+
+    def _record_clock(self):
+        for estimate in self.clock.poll():
+            append_estimate(self.csv_fname + ".clock", estimate, self.device_id)
+            if self.mqtt_client:
+                self._publish(encode_clock(estimate, self.device_id), CLOCK_TOPIC)
+
+    def _publish(self, payload: str, subtopic: str):
+        """Queue one already encoded payload for the `subtopic` of the MQTT sink."""
+        self.fanout.publish(payload, subtopic)
@@ -1,26 +1,143 @@
 import time
 
-from .BaseIMU import BaseIMU, IMUData
+import numpy as np
+
+from .BaseIMU import BaseIMU, IMUBatch, IMUData
+from .BinaryRecorder import read_header, read_recording
+from .IMUBatch import FIELDS
+from .QuantizedRecorder import MAGIC as QUANTIZED_MAGIC, read_quantized
+
+# Recordings without timestamps (like data/sample_data.csv) were taken every 10 ms
+DEFAULT_INTERVAL_MS = 10
+
+VALUE_FIELDS = FIELDS[3:]
+
+
+def load_recording(fname: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Load a recording once for replay.
+
+    Accepts binary (.imu) and quantized (.imuq) recordings, CSV written by
+    DataWriter (with header), and headerless 12 column CSV (accel, gyro, mag,
+    yaw/pitch/roll) like data/sample_data.csv.
+
+    Returns an (N, 12) float64 array of sensor values in `FIELDS` order and the
+    (N,) int64 time of each sample in ms relative to the first one.
+    """
+    with open(fname, "rb") as f:
+        magic = f.read(len(QUANTIZED_MAGIC))
+
+    records = None
+    if magic == QUANTIZED_MAGIC:
+        _, records = read_quantized(fname)
+    else:
+        try:
+            read_header(fname)
+        except ValueError:
+            pass
+        else:
+            _, records = read_recording(fname)
+
+    if records is not None:
+        values = np.column_stack([records[name] for name in VALUE_FIELDS]).astype(
+            np.float64
+        )
+        times = np.asarray(records["capture_time_ms"], dtype=np.int64)
+        return values, times - times[0] if len(times) else times
+
+    with open(fname) as f:
+        has_header = f.readline().startswith(FIELDS[0])
+
+    if has_header:
+        table = np.loadtxt(
+            fname, delimiter=",", skiprows=1, usecols=range(1, 15), ndmin=2
+        )
+        values = np.ascontiguousarray(table[:, 2:])
+        times = table[:, 0].astype(np.int64)
+        return values, times - times[0] if len(times) else times
+
+    values = np.loadtxt(fname, delimiter=",", ndmin=2)
+    return values, np.arange(len(values), dtype=np.int64) * DEFAULT_INTERVAL_MS
 
 
 class FakeIMU(BaseIMU):
-    def __init__(self, *args, sample_filename="data/sample_data.csv", **kwargs):
+    """Replays a recording as if it came from an IMU.
+
+    The recording is loaded once, so reads don't parse anything. It loops
+    forever when it reaches the end.
+
+    speed: None replays as fast as samples are requested (the caller paces),
+    1.0 replays at the recording's original rate, 10.0 ten times faster, etc.
+    """
+
+    def __init__(
+        self,
+        *args,
+        sample_filename="data/sample_data.csv",
+        speed: float | None = None,
+        **kwargs,
+    ):
         super().__init__()
         self.sample_filename = sample_filename
-        self.file = open(sample_filename, "r+")
+        self.speed = speed or None
 
-    def read_data(self):
-        # "counter,capture_time_ms,recorded_at_time_ms,"
-        # + "accel_x,accel_y,accel_z,"
-        # + "gyro_x,gyro_y,gyro_z,"
-        # + "mag_x,mag_y,mag_z,"
-        # + "yaw,pitch,roll\n"
-        data = self.file.readline()
+        self.values, self.offsets_ms = load_recording(sample_filename)
+        if not len(self.values):
+            raise ValueError(f"{sample_filename} holds no samples to replay.")
+
+        # One pass lasts until the sample after the last one would have come
+        steps = np.diff(self.offsets_ms)
+        interval_ms = int(np.median(steps)) if len(steps) else DEFAULT_INTERVAL_MS
+        self.duration_ms = int(self.offsets_ms[-1]) + interval_ms
+
+        self._played = 0
+        # Replay timing starts with the first read
+        self._t0_ns = 0
+        self._t0_ms = 0
+        self.closed = False
+
+    def close(self):
+        """Stop replaying, later reads raise ValueError. The recording is already in memory."""
+        self.closed = True
 
-        if not data:
-            self.file.seek(0)
-            data = self.file.readline()
+    def _check_open(self):
+        if self.closed:
+            raise ValueError("FakeIMU is closed")
 
+    def _due_ms(self, played: np.ndarray | int):
+        """Time of sample number `played`, relative to the replay start"""
+        self._check_open()
+        n = len(self.values)
+        return (played // n) * self.duration_ms + self.offsets_ms[played % n]
+
+    def _start_timeline(self):
+        if not self._t0_ns:
+            self._t0_ns = time.monotonic_ns()
+            self._t0_ms = int(time.time_ns() / 1e6)
+
+    def _capture_time_ms(self, due_ms, speed: float | None = None):
+        """Wait for `due_ms` when replaying at a rate and return the capture time"""
+        speed = speed or self.speed
+        if speed is None:
+            return int(time.time_ns() / 1e6)
+
+        self._start_timeline()
+
+        last_due_ms = due_ms[-1] if isinstance(due_ms, np.ndarray) else due_ms
+        deadline_ns = self._t0_ns + int(last_due_ms / speed * 1e6)
+        while (remaining := deadline_ns - time.monotonic_ns()) > 0:
+            time.sleep(remaining / 1e9)
+
+        # Stamp every sample at its own replay time, even when waiting for a block
+        return self._t0_ms + np.floor_divide(due_ms, speed).astype(np.int64)
+
+    def _read_values(self) -> list[float]:
+        row = self._played % len(self.values)
+        self._played += 1
+        return self.values[row].tolist()
+
+    def read_data(self):
+        capture_time_ms = int(self._capture_time_ms(self._due_ms(self._played)))
         (
             accel_x,
             accel_y,
@@ -34,11 +151,11 @@ class FakeIMU(BaseIMU):
             yaw,
             pitch,
             roll,
-        ) = (float(i) for i in data.split(","))
+        ) = self._read_values()
 
         return IMUData(
             self._next_counter(),
-            int(time.time_ns() / 1e6),
+            capture_time_ms,
             0,
             accel_x,
             accel_y,
@@ -54,13 +171,64 @@ class FakeIMU(BaseIMU):
             roll,
         )
 
+    def read_into(self, batch: IMUBatch) -> None:
+        capture_time_ms = int(self._capture_time_ms(self._due_ms(self._played)))
+        batch.append_values(self._next_counter(), capture_time_ms, 0, *self._read_values())
+
+    def read_batch(self, n: int, out: IMUBatch | None = None) -> IMUBatch:
+        """Fill `n` samples with array operations, without per-sample work."""
+        return self._fill(n, out, self.speed)
+
+    def read_available(self, out: IMUBatch | None = None) -> IMUBatch:
+        """
+        Every sample due by now on the replay timeline, like an IMU's FIFO.
+        Without a replay speed the recording plays at its original rate.
+        """
+        self._check_open()
+        speed = self.speed or 1.0
+        self._start_timeline()
+
+        elapsed_ms = (time.monotonic_ns() - self._t0_ns) / 1e6 * speed
+        passes, within_ms = divmod(elapsed_ms, self.duration_ms)
+        due = int(passes) * len(self.values) + int(
+            np.searchsorted(self.offsets_ms, within_ms, side="right")
+        )
+
+        n = max(due - self._played, 0)
+        if out is None:
+            out = IMUBatch(max(n, 1))
+        return self._fill(n, out, speed) if n else out
+
+    def _fill(self, n: int, out: IMUBatch | None, speed: float | None) -> IMUBatch:
+        batch = out if out is not None else IMUBatch(n)
+
+        played = np.arange(self._played, self._played + n)
+        self._played += n
+        rows = played % len(self.values)
+        due_ms = self._due_ms(played)
+
+        capture_time_ms = self._capture_time_ms(due_ms, speed)
+
+        counters = self._next_counters(n)
+        view = batch.reserve(n)
+        view["counter"] = np.arange(counters.start, counters.stop)
+        view["capture_time_ms"] = capture_time_ms
+        view["recorded_at_time_ms"] = 0
+        for i, name in enumerate(VALUE_FIELDS):
+            view[name] = self.values[rows, i]
+
+        return batch
+
 
 class IMU:
-    _imu: FakeIMU | None = None
+    """One replay per key, so several fake IMUs can run side by side"""
+
+    _imus: dict[object, FakeIMU] = {}
 
     @staticmethod
-    def get_conn() -> FakeIMU:
-        if not IMU._imu:
-            IMU._imu = FakeIMU()
+    def get_conn(key=None, **kwargs) -> FakeIMU:
+        """kwargs: FakeIMU options, only used when creating the connection"""
+        if key not in IMU._imus:
+            IMU._imus[key] = FakeIMU(**kwargs)
 
-        return IMU._imu
+        return IMU._imus[key]
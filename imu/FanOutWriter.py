@@ -0,0 +1,545 @@
+import socket
+import time
+from functools import partial
+from threading import Condition, Lock, Thread
+from typing import Callable
+
+import numpy as np
+from package.client import Client
+
+from .encoding import ENCODINGS, encode_batch
+from .IMUBatch import CSV_HEADER, IMUBatch, format_rows
+from .Metrics import METRICS
+from .MQTTPublisher import publish_to
+from .RingBuffer import RingBuffer
+
+
+class Block:
+    """A block of samples, handed as is to every sink of a `FanOutWriter`.
+
+    The structured `records` are formatted into CSV rows at most once, by the
+    first sink that needs them, and every sink shares the same rows and
+    bytes, so sinks must not modify them. A block made from an already
+    serialized `payload` has no records.
+    """
+
+    def __init__(
+        self,
+        records: np.ndarray | None = None,
+        device_id: int = 0,
+        payload: bytes | None = None,
+        samples: int | None = None,
+    ):
+        self.records = records
+        self.device_id = device_id
+        self.samples = len(records) if samples is None else samples
+        self._payload = payload
+        self._rows: list[str] | None = None
+        self._lock = Lock()
+
+    @property
+    def rows(self) -> list[str]:
+        """CSV rows without newlines"""
+        with self._lock:
+            if self._rows is None:
+                if self.records is None:
+                    self._rows = self._payload.decode().splitlines()
+                else:
+                    self._rows = format_rows(self.records, self.device_id)
+            return self._rows
+
+    @property
+    def payload(self) -> bytes:
+        """Newline terminated CSV rows"""
+        if self._payload is None:
+            rows = self.rows
+            with self._lock:
+                if self._payload is None:
+                    self._payload = ("\n".join(rows) + "\n").encode()
+        return self._payload
+
+
+class Sink:
+    """One output of a `FanOutWriter`.
+
+    Sinks receive `Block`s of samples, by default as newline terminated CSV
+    rows (`write`). Sinks with `messages` also get the payloads DataWriter
+    publishes on MQTT subtopics (status, spectrum, ...). All methods run on
+    the sink's own thread. `overflow`, when set, replaces the writer's
+    overflow policy for this sink's queue.
+    """
+
+    name = "sink"
+    messages = False
+    overflow: str | None = None
+
+    def open(self):
+        """Connect or open files, called once before the first write."""
+
+    def write(self, payload: bytes):
+        """Output one payload of one or more rows."""
+        raise NotImplementedError
+
+    def write_block(self, block: Block) -> int:
+        """Output one block of samples, returns the bytes written."""
+        payload = block.payload
+        self.write(payload)
+        return len(payload)
+
+    def publish(self, payload: str, subtopic: str):
+        """Output one payload of an MQTT subtopic, for sinks with `messages`."""
+
+    def flush(self):
+        """Called whenever the sink's queue runs empty."""
+
+    def close(self):
+        """Release the output, called once after the last write."""
+
+
+class CSVSink(Sink):
+    """Appends the rows to a CSV file, with the usual header."""
+
+    def __init__(self, fname: str):
+        self.fname = fname
+        self.name = f"csv:{fname}"
+        self.file = None
+
+    def open(self):
+        self.file = open(self.fname, "wb")
+        self.file.write(CSV_HEADER.encode())
+
+    def write(self, payload: bytes):
+        self.file.write(payload)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+
+class MQTTSink(Sink):
+    """Publishes through a client made by `connect` (e.g. `Client` or `AsyncPublisher`).
+
+    Samples are published one row per message by default. With `batch_size`
+    above 1, `batch_ms`, or an `encoding` other than `csv`, they are coalesced
+    into one payload with a schema header (see `encode_batch`) instead, and
+    with `raw` False only the subtopic payloads are published.
+    """
+
+    name = "mqtt"
+    messages = True
+
+    def __init__(
+        self,
+        connect: Callable,
+        name: str | None = None,
+        device_id: int = 0,
+        batch_size: int = 1,
+        batch_ms: float | None = None,
+        encoding: str = "csv",
+        raw: bool = True,
+    ):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown MQTT encoding {encoding!r}, expected one of {ENCODINGS}")
+
+        self.connect = connect
+        if name:
+            self.name = name
+        self.device_id = device_id
+        self.batch_size = max(1, batch_size)
+        self.batch_ms = batch_ms
+        self.encoding = encoding
+        self.raw = raw
+        self.batching = self.batch_size > 1 or batch_ms is not None or encoding != "csv"
+        self.client = None
+
+        self._batch = IMUBatch(self.batch_size)
+        self._batch_started = 0.0
+        self._publish_time = METRICS.histogram(
+            "mqtt_publish_seconds", "Time to publish one MQTT payload", device=str(device_id)
+        )
+
+    def open(self):
+        self.client = self.connect()
+
+    def write(self, payload: bytes):
+        for row in payload.decode().splitlines():
+            self._publish(row)
+
+    def write_block(self, block: Block) -> int:
+        if not self.raw:
+            return 0
+        if not self.batching:
+            rows = block.rows
+            for row in rows:
+                self._publish(row)
+            return sum(map(len, rows))
+
+        if not len(self._batch):
+            self._batch_started = time.monotonic()
+        self._batch.extend(block.records)
+        if len(self._batch) >= self.batch_size or self._batch_due():
+            return self._publish_batch()
+        return 0
+
+    def publish(self, payload: str, subtopic: str):
+        self._publish(payload, subtopic)
+
+    def flush(self):
+        if self._batch_due():
+            self._publish_batch()
+
+    def close(self):
+        try:
+            # The partial batch
+            self._publish_batch()
+        finally:
+            # Never raise on disconnect
+            try:
+                if self.client:
+                    self.client.disconnect()
+            except Exception:
+                pass
+
+    def _batch_due(self) -> bool:
+        return (
+            self.batch_ms is not None
+            and len(self._batch) > 0
+            and (time.monotonic() - self._batch_started) * 1e3 >= self.batch_ms
+        )
+
+    def _publish_batch(self) -> int:
+        if not len(self._batch):
+            return 0
+        payload = encode_batch(self._batch.samples, self.device_id, self.encoding)
+        self._batch.clear()
+        self._publish(payload)
+        return len(payload)
+
+    def _publish(self, payload: str, subtopic: str | None = None):
+        start = time.perf_counter_ns()
+        publish_to(self.client, payload, subtopic)
+        self._publish_time.since(start)
+
+
+class SocketSink(Sink):
+    """Streams the rows as datagrams to a local UDP port or Unix datagram socket.
+
+    `address` is a `(host, port)` pair for UDP or a socket path. Datagrams are
+    cut at row boundaries and hold at most `max_datagram` bytes. Datagrams
+    nobody receives are lost, which is the point: consumers come and go
+    without affecting the recording.
+    """
+
+    def __init__(self, address: tuple[str, int] | str, max_datagram: int = 8192):
+        self.address = address
+        self.max_datagram = max_datagram
+        if isinstance(address, str):
+            self.family = socket.AF_UNIX
+            self.name = f"unix:{address}"
+        else:
+            self.family = socket.AF_INET
+            self.name = f"udp:{address[0]}:{address[1]}"
+        self._sock = None
+
+    def open(self):
+        self._sock = socket.socket(self.family, socket.SOCK_DGRAM)
+
+    def write(self, payload: bytes):
+        start = 0
+        while start < len(payload):
+            end = start + self.max_datagram
+            if end < len(payload):
+                cut = payload.rfind(b"\n", start, end)
+                if cut >= start:
+                    end = cut + 1
+            self._sock.sendto(payload[start:end], self.address)
+            start = end
+
+    def close(self):
+        if self._sock:
+            self._sock.close()
+
+
+def _connect_mqtt(host: str, port: int, device_id: int) -> Client:
+    return Client(
+        broker_ip=host, broker_port=port, client_type=Client.IMU, device_id=str(device_id)
+    )
+
+
+def parse_sink(spec: str, device_id: int = 0) -> Sink:
+    """
+    Build a sink from `udp://<host>:<port>`, `unix://<socket path>`,
+    `csv://<file name>` or `mqtt://<broker host>:<port>` (publishing as
+    `device_id`).
+    """
+    scheme, sep, target = spec.partition("://")
+    if not sep or not target:
+        raise ValueError(f"Sink {spec!r} must look like <scheme>://<target>.")
+
+    if scheme in ("udp", "mqtt"):
+        host, _, port = target.rpartition(":")
+        try:
+            address = (host or "127.0.0.1", int(port))
+        except ValueError:
+            raise ValueError(
+                f"{scheme.upper()} sink {spec!r} must look like {scheme}://<host>:<port>."
+            ) from None
+        if scheme == "udp":
+            return SocketSink(address)
+        return MQTTSink(
+            partial(_connect_mqtt, *address, device_id),
+            f"mqtt:{address[0]}:{address[1]}",
+            device_id,
+        )
+    if scheme == "unix":
+        return SocketSink(target)
+    if scheme == "csv":
+        return CSVSink(target)
+    raise ValueError(f"Unknown sink {scheme!r} in {spec!r}, expected udp, unix, csv or mqtt.")
+
+
+class SinkChannel:
+    """Feeds one sink from its own bounded queue and thread, and measures it.
+
+    A slow, stuck or failing sink only fills (and then overflows) its own
+    queue according to `overflow`; with `block`, producers wait at most
+    `block_timeout_s`. Errors are counted and never propagate. Samples,
+    drops, errors and latency also go to `METRICS`, labelled with the sink's
+    name and `labels`.
+    """
+
+    def __init__(
+        self,
+        sink: Sink,
+        queue_size: int = 1000,
+        overflow: str = RingBuffer.DROP_OLDEST,
+        block_timeout_s: float = 1.0,
+        labels: dict | None = None,
+        name: str | None = None,
+    ):
+        self.sink = sink
+        self.name = name or sink.name
+        self.queue = RingBuffer(queue_size, overflow)
+        self.block_timeout_s = block_timeout_s
+        self._thread: Thread | None = None
+        # Items taken off the queue and handled, see `sync`
+        self._handled = 0
+        self._handled_cond = Condition()
+
+        labels = {"sink": self.name, **(labels or {})}
+        self._samples_metric = METRICS.counter(
+            "sink_samples_total", "Samples written by a sink", **labels
+        )
+        self._dropped_metric = METRICS.counter(
+            "sink_dropped_total", "Payloads dropped by a sink's full queue", **labels
+        )
+        self._errors_metric = METRICS.counter(
+            "sink_errors_total", "Failed calls of a sink", **labels
+        )
+        self._latency_metric = METRICS.histogram(
+            "sink_latency_seconds", "Time from queueing a payload to its sink writing it", **labels
+        )
+
+        self.payloads = 0
+        self.samples = 0
+        self.bytes = 0
+        self.errors = 0
+        self.last_error: str | None = None
+        self.total_latency_ns = 0
+        self.max_latency_ns = 0
+        self._started = 0.0
+        self._busy_ns = 0
+
+    def start(self) -> "SinkChannel":
+        self._started = time.monotonic()
+        self._thread = Thread(target=self._run, name=f"sink-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def put(self, item: Block | tuple[str, str], samples: int) -> bool:
+        """Queue a block or a (subtopic, payload) pair, returns False when it was dropped."""
+        timeout = self.block_timeout_s if self.queue.overflow == RingBuffer.BLOCK else None
+        dropped = self.queue.dropped
+        queued = self.queue.put((time.perf_counter_ns(), item, samples), timeout)
+        if self.queue.dropped != dropped:
+            self._dropped_metric.inc(self.queue.dropped - dropped)
+        return queued
+
+    def sync(self, timeout: float | None = None) -> bool:
+        """Wait until the sink handled (or dropped) everything queued so far."""
+        target = self.queue.stats()["pushed"]
+        with self._handled_cond:
+            return self._handled_cond.wait_for(
+                lambda: self._handled + self.queue.dropped_oldest >= target
+                or self._thread is None,
+                timeout,
+            )
+
+    def close(self, timeout: float | None = 5.0):
+        """Let the sink write what is queued, then close it."""
+        self.queue.close()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        if not self._call(self.sink.open):
+            # Nothing can be written, keep draining so producers never wait
+            while items := self.queue.get_many(self.queue.capacity):
+                self.errors += len(items)
+                self._errors_metric.inc(len(items))
+                self._mark_handled(len(items))
+            return
+
+        while True:
+            items = self.queue.get_many(64, timeout=0.5)
+            if not items:
+                self._call(self.sink.flush)
+                if self.queue.closed and not len(self.queue):
+                    break
+                continue
+
+            for queued_ns, item, samples in items:
+                start = time.perf_counter_ns()
+                try:
+                    written = self._write(item)
+                except Exception as e:
+                    self._failed(e)
+                else:
+                    self.payloads += 1
+                    self.samples += samples
+                    self.bytes += written
+                    self._samples_metric.inc(samples)
+                done = time.perf_counter_ns()
+                self._busy_ns += done - start
+                latency = done - queued_ns
+                self.total_latency_ns += latency
+                self.max_latency_ns = max(self.max_latency_ns, latency)
+                self._latency_metric.observe_ns(latency)
+
+            if not len(self.queue):
+                self._call(self.sink.flush)
+            self._mark_handled(len(items))
+
+        self._call(self.sink.close)
+        # Let `sync` return for whatever was left
+        self._mark_handled(0)
+
+    def _write(self, item: Block | tuple[str, str]) -> int:
+        if isinstance(item, Block):
+            return self.sink.write_block(item)
+        subtopic, payload = item
+        self.sink.publish(payload, subtopic)
+        return len(payload)
+
+    def _mark_handled(self, n: int):
+        with self._handled_cond:
+            self._handled += n
+            self._handled_cond.notify_all()
+
+    def _call(self, method, *args) -> bool:
+        try:
+            method(*args)
+            return True
+        except Exception as e:
+            self._failed(e)
+            return False
+
+    def _failed(self, e: Exception):
+        self.errors += 1
+        self._errors_metric.inc()
+        self.last_error = repr(e)
+
+    def stats(self) -> dict:
+        queue = self.queue.stats()
+        handled = self.payloads + self.errors
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        return {
+            "queued": queue["queued"],
+            "high_water": queue["high_water"],
+            "dropped": queue["dropped_oldest"] + queue["dropped_newest"],
+            "payloads": self.payloads,
+            "samples": self.samples,
+            "bytes": self.bytes,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "samples_per_s": self.samples / elapsed if elapsed else 0.0,
+            "mean_latency_ms": self.total_latency_ns / handled / 1e6 if handled else 0.0,
+            "max_latency_ms": self.max_latency_ns / 1e6,
+            "busy_ms": self._busy_ns / 1e6,
+        }
+
+
+class FanOutWriter:
+    """Hands every block of samples to any number of sinks.
+
+    Rows are formatted and encoded once; every sink gets the same `Block`
+    through its own `SinkChannel`, so sinks are isolated from each other and
+    from the acquisition loop. `labels` are added to the sinks' `METRICS`.
+    Sinks sharing a name are told apart as `<name>#2`, `<name>#3`, ... in
+    `stats` and the metrics.
+    """
+
+    def __init__(
+        self,
+        sinks: list[Sink],
+        queue_size: int = 1000,
+        overflow: str = RingBuffer.DROP_OLDEST,
+        block_timeout_s: float = 1.0,
+        labels: dict | None = None,
+    ):
+        self.channels = []
+        seen: dict[str, int] = {}
+        for sink in sinks:
+            seen[sink.name] = seen.get(sink.name, 0) + 1
+            name = sink.name if seen[sink.name] == 1 else f"{sink.name}#{seen[sink.name]}"
+            self.channels.append(
+                SinkChannel(
+                    sink, queue_size, sink.overflow or overflow, block_timeout_s, labels, name
+                )
+            )
+
+    def start(self) -> "FanOutWriter":
+        for channel in self.channels:
+            channel.start()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
+
+    def write_rows(self, rows: list[str]):
+        """Serialize formatted rows (without newlines) once, and queue them for every sink."""
+        if rows:
+            self.write(("\n".join(rows) + "\n").encode(), len(rows))
+
+    def write(self, payload: bytes, samples: int):
+        """Queue already serialized rows for every sink."""
+        self.write_block(Block(payload=payload, samples=samples))
+
+    def write_block(self, block: Block):
+        for channel in self.channels:
+            channel.put(block, block.samples)
+
+    def publish(self, payload: str, subtopic: str):
+        """Queue a payload of an MQTT subtopic for every sink with `messages`."""
+        for channel in self.channels:
+            if channel.sink.messages:
+                channel.put((subtopic, payload), 0)
+
+    def sync(self, timeout: float | None = None) -> bool:
+        """Wait until every sink handled what was queued so far."""
+        return all([channel.sync(timeout) for channel in self.channels])
+
+    def close(self, timeout: float | None = 5.0):
+        for channel in self.channels:
+            channel.close(timeout)
+
+    def stats(self) -> dict[str, dict]:
+        return {channel.name: channel.stats() for channel in self.channels}
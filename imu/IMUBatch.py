@@ -0,0 +1,152 @@
+import numpy as np
+
+from .IMUData import IMUData
+
+FIELDS = (
+    "counter",
+    "capture_time_ms",
+    "recorded_at_time_ms",
+    "accel_x",
+    "accel_y",
+    "accel_z",
+    "gyro_x",
+    "gyro_y",
+    "gyro_z",
+    "mag_x",
+    "mag_y",
+    "mag_z",
+    "yaw",
+    "pitch",
+    "roll",
+)
+
+CSV_HEADER = ",".join(FIELDS) + ",device_id\n"
+
+# Explicitly little-endian so the in-memory layout can be written to disk as is
+IMU_DTYPE = np.dtype(
+    [(name, "<i8") for name in FIELDS[:3]] + [(name, "<f8") for name in FIELDS[3:]]
+)
+
+
+def format_rows(records: np.ndarray, device_id: int) -> list[str]:
+    """Format structured records as CSV/MQTT rows in `FIELDS` order plus device_id."""
+    row_format = ",".join(["%s"] * len(FIELDS)) + f",{device_id}"
+    # Widen to IMU_DTYPE first so float32 records print like float64 samples,
+    # then a single tolist() converts the whole block to Python scalars at once
+    return [row_format % values for values in records.astype(IMU_DTYPE).tolist()]
+
+
+class IMUBatch:
+    """Columnar block of IMU samples backed by a preallocated NumPy structured array.
+
+    Samples are appended in place, so a batch can be cleared and refilled without
+    allocating. Indexing returns an `IMUData` for single-sample consumers.
+    """
+
+    def __init__(self, capacity: int = 256):
+        if capacity < 1:
+            raise ValueError("IMUBatch capacity must be at least 1.")
+
+        self.data = np.zeros(capacity, dtype=IMU_DTYPE)
+        self.size = 0
+
+    @classmethod
+    def from_samples(cls, samples) -> "IMUBatch":
+        samples = list(samples)
+        batch = cls(max(len(samples), 1))
+        for data in samples:
+            batch.append(data)
+
+        return batch
+
+    @classmethod
+    def from_array(cls, array: np.ndarray) -> "IMUBatch":
+        batch = cls(max(len(array), 1))
+        batch.extend(array)
+        return batch
+
+    @property
+    def capacity(self) -> int:
+        return len(self.data)
+
+    @property
+    def full(self) -> bool:
+        return self.size == len(self.data)
+
+    @property
+    def samples(self) -> np.ndarray:
+        """View of the filled part of the batch"""
+        return self.data[: self.size]
+
+    def column(self, name: str) -> np.ndarray:
+        return self.data[name][: self.size]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index: int) -> IMUData:
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("IMUBatch index out of range")
+
+        return IMUData(*self.data[index].item())
+
+    def __iter__(self):
+        for values in self.samples.tolist():
+            yield IMUData(*values)
+
+    def clear(self):
+        self.size = 0
+
+    def append_values(self, *values):
+        """Append one sample given as values in `FIELDS` order."""
+        if self.size == len(self.data):
+            self._grow()
+
+        self.data[self.size] = values
+        self.size += 1
+
+    def append(self, data: IMUData):
+        self.append_values(
+            data.counter,
+            data.capture_time_ms,
+            data.recorded_at_time_ms,
+            data.accel_x,
+            data.accel_y,
+            data.accel_z,
+            data.gyro_x,
+            data.gyro_y,
+            data.gyro_z,
+            data.mag_x,
+            data.mag_y,
+            data.mag_z,
+            data.yaw,
+            data.pitch,
+            data.roll,
+        )
+
+    def reserve(self, n: int) -> np.ndarray:
+        """
+        Claim the next `n` rows and return them as a view to fill in place.
+        Their content is undefined until written.
+        """
+        while self.size + n > len(self.data):
+            self._grow()
+
+        view = self.data[self.size : self.size + n]
+        self.size += n
+        return view
+
+    def extend(self, array: np.ndarray):
+        """Append a structured array of `IMU_DTYPE` samples in one copy."""
+        while self.size + len(array) > len(self.data):
+            self._grow()
+
+        self.data[self.size : self.size + len(array)] = array
+        self.size += len(array)
+
+    def _grow(self):
+        data = np.zeros(len(self.data) * 2, dtype=IMU_DTYPE)
+        data[: self.size] = self.data[: self.size]
+        self.data = data
@@ -3,9 +3,12 @@ from dataclasses import dataclass
 from typing_extensions import override
 
 
-@dataclass
+@dataclass(slots=True)
 class IMUData:
-    """Convenience class for keeping data read from the IMU"""
+    """Convenience class for keeping data read from the IMU
+
+    For blocks of samples, see `IMUBatch`.
+    """
 
     counter: int
     capture_time_ms: int
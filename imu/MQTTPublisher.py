@@ -0,0 +1,266 @@
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from threading import Event, Thread
+from typing import Callable
+
+from .RingBuffer import RingBuffer
+
+# Subtopics below `<client type>/<device_id>`, which carries the samples
+STATUS_TOPIC = "status"
+SPECTRUM_TOPIC = "spectrum"
+QUALITY_TOPIC = "quality"
+CLOCK_TOPIC = "clock"
+
+
+@dataclass
+class MQTTOptions:
+    """How a `DataWriter` publishes on MQTT"""
+
+    # Samples per payload, the longest a partial batch waits, and its `encode_batch` encoding
+    batch_size: int = 1
+    batch_ms: float | None = None
+    encoding: str = "csv"
+    # False publishes only the subtopics, not the samples
+    raw: bool = True
+    # Publish from an `AsyncPublisher`, with its queue and spill file
+    asynchronous: bool = False
+    queue_size: int = 1000
+    spill_fname: str | None = None
+    spill_max_bytes: int | None = 100_000_000
+    # A metrics snapshot on the status subtopic this often
+    status_every_s: float | None = None
+
+
+def publish_to(client, payload: str, subtopic: str | None = None):
+    """Publish on the client's `<client type>/<device_id>` topic, or `subtopic` below it"""
+    if subtopic is None:
+        client.publish(payload)
+    elif isinstance(client, AsyncPublisher):
+        client.publish(payload, subtopic)
+    else:
+        # `Client.publish` only knows the device topic
+        client.mqtt.publish(f"{client.client_type}/{client.device_id}/{subtopic}", payload)
+
+
+class AsyncPublisher:
+    """Publishes MQTT payloads from a background thread.
+
+    `publish` only queues the payload in a bounded ring buffer, so a slow or
+    unreachable broker never blocks the sampling loop. The publisher thread
+    (re)connects with exponential backoff using `connect`, which must return a
+    connected client with `publish(str)` and `disconnect()` (e.g. `Client`),
+    and for subtopics `client_type`, `device_id` and `mqtt` (see `publish_to`).
+
+    During an outage payloads wait in the queue, which drops them according to
+    `overflow` once full. With `spill_fname`, they are appended to that file
+    instead, up to `spill_max_bytes`, and replayed, in order, once the broker
+    is back.
+    """
+
+    def __init__(
+        self,
+        connect: Callable,
+        queue_size: int = 1000,
+        overflow: str = RingBuffer.DROP_OLDEST,
+        spill_fname: str | None = None,
+        spill_max_bytes: int | None = 100_000_000,
+        backoff_initial_s: float = 0.5,
+        backoff_max_s: float = 30.0,
+        connect_grace_s: float = 5.0,
+    ):
+        self.connect = connect
+        self.queue = RingBuffer(queue_size, overflow)
+        self.spill_fname = spill_fname
+        self.spill_max_bytes = spill_max_bytes
+        self.backoff_initial_s = backoff_initial_s
+        self.backoff_max_s = backoff_max_s
+        self.connect_grace_s = connect_grace_s
+
+        self.client = None
+        self._connected_at = 0.0
+        self._stop = Event()
+        self._closing = Event()
+        self._thread: Thread | None = None
+
+        self.sent = 0
+        self.failed = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.spill_dropped = 0
+        self.connects = 0
+        self.connect_failures = 0
+
+    @property
+    def connected(self) -> bool:
+        return self.client is not None and self._client_ready()
+
+    def start(self) -> "AsyncPublisher":
+        self._stop.clear()
+        self._closing.clear()
+        self._thread = Thread(target=self._run, name="mqtt-publisher", daemon=True)
+        self._thread.start()
+        return self
+
+    def publish(self, payload: str, subtopic: str | None = None) -> bool:
+        """Queue one payload. Never blocks unless the queue policy is `block`."""
+        return self.queue.put(payload if subtopic is None else (subtopic, payload))
+
+    def disconnect(self, timeout: float | None = 5.0):
+        """Stop the publisher thread after it sent (or spilled) what is queued."""
+        self.queue.close()
+        # Cut a reconnect backoff short, the thread spills or drops what is left
+        self._closing.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self._stop.set()
+        self._close_client()
+
+    def stats(self) -> dict[str, int]:
+        queue = self.queue.stats()
+        return {
+            "queued": queue["queued"],
+            "sent": self.sent,
+            "dropped": queue["dropped_oldest"] + queue["dropped_newest"],
+            "failed": self.failed,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "spill_dropped": self.spill_dropped,
+            "connects": self.connects,
+            "connect_failures": self.connect_failures,
+        }
+
+    def _run(self):
+        backoff = self.backoff_initial_s
+        while not self._stop.is_set():
+            if self.client is None:
+                if self._try_connect():
+                    backoff = self.backoff_initial_s
+                    self._replay_spill()
+                    continue
+
+                # Without a spill file, payloads wait in the bounded queue
+                if self.spill_fname or self.queue.closed:
+                    self._spill(self.queue.get_many(self.queue.capacity, timeout=0))
+                if self.queue.closed:
+                    return
+                self._closing.wait(backoff)
+                backoff = min(backoff * 2, self.backoff_max_s)
+                continue
+
+            if not self._client_ready():
+                if time.monotonic() - self._connected_at < self.connect_grace_s:
+                    self._stop.wait(0.05)
+                    continue
+                self._close_client()
+                continue
+
+            payloads = self.queue.get_many(64, timeout=0.1)
+            if not payloads:
+                if self.queue.closed:
+                    return
+                continue
+
+            for i, payload in enumerate(payloads):
+                try:
+                    self._send(payload)
+                    self.sent += 1
+                except Exception:
+                    self.failed += 1
+                    self._spill(payloads[i:])
+                    self._close_client()
+                    break
+
+    def _send(self, item: str | tuple[str, str]):
+        """Publish a queued item, a payload or a (subtopic, payload) pair"""
+        if isinstance(item, str):
+            self.client.publish(item)
+        else:
+            publish_to(self.client, item[1], item[0])
+
+    def _try_connect(self) -> bool:
+        try:
+            self.client = self.connect()
+        except Exception:
+            self.client = None
+            self.connect_failures += 1
+            return False
+
+        self.connects += 1
+        self._connected_at = time.monotonic()
+        return True
+
+    def _client_ready(self) -> bool:
+        # paho clients report their state; anything else is assumed connected
+        is_connected = getattr(getattr(self.client, "mqtt", None), "is_connected", None)
+        return is_connected is None or is_connected()
+
+    def _close_client(self):
+        client, self.client = self.client, None
+        if client is None:
+            return
+
+        try:
+            client.disconnect()
+        except Exception:
+            # Make sure a paho network thread doesn't outlive the client
+            mqtt = getattr(client, "mqtt", None)
+            try:
+                if mqtt is not None:
+                    mqtt.loop_stop()
+                    mqtt.disconnect()
+            except Exception:
+                pass
+
+    def _spill(self, payloads: list[str | tuple[str, str]]):
+        if not payloads:
+            return
+        if not self.spill_fname:
+            self.spill_dropped += len(payloads)
+            return
+
+        size = os.path.getsize(self.spill_fname) if os.path.exists(self.spill_fname) else 0
+        with open(self.spill_fname, "a") as f:
+            for payload in payloads:
+                # One JSON value per line, so payloads may contain newlines
+                line = json.dumps(payload) + "\n"
+                if self.spill_max_bytes is not None and size + len(line) > self.spill_max_bytes:
+                    self.spill_dropped += 1
+                    continue
+                f.write(line)
+                size += len(line)
+                self.spilled += 1
+
+    def _replay_spill(self):
+        if not self.spill_fname or not os.path.exists(self.spill_fname):
+            return
+
+        # Stream the file, it can be as big as `spill_max_bytes`
+        sent_bytes = 0
+        with open(self.spill_fname, "rb") as f:
+            for line in f:
+                item = json.loads(line)
+                try:
+                    self._send(item if isinstance(item, str) else tuple(item))
+                except Exception:
+                    self.failed += 1
+                    break
+                sent_bytes += len(line)
+                self.replayed += 1
+            else:
+                sent_bytes = None
+
+        if sent_bytes is None:
+            os.remove(self.spill_fname)
+            return
+
+        # Keep what wasn't replayed for the next connection
+        rest = self.spill_fname + ".rest"
+        with open(self.spill_fname, "rb") as src, open(rest, "wb") as dst:
+            src.seek(sent_bytes)
+            shutil.copyfileobj(src, dst, 1 << 20)
+        os.replace(rest, self.spill_fname)
+        self._close_client()
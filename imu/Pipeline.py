@@ -0,0 +1,287 @@
+import math
+import warnings
+from abc import ABC, abstractmethod
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .IMUBatch import FIELDS
+
+try:
+    from scipy.signal import lfilter
+except ImportError:
+    lfilter = None
+
+# Yaw/pitch/roll wrap around at +-180, so they are only filtered when asked for
+SENSOR_FIELDS = FIELDS[3:12]
+FIELD_GROUPS = {
+    "accel": ("accel_x", "accel_y", "accel_z"),
+    "gyro": ("gyro_x", "gyro_y", "gyro_z"),
+    "mag": ("mag_x", "mag_y", "mag_z"),
+    "ypr": ("yaw", "pitch", "roll"),
+}
+
+
+class Stage(ABC):
+    """One streaming processing step on blocks of IMU records.
+
+    Stages keep whatever state they need between blocks, so processing a
+    stream block by block gives the same output as sample by sample.
+    Only `fields` are changed, all other fields pass through.
+    """
+
+    def __init__(self, fields: tuple[str, ...] = SENSOR_FIELDS):
+        unknown = set(fields) - set(FIELDS[3:])
+        if unknown:
+            raise ValueError(f"Can't process fields {sorted(unknown)}.")
+
+        self.fields = tuple(fields)
+
+    @abstractmethod
+    def process(self, records: np.ndarray) -> np.ndarray:
+        """Return the processed records of one block (a new array)."""
+
+    def reset(self):
+        """Forget the state, e.g. before processing an unrelated stream."""
+
+    def _values(self, records: np.ndarray) -> np.ndarray:
+        """(N, len(fields)) float64 copy of the processed fields"""
+        return np.column_stack([records[name] for name in self.fields]).astype(np.float64)
+
+    def _with_values(self, records: np.ndarray, values: np.ndarray) -> np.ndarray:
+        out = records.copy()
+        for i, name in enumerate(self.fields):
+            out[name] = values[:, i]
+        return out
+
+
+class WindowStage(Stage):
+    """Applies a reduction over a sliding window of the last `window` samples.
+
+    Until `window` samples have been seen, the window holds all samples so far.
+    """
+
+    def __init__(self, window: int, fields: tuple[str, ...] = SENSOR_FIELDS):
+        super().__init__(fields)
+        if window < 1:
+            raise ValueError("Window must hold at least 1 sample.")
+
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        # NaN padding stands in for samples before the first one
+        self._history = np.full((self.window - 1, len(self.fields)), np.nan)
+
+    def process(self, records: np.ndarray) -> np.ndarray:
+        if not len(records):
+            return records.copy()
+
+        data = np.concatenate((self._history, self._values(records)))
+        self._history = data[len(data) - (self.window - 1) :]
+
+        # (N, fields, window) view of the window ending at every new sample
+        windows = sliding_window_view(data, self.window, axis=0)
+        with warnings.catch_warnings():
+            # All-NaN windows only come from NaN input, which stays NaN
+            warnings.simplefilter("ignore", RuntimeWarning)
+            values = self._reduce(windows)
+
+        return self._with_values(records, values)
+
+    @abstractmethod
+    def _reduce(self, windows: np.ndarray) -> np.ndarray:
+        """(N, fields, window) -> (N, fields)"""
+
+
+class MovingAverage(WindowStage):
+    def _reduce(self, windows):
+        return np.nanmean(windows, axis=2)
+
+
+class Median(WindowStage):
+    """Sliding median, which removes single-sample spikes"""
+
+    def _reduce(self, windows):
+        return np.nanmedian(windows, axis=2)
+
+
+class RollingFeature(WindowStage):
+    """Replaces each value with a feature of its sliding window: rms, peak, var"""
+
+    FEATURES = ("rms", "peak", "var")
+
+    def __init__(
+        self, feature: str, window: int, fields: tuple[str, ...] = SENSOR_FIELDS
+    ):
+        if feature not in self.FEATURES:
+            raise ValueError(f"Unknown feature {feature!r}, expected one of {self.FEATURES}")
+
+        self.feature = feature
+        super().__init__(window, fields)
+
+    def _reduce(self, windows):
+        if self.feature == "rms":
+            return np.sqrt(np.nanmean(windows * windows, axis=2))
+        if self.feature == "peak":
+            return np.nanmax(np.abs(windows), axis=2)
+        return np.nanvar(windows, axis=2)
+
+
+class Biquad(Stage):
+    """Second order IIR low-pass filter (RBJ cookbook), e.g. against vibration noise.
+
+    Uses scipy's `lfilter` when installed, otherwise a loop over the samples of
+    the block (vectorized over the fields).
+    """
+
+    def __init__(
+        self,
+        cutoff_hz: float,
+        sample_rate_hz: float = 100.0,
+        q: float = 1 / math.sqrt(2),
+        fields: tuple[str, ...] = SENSOR_FIELDS,
+    ):
+        super().__init__(fields)
+        if not 0 < cutoff_hz < sample_rate_hz / 2:
+            raise ValueError("Cutoff must be between 0 and half the sample rate.")
+
+        w0 = 2 * math.pi * cutoff_hz / sample_rate_hz
+        alpha = math.sin(w0) / (2 * q)
+        cos_w0 = math.cos(w0)
+        a0 = 1 + alpha
+        self.b = np.array([(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2]) / a0
+        self.a = np.array([1.0, -2 * cos_w0 / a0, (1 - alpha) / a0])
+        self.reset()
+
+    def reset(self):
+        self._state: np.ndarray | None = None
+
+    def process(self, records: np.ndarray) -> np.ndarray:
+        if not len(records):
+            return records.copy()
+
+        x = self._values(records)
+        finite = np.isfinite(x)
+        if self._state is None:
+            # NaN marks fields that haven't had a finite sample yet
+            self._state = np.full((2, x.shape[1]), np.nan)
+        unseeded = np.isnan(self._state[0]) & finite.any(axis=0)
+        if unseeded.any():
+            # Start settled on the first finite sample instead of ringing up from 0,
+            # e.g. mag reports arriving after the first accel/gyro reports
+            first = x[finite.argmax(axis=0), np.arange(x.shape[1])]
+            self._state[:, unseeded] = np.outer(self._steady_state(), first[unseeded])
+
+        if finite.all() and lfilter is not None:
+            y, self._state = lfilter(self.b, self.a, x, axis=0, zi=self._state)
+        else:
+            y = np.empty_like(x)
+            b0, b1, b2 = self.b
+            _, a1, a2 = self.a
+            z1, z2 = self._state
+            # Transposed direct form II, same state layout as lfilter. Non-finite
+            # samples pass through as NaN and leave the state alone.
+            for i, (sample, ok) in enumerate(zip(x, finite)):
+                out = b0 * sample + z1
+                z1 = np.where(ok, b1 * sample - a1 * out + z2, z1)
+                z2 = np.where(ok, b2 * sample - a2 * out, z2)
+                y[i] = np.where(ok, out, np.nan)
+            self._state = np.array([z1, z2])
+
+        return self._with_values(records, y)
+
+    def _steady_state(self) -> np.ndarray:
+        """State for a constant input of 1, which the low-pass outputs as 1"""
+        b0, b1, b2 = self.b
+        _, a1, a2 = self.a
+        z2 = b2 - a2
+        z1 = b1 - a1 + z2
+        return np.array([z1, z2])
+
+
+class Decimate(Stage):
+    """Keeps every `factor`-th sample. Put a low-pass before it against aliasing."""
+
+    def __init__(self, factor: int):
+        super().__init__(())
+        if factor < 1:
+            raise ValueError("Decimation factor must be at least 1.")
+
+        self.factor = factor
+        self.reset()
+
+    def reset(self):
+        self._phase = 0
+
+    def process(self, records: np.ndarray) -> np.ndarray:
+        start = (-self._phase) % self.factor
+        self._phase = (self._phase + len(records)) % self.factor
+        return records[start :: self.factor].copy()
+
+
+class Pipeline:
+    """Runs blocks of IMU records through a chain of stages, in order."""
+
+    def __init__(self, stages: list[Stage]):
+        self.stages = list(stages)
+        self.samples_in = 0
+        self.samples_out = 0
+
+    def process(self, records: np.ndarray) -> np.ndarray:
+        self.samples_in += len(records)
+        for stage in self.stages:
+            records = stage.process(records)
+        self.samples_out += len(records)
+        return records
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+
+    @classmethod
+    def from_spec(cls, spec: str, sample_rate_hz: float = 100.0) -> "Pipeline":
+        """
+        Build a pipeline from comma separated stages, each `<stage>:<arg>`,
+        optionally followed by `@<fields>` (groups accel, gyro, mag, ypr or
+        field names, joined with `+`). Default fields are accel, gyro and mag.
+
+            ma:<window>       moving average
+            median:<window>   sliding median
+            lowpass:<hz>      biquad low-pass
+            decimate:<factor> keep every factor-th sample
+            rms:<window>, peak:<window>, var:<window>  rolling features
+
+        e.g. `median:5,lowpass:10@accel+gyro,decimate:4`
+        """
+        stages = []
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            stage_spec, _, fields_spec = item.partition("@")
+            name, _, arg = stage_spec.partition(":")
+            if not arg:
+                raise ValueError(f"Stage {item!r} needs an argument, e.g. {name}:10")
+
+            fields = _parse_fields(fields_spec) if fields_spec else SENSOR_FIELDS
+            if name == "ma":
+                stages.append(MovingAverage(int(arg), fields))
+            elif name == "median":
+                stages.append(Median(int(arg), fields))
+            elif name == "lowpass":
+                stages.append(Biquad(float(arg), sample_rate_hz, fields=fields))
+            elif name == "decimate":
+                stages.append(Decimate(int(arg)))
+                # Later stages run at the lower rate
+                sample_rate_hz /= int(arg)
+            elif name in RollingFeature.FEATURES:
+                stages.append(RollingFeature(name, int(arg), fields))
+            else:
+                raise ValueError(f"Unknown processing stage {name!r} in {item!r}.")
+
+        return cls(stages)
+
+
+def _parse_fields(spec: str) -> tuple[str, ...]:
+    fields = []
+    for name in spec.split("+"):
+        fields += FIELD_GROUPS.get(name, (name,))
+    return tuple(fields)
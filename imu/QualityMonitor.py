@@ -0,0 +1,211 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from .IMUBatch import FIELDS
+
+SENSOR_FIELDS = FIELDS[3:]
+
+# Per sample flags of `QualityMonitor.check`
+DUPLICATE = 1
+STALE = 2
+GAP = 4
+
+REPORT = "report"
+MARK = "mark"
+DROP = "drop"
+ACTIONS = (REPORT, MARK, DROP)
+
+
+@dataclass
+class QualityOptions:
+    """What a `DataWriter` does about data quality, see `QualityMonitor`"""
+
+    action: str = REPORT
+    window_s: float = 10.0
+
+    def __post_init__(self):
+        if self.action not in ACTIONS:
+            raise ValueError(
+                f"Unknown quality action {self.action!r}, expected one of {ACTIONS}"
+            )
+
+
+@dataclass
+class QualityWindow:
+    """Data quality of the samples captured in [start_ms, end_ms)"""
+
+    start_ms: int
+    end_ms: int
+    samples: int
+    # Samples identical to the one before, i.e. no new sensor reading
+    duplicates: int
+    # Duplicates in a run of at least `stale_samples`, i.e. the sensor stopped
+    stale: int
+    # Sample intervals above `gap_factor` times the expected interval
+    gaps: int
+    max_gap_ms: int
+    # Samples skipped according to the counter
+    missing: int
+
+    @property
+    def rate_hz(self) -> float:
+        duration_ms = self.end_ms - self.start_ms
+        return self.samples * 1000 / duration_ms if duration_ms > 0 else 0.0
+
+    @property
+    def duplicate_ratio(self) -> float:
+        return self.duplicates / self.samples if self.samples else 0.0
+
+
+class QualityMonitor:
+    """Finds duplicate and stale readings and timing gaps in the sample stream.
+
+    Samples are compared with the one before them, across blocks. With
+    `action`:
+
+    - `report`: only count, in windows of `window_s` seconds of capture time
+    - `mark`: also replace the sensor values of duplicates with NaN, keeping
+      the counter and timestamps, so repeated readings aren't mistaken for data
+    - `drop`: also remove duplicates from the stream
+    """
+
+    def __init__(
+        self,
+        expected_interval_ms: float = 10.0,
+        action: str = REPORT,
+        window_s: float = 10.0,
+        gap_factor: float = 1.5,
+        stale_samples: int = 10,
+    ):
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown quality action {action!r}, expected one of {ACTIONS}")
+
+        self.expected_interval_ms = expected_interval_ms
+        self.action = action
+        self.window_ms = int(window_s * 1000)
+        self.gap_ms = gap_factor * expected_interval_ms
+        self.stale_samples = stale_samples
+
+        self._previous: dict | None = None
+        self._run = 0
+        self._window: QualityWindow | None = None
+        self._last_time = 0
+
+        self.samples = 0
+        self.duplicates = 0
+        self.stale = 0
+        self.gaps = 0
+        self.missing = 0
+        self.dropped = 0
+
+    def check(self, records: np.ndarray) -> np.ndarray:
+        """Flags (DUPLICATE, STALE, GAP) of every record, continuing from the last block"""
+        flags = np.zeros(len(records), dtype=np.uint8)
+        if not len(records):
+            return flags
+
+        values = np.column_stack([records[name] for name in SENSOR_FIELDS])
+        times = records["capture_time_ms"]
+        if self._previous is None:
+            previous = np.concatenate(([values[0] + 1], values[:-1]))
+            previous_times = np.concatenate(([times[0]], times[:-1]))
+        else:
+            previous = np.concatenate(([self._previous["values"]], values[:-1]))
+            previous_times = np.concatenate(([self._previous["time"]], times[:-1]))
+
+        same = np.all((values == previous) | (np.isnan(values) & np.isnan(previous)), axis=1)
+        flags[same] |= DUPLICATE
+
+        # Length of the run of duplicates every sample ends
+        index = np.arange(len(records))
+        last_new = np.maximum.accumulate(np.where(same, -1, index))
+        run = np.where(last_new >= 0, index - last_new, self._run + index + 1)
+        flags[same & (run >= self.stale_samples)] |= STALE
+
+        flags[times - previous_times > self.gap_ms] |= GAP
+
+        self._run = int(run[-1])
+        self._previous = {
+            "values": values[-1],
+            "time": times[-1],
+            "counter": records["counter"][-1],
+        }
+        return flags
+
+    def process(self, records: np.ndarray) -> tuple[np.ndarray, list[QualityWindow]]:
+        """Check a block, return the records to pass on and the windows that completed."""
+        last_counter = None if self._previous is None else self._previous["counter"]
+        flags = self.check(records)
+        windows = self._account(records, flags, last_counter)
+
+        duplicate = (flags & DUPLICATE) != 0
+        if self.action == DROP and duplicate.any():
+            self.dropped += int(duplicate.sum())
+            records = records[~duplicate]
+        elif self.action == MARK and duplicate.any():
+            records = records.copy()
+            for name in SENSOR_FIELDS:
+                records[name][duplicate] = np.nan
+        return records, windows
+
+    def flush(self) -> QualityWindow | None:
+        """The incomplete last window, e.g. at the end of a recording."""
+        window, self._window = self._window, None
+        if window is not None and window.samples:
+            return window
+        return None
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "samples": self.samples,
+            "duplicates": self.duplicates,
+            "stale": self.stale,
+            "gaps": self.gaps,
+            "missing": self.missing,
+            "dropped": self.dropped,
+        }
+
+    def _account(self, records, flags, last_counter) -> list[QualityWindow]:
+        if not len(records):
+            return []
+
+        times = records["capture_time_ms"]
+        counters = records["counter"]
+        steps = np.diff(counters, prepend=counters[0] if last_counter is None else last_counter)
+        missing = np.where(steps > 1, steps - 1, 0)
+        intervals = np.diff(times, prepend=times[0] if self._window is None else self._last_time)
+        self._last_time = times[-1]
+
+        self.samples += len(records)
+        self.duplicates += int(np.count_nonzero(flags & DUPLICATE))
+        self.stale += int(np.count_nonzero(flags & STALE))
+        self.gaps += int(np.count_nonzero(flags & GAP))
+        self.missing += int(missing.sum())
+
+        windows = []
+        start = 0
+        while start < len(records):
+            if self._window is None:
+                begin = int(times[start])
+                self._window = QualityWindow(begin, begin + self.window_ms, 0, 0, 0, 0, 0, 0)
+            # Samples up to the end of the current window
+            end = start + int(np.searchsorted(times[start:], self._window.end_ms, side="left"))
+            part = slice(start, end)
+            window = self._window
+            window.samples += end - start
+            window.duplicates += int(np.count_nonzero(flags[part] & DUPLICATE))
+            window.stale += int(np.count_nonzero(flags[part] & STALE))
+            window.gaps += int(np.count_nonzero(flags[part] & GAP))
+            window.missing += int(missing[part].sum())
+            if end > start:
+                window.max_gap_ms = max(window.max_gap_ms, int(intervals[part].max()))
+
+            if end < len(records):
+                windows.append(window)
+                # The next window starts on the grid, skipping empty windows
+                skipped = (int(times[end]) - window.end_ms) // self.window_ms
+                begin = window.end_ms + skipped * self.window_ms
+                self._window = QualityWindow(begin, begin + self.window_ms, 0, 0, 0, 0, 0, 0)
+            start = end
+        return windows
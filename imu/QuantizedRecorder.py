@@ -0,0 +1,282 @@
+from collections.abc import Iterator
+import struct
+import zlib
+
+import numpy as np
+
+from .BinaryRecorder import HEADER, SCHEMA_VERSION
+from .IMUBatch import CSV_HEADER, FIELDS, IMU_DTYPE, IMUBatch, format_rows
+from .IMUData import IMUData
+
+MAGIC = b"IMUQ"
+
+# Resolution of every sensor field: the BNO08X's Q-point fixed steps (accel Q8 m/s²,
+# gyro Q9 rad/s, mag Q4 uT) and the 3 decimals yaw/pitch/roll are rounded to
+STEPS = {
+    **dict.fromkeys(("accel_x", "accel_y", "accel_z"), 2.0**-8),
+    **dict.fromkeys(("gyro_x", "gyro_y", "gyro_z"), 2.0**-9),
+    **dict.fromkeys(("mag_x", "mag_y", "mag_z"), 2.0**-4),
+    **dict.fromkeys(("yaw", "pitch", "roll"), 1e-3),
+}
+# Delta order per field: counter and timestamps move steadily, so their
+# second difference is mostly zero, sensor values are mostly unchanged
+ORDERS = {**dict.fromkeys(FIELDS[:3], 2), **dict.fromkeys(FIELDS[3:], 1)}
+
+# Quantized stand-in for NaN (and other non-finite values)
+NAN_CODE = np.iinfo(np.int64).min
+
+# body bytes, sample count, flags
+BLOCK = struct.Struct("<IIB")
+COMPRESSED = 1
+
+_WIDTHS = (1, 2, 4, 8)
+
+
+def quantize(records: np.ndarray) -> np.ndarray:
+    """(N, len(FIELDS)) int64 of the records, sensor values in steps of `STEPS`"""
+    out = np.empty((len(records), len(FIELDS)), dtype=np.int64)
+    for i, name in enumerate(FIELDS):
+        column = records[name]
+        if name in STEPS:
+            finite = np.isfinite(column)
+            out[:, i] = np.where(finite, np.round(np.where(finite, column, 0) / STEPS[name]), 0)
+            out[~finite, i] = NAN_CODE
+        else:
+            out[:, i] = column
+    return out
+
+
+def dequantize(quantized: np.ndarray) -> np.ndarray:
+    records = np.zeros(len(quantized), dtype=IMU_DTYPE)
+    for i, name in enumerate(FIELDS):
+        column = quantized[:, i]
+        if name in STEPS:
+            records[name] = np.where(column == NAN_CODE, np.nan, column * STEPS[name])
+            if name in ("yaw", "pitch", "roll"):
+                # 0.001 isn't exact in binary, round like the source does
+                records[name] = np.round(records[name], 3)
+        else:
+            records[name] = column
+    return records
+
+
+def encode_block(records: np.ndarray, compress: bool = True) -> bytes:
+    """Quantize, delta and run-length encode a block of records, independent of other blocks.
+
+    Per field: the first value as int64, then the differences (second
+    differences for counter and timestamps) of the following values, as a
+    bitmap of which are nonzero followed by the nonzero ones at the smallest
+    integer width that holds them. Runs of unchanged readings cost one bit per
+    sample. With `compress`, the body is zlib compressed when that is smaller.
+    """
+    quantized = quantize(records)
+    parts = []
+    for i, name in enumerate(FIELDS):
+        column = quantized[:, i]
+        if not len(column):
+            break
+        residuals = np.diff(column)
+        for _ in range(ORDERS[name] - 1):
+            residuals = np.diff(residuals, prepend=0)
+        nonzero = residuals != 0
+        values = residuals[nonzero]
+
+        parts.append(struct.pack("<q", column[0]))
+        if not len(values):
+            parts.append(b"\0")
+            continue
+        width = next(w for w in _WIDTHS if _fits(values, w))
+        parts.append(bytes((width,)))
+        parts.append(np.packbits(nonzero).tobytes())
+        parts.append(values.astype(f"<i{width}").tobytes())
+
+    body = b"".join(parts)
+    flags = 0
+    if compress:
+        compressed = zlib.compress(body)
+        if len(compressed) < len(body):
+            body, flags = compressed, COMPRESSED
+    return BLOCK.pack(len(body), len(records), flags) + body
+
+
+def decode_block(data: bytes, offset: int = 0) -> tuple[np.ndarray, int]:
+    """Decode the block at `offset`, return its records and the offset after it."""
+    size, count, flags = BLOCK.unpack_from(data, offset)
+    start = offset + BLOCK.size
+    body = bytes(data[start : start + size])
+    if len(body) < size:
+        raise ValueError("Truncated quantized block.")
+    if flags & COMPRESSED:
+        body = zlib.decompress(body)
+
+    quantized = np.zeros((count, len(FIELDS)), dtype=np.int64)
+    position = 0
+    bitmap_bytes = (count - 1 + 7) // 8
+    for i, name in enumerate(FIELDS):
+        if not count:
+            break
+        (first,) = struct.unpack_from("<q", body, position)
+        width = body[position + 8]
+        position += 9
+
+        residuals = np.zeros(count - 1, dtype=np.int64)
+        if width:
+            bitmap = np.frombuffer(body, np.uint8, bitmap_bytes, position)
+            nonzero = np.unpackbits(bitmap, count=count - 1).astype(bool)
+            position += bitmap_bytes
+            n = int(nonzero.sum())
+            residuals[nonzero] = np.frombuffer(body, f"<i{width}", n, position)
+            position += n * width
+
+        for _ in range(ORDERS[name] - 1):
+            residuals = np.cumsum(residuals)
+        quantized[0, i] = first
+        quantized[1:, i] = first + np.cumsum(residuals)
+
+    return dequantize(quantized), start + size
+
+
+def _fits(values: np.ndarray, width: int) -> bool:
+    info = np.iinfo(f"i{width}")
+    return info.min <= values.min() and values.max() <= info.max
+
+
+class QuantizedRecorder:
+    """Appends IMU samples to a quantized, delta encoded and compressed recording.
+
+    The file is the `BinaryRecorder` header with magic `IMUQ`, followed by
+    `encode_block` blocks of up to `chunk_size` samples. Sensor values are
+    kept to the resolution in `STEPS`, which is all the BNO08X reports.
+    """
+
+    def __init__(
+        self,
+        fname: str,
+        device_id: int = 0,
+        chunk_size: int = 256,
+        compress: bool = True,
+    ):
+        self.fname = fname
+        self.device_id = device_id
+        self.compress = compress
+
+        self._chunk = IMUBatch(chunk_size)
+        self.file = None
+        self.records_written = 0
+        self.bytes_written = 0
+
+    def header(self) -> bytes:
+        return HEADER.pack(MAGIC, SCHEMA_VERSION, HEADER.size, self.device_id, 0, 0)
+
+    def open(self, file=None) -> "QuantizedRecorder":
+        """Open `fname`, or record into an already open `file` that wrote the header."""
+        if file is None:
+            file = open(self.fname, "wb")
+            file.write(self.header())
+        self.file = file
+        return self
+
+    def close(self):
+        if self.file:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
+
+    def write_data(self, data: IMUData):
+        if self._chunk.full:
+            self.flush()
+        self._chunk.append(data)
+
+    def write_batch(self, batch: IMUBatch):
+        self.write_records(batch.samples)
+
+    def write_records(self, samples: np.ndarray):
+        """Append structured `IMU_DTYPE` records."""
+        while len(samples):
+            if self._chunk.full:
+                self.flush()
+
+            n = min(len(samples), self._chunk.capacity - len(self._chunk))
+            self._chunk.extend(samples[:n])
+            samples = samples[n:]
+
+    def flush(self):
+        """Encode the staged samples as one block and write it."""
+        if len(self._chunk):
+            block = encode_block(self._chunk.samples, self.compress)
+            self.file.write(block)
+            self.records_written += len(self._chunk)
+            self.bytes_written += len(block)
+            self._chunk.clear()
+
+        self.file.flush()
+
+
+def read_quantized(fname: str) -> tuple[dict[str, int], np.ndarray]:
+    """
+    Decode a quantized recording into IMU_DTYPE records.
+    A partially written last block (e.g. after a power cut) is ignored.
+    """
+    with open(fname, "rb") as f:
+        return decode_recording(f.read(), fname)
+
+
+def decode_recording(data: bytes, fname: str = "recording") -> tuple[dict[str, int], np.ndarray]:
+    """Decode the contents of a quantized recording, see `read_quantized`."""
+    if len(data) < HEADER.size:
+        raise ValueError(f"{fname} is too short to be an IMU recording.")
+    magic, version, header_size, device_id, _, _ = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{fname} is not a quantized IMU recording.")
+    if version > SCHEMA_VERSION:
+        raise ValueError(
+            f"{fname} uses schema version {version}, newer than supported ({SCHEMA_VERSION})."
+        )
+
+    blocks = []
+    offset = header_size
+    while offset + BLOCK.size <= len(data):
+        try:
+            records, offset = decode_block(data, offset)
+        except (ValueError, zlib.error):
+            break
+        blocks.append(records)
+
+    header = {"schema_version": version, "header_size": header_size, "device_id": device_id}
+    return header, np.concatenate(blocks) if blocks else np.zeros(0, dtype=IMU_DTYPE)
+
+
+def read_blocks(file) -> Iterator[np.ndarray]:
+    """
+    Decode the blocks of an open quantized recording one at a time, from the
+    current position (after the header). Stops at a partially written block.
+    """
+    while True:
+        head = file.read(BLOCK.size)
+        if len(head) < BLOCK.size:
+            return
+        body = file.read(BLOCK.unpack(head)[0])
+        try:
+            records, _ = decode_block(head + body)
+        except (ValueError, zlib.error):
+            return
+        yield records
+
+
+def quantized_to_csv(src: str, dst: str) -> int:
+    """Convert a quantized recording to the CSV schema. Returns the number of rows."""
+    header, records = read_quantized(src)
+
+    with open(dst, "w") as out:
+        out.write(CSV_HEADER)
+        if len(records):
+            out.write("\n".join(format_rows(records, header["device_id"])) + "\n")
+
+    return len(records)
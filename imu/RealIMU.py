@@ -10,55 +10,110 @@ from adafruit_bno08x import (
     BNO_REPORT_MAGNETOMETER,
     BNO_REPORT_ROTATION_VECTOR,
     PacketError,
+    _separate_batch,
 )
 from adafruit_bno08x.i2c import BNO08X_I2C
 from typing_extensions import override
 
 from .BaseIMU import BaseIMU
+from .IMUBatch import IMUBatch
 from .IMUData import IMUData
+from .Metrics import METRICS
+from .ReportFIFO import ReportFIFO
+from .TimeAligner import HOLD
+
+# Channel names used for per-channel options
+CHANNEL_REPORTS = {
+    "accel": BNO_REPORT_LINEAR_ACCELERATION,
+    "gyro": BNO_REPORT_GYROSCOPE,
+    "mag": BNO_REPORT_MAGNETOMETER,
+    "rotation": BNO_REPORT_ROTATION_VECTOR,
+}
 
 
 class BNO08X_YPR(BNO08X_I2C, BaseIMU):
     def __init__(
         self,
         *args,
-        report_interval_ms=10,
+        address: int | None = None,
+        report_interval_ms: float = 10,
+        batch_mode: bool = False,
+        channel_intervals_ms: dict[str, float] | None = None,
+        align: str = HOLD,
+        align_interval_ms: float | None = None,
         **kwargs,
     ):
+        """
+        address: I2C address of the IMU, by default 0x4B and then 0x4A
+        report_interval_ms: how often the IMU produces each report, below 10 ms
+        needs `batch_mode` to keep every sample
+        batch_mode: keep every queued report with its own timestamp, read them
+        with `read_available`
+        channel_intervals_ms: report interval per channel (accel, gyro, mag,
+        rotation) instead of report_interval_ms
+        align: how batch mode aligns the channels, see `TimeAligner`
+        align_interval_ms: batch mode emits samples on this fixed grid instead
+        of one per rotation vector report
+        """
         BaseIMU.__init__(self)
-        self._yaw_offset = 0.0
-        self._pitch_offset = 0.0
-        self._roll_offset = 0.0
+        imu = f"{0x4B if address is None else address:#04x}"
+        self._read_time = METRICS.histogram(
+            "imu_read_seconds",
+            "Time to read one sample, or drain one FIFO wakeup, over I2C",
+            imu=imu,
+        )
+        self._packets = METRICS.counter(
+            "imu_packets_total", "Sensor packets processed", imu=imu
+        )
+        self._packet_errors = METRICS.counter(
+            "imu_packet_errors_total", "Unreadable packets", imu=imu, error="packet"
+        )
+        self._batch_errors = METRICS.counter(
+            "imu_packet_errors_total", "Unreadable packets", imu=imu, error="unprocessable_batch"
+        )
+        self._fifo: ReportFIFO | None = None
+        if batch_mode:
+            self._fifo = ReportFIFO(
+                BNO_REPORT_LINEAR_ACCELERATION,
+                BNO_REPORT_GYROSCOPE,
+                BNO_REPORT_MAGNETOMETER,
+                BNO_REPORT_ROTATION_VECTOR,
+                method=align,
+                interval_ms=align_interval_ms,
+            )
+
+        intervals_ms = {
+            BNO_REPORT_LINEAR_ACCELERATION: report_interval_ms,
+            BNO_REPORT_GYROSCOPE: report_interval_ms,
+            BNO_REPORT_MAGNETOMETER: report_interval_ms,
+            BNO_REPORT_ROTATION_VECTOR: report_interval_ms,
+        }
+        for name, interval_ms in (channel_intervals_ms or {}).items():
+            intervals_ms[CHANNEL_REPORTS[name]] = interval_ms
 
         # The BNO08X can be at either address 0x4A or 0x4B
         # The adafruit library expects 0x4A, but we typically use 0x4B
         try:
-            super().__init__(address=0x4B, *args, **kwargs)
+            super().__init__(
+                address=0x4B if address is None else address, *args, **kwargs
+            )
         except ValueError as _:
             try:
+                if address is not None:
+                    raise
                 super().__init__(*args, **kwargs)
             except ValueError as _:
                 print(
-                    "Could not establish connection to the IMU.\n"
-                    + "Please check the physical connection!"
+                    "Could not establish connection to the IMU"
+                    + ("" if address is None else f" at {address:#04x}")
+                    + ".\nPlease check the physical connection!"
                 )
 
         try:
             # report_interval is in microseconds
             # the library's default is 50ms, but ours is 10ms
-            self.enable_feature(
-                BNO_REPORT_LINEAR_ACCELERATION,
-                report_interval=report_interval_ms * 1000,
-            )
-            self.enable_feature(
-                BNO_REPORT_GYROSCOPE, report_interval=report_interval_ms * 1000
-            )
-            self.enable_feature(
-                BNO_REPORT_MAGNETOMETER, report_interval=report_interval_ms * 1000
-            )
-            self.enable_feature(
-                BNO_REPORT_ROTATION_VECTOR, report_interval=report_interval_ms * 1000
-            )
+            for feature, interval_ms in intervals_ms.items():
+                self.enable_feature(feature, report_interval=int(interval_ms * 1000))
 
             print("IMU connection successfully initialized")
         except RuntimeError as e:
@@ -76,25 +131,24 @@ class BNO08X_YPR(BNO08X_I2C, BaseIMU):
                 + f"{feature_names[e.args[1]] if e.args[1] in feature_names else e.args[1]}"
             )
 
-    def read_data(self) -> IMUData:
+    def _read_values(self) -> tuple:
         """
         Read accelerometer, gyroscope, magnetometer, and orientation data from the IMU
 
-        start_time: The first value of time.perf_counter_ns before this function is run
+        Returns the values in IMUData field order, without the counter
         """
+        # Every property below drains the queue again, time them as one read
+        start = time.perf_counter_ns()
         self._process_available_packets()
 
         capture_time_ms = int(time.time_ns() / 1e6)
         accel_x, accel_y, accel_z = self.linear_acceleration
         gyro_x, gyro_y, gyro_z = self.gyro
         mag_x, mag_y, mag_z = self.magnetic
-        rot_y, rot_p, rot_r = self._quat_to_ypr(self.quaternion)
-        rot_y = self._wrap_angle(rot_y - self._yaw_offset)
-        rot_p = self._wrap_angle(rot_p - self._pitch_offset)
-        rot_r = self._wrap_angle(rot_r - self._roll_offset)
+        rot_y, rot_p, rot_r = self._tared_ypr(self.quaternion)
+        self._read_time.since(start)
 
-        return IMUData(
-            self._next_counter(),
+        return (
             capture_time_ms,
             0,
             accel_x,
@@ -111,9 +165,35 @@ class BNO08X_YPR(BNO08X_I2C, BaseIMU):
             rot_r,
         )
 
-    @staticmethod
-    def _wrap_angle(deg):
-        return (deg + 180) % 360 - 180
+    def read_data(self) -> IMUData:
+        """
+        Read accelerometer, gyroscope, magnetometer, and orientation data from the IMU
+
+        start_time: The first value of time.perf_counter_ns before this function is run
+        """
+        return IMUData(self._next_counter(), *self._read_values())
+
+    def read_into(self, batch: IMUBatch) -> None:
+        batch.append_values(self._next_counter(), *self._read_values())
+
+    def read_available(self, out: IMUBatch | None = None) -> IMUBatch:
+        """
+        In batch mode, append one sample per rotation vector report queued since
+        the last call, each stamped with its own sensor time.
+        """
+        if self._fifo is None:
+            return super().read_available(out)
+
+        start = time.perf_counter_ns()
+        self._process_available_packets()
+        self._read_time.since(start)
+
+        batch = out if out is not None else IMUBatch(64)
+        wall_offset_ns = time.time_ns() - time.monotonic_ns()
+        self._fifo.assemble(
+            batch, self._quat_to_ypr_batch, self._next_counters, wall_offset_ns
+        )
+        return batch
 
     def tare(self):
         """
@@ -133,26 +213,56 @@ class BNO08X_YPR(BNO08X_I2C, BaseIMU):
         and raises RuntimeError("Unprocessable Batch bytes", 2).
         """
         processed_count = 0
-        while self._data_ready:
-            if max_packets and processed_count > max_packets:
-                return
-
-            try:
-                new_packet = self._read_packet()
-            except PacketError:
-                continue
+        try:
+            while self._data_ready:
+                if max_packets and processed_count > max_packets:
+                    return
 
-            if new_packet.channel_number in (0, 1):
-                continue
+                try:
+                    new_packet = self._read_packet()
+                except PacketError:
+                    self._packet_errors.inc()
+                    continue
 
-            try:
-                self._handle_packet(new_packet)
-            except RuntimeError as error:
-                if error.args and error.args[0] == "Unprocessable Batch bytes":
+                if new_packet.channel_number in (0, 1):
                     continue
-                raise
 
-            processed_count += 1
+                try:
+                    self._handle_packet(new_packet)
+                except RuntimeError as error:
+                    if error.args and error.args[0] == "Unprocessable Batch bytes":
+                        self._batch_errors.inc()
+                        continue
+                    raise
+
+                processed_count += 1
+        finally:
+            self._packets.inc(processed_count)
+
+    @override
+    def _handle_packet(self, packet) -> None:
+        if self._fifo is None:
+            return super()._handle_packet(packet)
+
+        # Unlike upstream, which pops the reports newest first and keeps only the
+        # last one processed, go through them in packet order and record each
+        self._fifo.begin_packet(time.monotonic_ns())
+        reports = []
+        error = None
+        try:
+            _separate_batch(packet, reports)
+        except RuntimeError as e:
+            # Keep the complete reports in front of a short tail
+            error = e
+
+        for report_id, report_bytes in reports:
+            report_time_ns = self._fifo.timestamp(report_id, report_bytes)
+            self._process_report(report_id, report_bytes)
+            if report_time_ns is not None and report_id in self._fifo.report_ids:
+                self._fifo.record(report_id, report_time_ns, self._readings[report_id])
+
+        if error is not None:
+            raise error
 
     @property
     def rotation(self) -> tuple[float, float, float] | None:
@@ -165,12 +275,36 @@ class BNO08X_YPR(BNO08X_I2C, BaseIMU):
 
     
 class IMU:
-    _imu: BNO08X_YPR | None = None
+    """One connection per IMU, keyed by I2C bus and address"""
+
+    _imus: dict[tuple[int | None, int | None], BNO08X_YPR] = {}
+    _buses: dict[int | None, busio.I2C] = {}
 
     @staticmethod
-    def get_conn() -> BNO08X_YPR:
-        if not IMU._imu:
-            i2c = busio.I2C(board.SCL, board.SDA)
-            IMU._imu = BNO08X_YPR(i2c)
+    def get_conn(
+        address: int | None = None, bus: int | None = None, **kwargs
+    ) -> BNO08X_YPR:
+        """
+        address: I2C address of the IMU, by default 0x4B and then 0x4A
+        bus: I2C bus number (/dev/i2c-N), by default the board's SCL/SDA pins
+        kwargs: BNO08X_YPR options, only used when creating the connection
+        """
+        key = (bus, address)
+        if key not in IMU._imus:
+            IMU._imus[key] = BNO08X_YPR(IMU._get_bus(bus), address=address, **kwargs)
+
+        return IMU._imus[key]
+
+    @staticmethod
+    def _get_bus(bus: int | None):
+        # IMUs on the same bus share it
+        if bus not in IMU._buses:
+            if bus is None:
+                IMU._buses[bus] = busio.I2C(board.SCL, board.SDA)
+            else:
+                # Other buses need the optional adafruit-extended-bus package
+                from adafruit_extended_bus import ExtendedI2C
+
+                IMU._buses[bus] = ExtendedI2C(bus)
 
-        return IMU._imu
+        return IMU._buses[bus]
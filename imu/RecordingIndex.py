@@ -0,0 +1,262 @@
+import io
+import os
+import struct
+from collections.abc import Iterator
+from itertools import islice
+
+import numpy as np
+
+from .BinaryRecorder import HEADER, MAGIC, parse_header, record_dtype
+from .IMUBatch import FIELDS, IMU_DTYPE
+from .QuantizedRecorder import MAGIC as QUANTIZED_MAGIC, decode_recording, read_blocks
+from .RotatingFile import SUFFIXES, open_segment
+
+INDEX_MAGIC = b"IMUX"
+INDEX_VERSION = 1
+
+# magic, version, reserved, rows between entries
+INDEX_HEADER = struct.Struct("<4sHHq")
+INDEX_DTYPE = np.dtype(
+    [("row", "<i8"), ("counter", "<i8"), ("capture_time_ms", "<i8"), ("offset", "<i8")]
+)
+
+
+def index_fname(recording: str) -> str:
+    """Sidecar index of a recording, shared by its compressed form"""
+    for suffix in SUFFIXES.values():
+        if recording.endswith(suffix):
+            recording = recording[: -len(suffix)]
+    return recording + ".idx"
+
+
+class IndexWriter:
+    """Builds the sidecar index of a recording while it is written.
+
+    Every `every`-th row gets an entry with its counter, capture time and
+    byte offset in the recording. Rows must be reported in file order,
+    starting after a header of `header_bytes`.
+    """
+
+    def __init__(self, fname: str, header_bytes: int, every: int = 1000):
+        if every < 1:
+            raise ValueError("Index entries must be at least 1 row apart.")
+
+        self.fname = fname
+        self.every = every
+        self.rows = 0
+        self.offset = header_bytes
+        self.file = open(fname, "wb")
+        self.file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, every))
+
+    def add_records(self, records: np.ndarray):
+        """Account for fixed-width binary records just written."""
+        picks = self._picks(len(records))
+        self._write(
+            picks,
+            records["counter"][picks],
+            records["capture_time_ms"][picks],
+            picks * records.dtype.itemsize,
+        )
+        self.rows += len(records)
+        self.offset += len(records) * records.dtype.itemsize
+
+    def add_rows(self, rows: list[str]):
+        """Account for CSV rows (without newlines) just written."""
+        picks = self._picks(len(rows))
+        if len(picks):
+            sizes = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows)) + 1
+            starts = np.concatenate(([0], np.cumsum(sizes)))
+            # Only the indexed rows are parsed
+            fields = [rows[i].split(",", 2) for i in picks]
+            self._write(
+                picks,
+                np.array([int(f[0]) for f in fields], dtype=np.int64),
+                np.array([int(f[1]) for f in fields], dtype=np.int64),
+                starts[picks],
+            )
+            self.offset += int(starts[-1])
+        else:
+            self.offset += sum(map(len, rows)) + len(rows)
+        self.rows += len(rows)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def _picks(self, n: int) -> np.ndarray:
+        return np.arange((-self.rows) % self.every, n, self.every)
+
+    def _write(self, picks, counters, times, offsets):
+        if not len(picks):
+            return
+        entries = np.zeros(len(picks), dtype=INDEX_DTYPE)
+        entries["row"] = self.rows + picks
+        entries["counter"] = counters
+        entries["capture_time_ms"] = times
+        entries["offset"] = self.offset + offsets
+        self.file.write(entries.tobytes())
+
+
+def read_index(fname: str) -> tuple[int, np.ndarray]:
+    """Rows between entries, and the entries of an index"""
+    with open(fname, "rb") as f:
+        raw = f.read()
+
+    if len(raw) < INDEX_HEADER.size:
+        raise ValueError(f"{fname} is too short to be a recording index.")
+    magic, version, _, every = INDEX_HEADER.unpack_from(raw)
+    if magic != INDEX_MAGIC:
+        raise ValueError(f"{fname} is not a recording index.")
+    if version > INDEX_VERSION:
+        raise ValueError(
+            f"{fname} uses index version {version}, newer than supported ({INDEX_VERSION})."
+        )
+
+    body = raw[INDEX_HEADER.size :]
+    # A partially written last entry is ignored
+    count = len(body) // INDEX_DTYPE.itemsize
+    return every, np.frombuffer(body, dtype=INDEX_DTYPE, count=count)
+
+
+def _byte_range(entries: np.ndarray, key: str, low, high) -> tuple[int | None, int | None]:
+    """Offsets from the last entry before `low` to the first entry after `high`"""
+    # Capture times can step back a little, search on their running maximum
+    values = np.maximum.accumulate(entries[key])
+    start = end = None
+    if low is not None:
+        i = int(np.searchsorted(values, low, side="left")) - 1
+        if i >= 0:
+            start = int(entries["offset"][i])
+    if high is not None:
+        i = int(np.searchsorted(values, high, side="right"))
+        if i < len(entries):
+            end = int(entries["offset"][i])
+    return start, end
+
+
+def read_range(
+    recording: str,
+    from_ms: int | None = None,
+    to_ms: int | None = None,
+    from_counter: int | None = None,
+    to_counter: int | None = None,
+) -> tuple[np.ndarray, int]:
+    """
+    Records of a CSV, binary or quantized recording (possibly a compressed segment) with
+    capture times in [from_ms, to_ms] and counters in [from_counter, to_counter],
+    as IMU_DTYPE records, and the recording's device_id.
+
+    Only the part of the file between the nearest index entries is read; without
+    an index the whole recording is scanned.
+    """
+    with open_segment(recording) as f:
+        magic = f.read(len(MAGIC))
+        binary = magic == MAGIC
+        f.seek(0)
+        if magic == QUANTIZED_MAGIC:
+            # Blocks can only be decoded whole, there is no index to narrow the read
+            header, records = decode_recording(f.read(), recording)
+            return _select(records, from_ms, to_ms, from_counter, to_counter), header["device_id"]
+        if binary:
+            header = parse_header(f.read(HEADER.size), recording)
+            header_bytes = header["header_size"]
+        else:
+            header_bytes = len(f.readline())
+
+        start, end = header_bytes, None
+        index = index_fname(recording)
+        if os.path.exists(index):
+            _, entries = read_index(index)
+            if len(entries):
+                for key, low, high in (
+                    ("capture_time_ms", from_ms, to_ms),
+                    ("counter", from_counter, to_counter),
+                ):
+                    if low is None and high is None:
+                        continue
+                    s, e = _byte_range(entries, key, low, high)
+                    start = max(start, s or header_bytes)
+                    if e is not None:
+                        end = e if end is None else min(end, e)
+
+        f.seek(start)
+        raw = f.read() if end is None else f.read(max(0, end - start))
+
+    if binary:
+        dtype = record_dtype(header["value_size"])
+        records = np.frombuffer(raw, dtype=dtype, count=len(raw) // dtype.itemsize)
+        records = records.astype(IMU_DTYPE)
+        device_id = header["device_id"]
+    else:
+        records, device_id = _parse_csv(raw)
+
+    return _select(records, from_ms, to_ms, from_counter, to_counter), device_id
+
+
+def _select(records, from_ms, to_ms, from_counter, to_counter) -> np.ndarray:
+    mask = np.ones(len(records), dtype=bool)
+    if from_ms is not None:
+        mask &= records["capture_time_ms"] >= from_ms
+    if to_ms is not None:
+        mask &= records["capture_time_ms"] <= to_ms
+    if from_counter is not None:
+        mask &= records["counter"] >= from_counter
+    if to_counter is not None:
+        mask &= records["counter"] <= to_counter
+    return records[mask]
+
+
+def iter_records(recording: str, chunk_rows: int = 65536) -> Iterator[tuple[np.ndarray, int]]:
+    """
+    Stream a CSV, binary or quantized recording (possibly a compressed segment)
+    as (IMU_DTYPE records, device_id) chunks of at most `chunk_rows`, without
+    reading the whole file. Quantized recordings come one block at a time.
+    """
+    with open_segment(recording) as f:
+        magic = f.read(len(MAGIC))
+        f.seek(0)
+        if magic == QUANTIZED_MAGIC:
+            header = parse_header(f.read(HEADER.size), recording, QUANTIZED_MAGIC)
+            f.seek(header["header_size"])
+            for records in read_blocks(f):
+                yield records, header["device_id"]
+        elif magic == MAGIC:
+            header = parse_header(f.read(HEADER.size), recording)
+            dtype = record_dtype(header["value_size"])
+            f.seek(header["header_size"])
+            while raw := f.read(chunk_rows * dtype.itemsize):
+                records = np.frombuffer(raw, dtype=dtype, count=len(raw) // dtype.itemsize)
+                if not len(records):
+                    break
+                yield records.astype(IMU_DTYPE), header["device_id"]
+        else:
+            f.readline()
+            while lines := list(islice(f, chunk_rows)):
+                records, device_id = _parse_csv(b"".join(lines))
+                if not len(records):
+                    break
+                yield records, device_id
+
+
+def query(recording: str, **ranges) -> np.ndarray:
+    """Records in the given ranges, see `read_range`."""
+    return read_range(recording, **ranges)[0]
+
+
+def _parse_csv(raw: bytes) -> tuple[np.ndarray, int]:
+    # Drop a partially written last row
+    raw = raw[: raw.rfind(b"\n") + 1]
+    if not raw.strip():
+        return np.zeros(0, dtype=IMU_DTYPE), 0
+
+    columns = np.loadtxt(
+        io.BytesIO(raw), delimiter=",", dtype=np.float64, ndmin=2, comments=None
+    )
+    records = np.zeros(len(columns), dtype=IMU_DTYPE)
+    for i, name in enumerate(FIELDS):
+        records[name] = columns[:, i]
+    device_id = int(columns[0, len(FIELDS)]) if columns.shape[1] > len(FIELDS) else 0
+    return records, device_id
+
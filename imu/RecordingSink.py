@@ -0,0 +1,265 @@
+import os
+import time
+from dataclasses import asdict, dataclass
+
+from .BinaryRecorder import BinaryRecorder
+from .FanOutWriter import Block, Sink
+from .IMUBatch import CSV_HEADER
+from .Metrics import METRICS
+from .QuantizedRecorder import QuantizedRecorder
+from .RecordingIndex import IndexWriter
+from .RingBuffer import RingBuffer
+from .RotatingFile import RotatingFile, RotationOptions
+
+FORMATS = ("csv", "binary", "quantized")
+EXTENSIONS = {"binary": ".imu", "quantized": ".imuq"}
+
+
+@dataclass
+class RecordingOptions:
+    """How a `RecordingSink` records, see its docstring"""
+
+    format: str = "csv"
+    flush_rows: int = 100
+    flush_bytes: int | None = 64 * 1024
+    flush_interval_s: float | None = 1.0
+    fsync_every: int = 0
+    rotation: RotationOptions | None = None
+    index_every: int | None = None
+
+    def __post_init__(self):
+        if self.format not in FORMATS:
+            raise ValueError(
+                f"Unknown recording format {self.format!r}, expected one of {FORMATS}"
+            )
+
+
+class RecordingSink(Sink):
+    """Records the samples to `fname`, as the `FanOutWriter` sink of a `DataWriter`.
+
+    The recording (`RecordingOptions`) is CSV, a `BinaryRecorder` recording
+    (`binary`) or a `QuantizedRecorder` one (`quantized`). Rows are buffered
+    and written in chunks, whenever `flush_rows` rows or roughly `flush_bytes` bytes are
+    pending, or `flush_interval_s` has passed since the last flush (checked
+    again whenever the queue runs empty). With `fsync_every`, every n-th
+    flush is also forced onto the storage device.
+
+    With `rotation` (`RotationOptions`), the recording is split into
+    segments with a manifest; segments only change between flushes. With
+    `index_every`, every file (or segment) gets a sidecar `.idx` index.
+
+    Its queue blocks when full instead of dropping samples, for at most the
+    writer's `block_timeout_s`.
+    """
+
+    name = "recording"
+    overflow = RingBuffer.BLOCK
+
+    def __init__(self, fname: str, device_id: int = 0, options: RecordingOptions | None = None):
+        options = options or RecordingOptions()
+        if options.format in EXTENSIONS and fname.endswith(".csv"):
+            fname = fname[: -len(".csv")] + EXTENSIONS[options.format]
+
+        self.fname = fname
+        self.device_id = device_id
+        self.recording_format = options.format
+        self.flush_rows = max(1, options.flush_rows)
+        self.flush_bytes = options.flush_bytes
+        self.flush_interval_s = options.flush_interval_s
+        self.fsync_every = options.fsync_every
+        self.rotation_options = options.rotation
+        self.index_every = options.index_every
+
+        self.recorder = None
+        self.csv_file = None
+        self.rotation = None
+        self.index = None
+        self._opened = False
+
+        self._flush_time = METRICS.histogram(
+            "writer_flush_seconds",
+            "Time to write a chunk of rows to the recording",
+            device=str(device_id),
+        )
+        self.flush_count = 0
+        self.rows_flushed = 0
+        self.bytes_flushed = 0
+        self.last_flush_ns = 0
+        self.max_flush_ns = 0
+        self.total_flush_ns = 0
+
+    def open(self):
+        # DataWriter opens it up front, so a bad path fails on start
+        if self._opened:
+            return
+        self._opened = True
+
+        if self.recording_format in EXTENSIONS:
+            if self.recording_format == "binary":
+                self.recorder = BinaryRecorder(
+                    self.fname, self.device_id, chunk_size=self.flush_rows
+                )
+                self._row_bytes = self.recorder.dtype.itemsize
+            else:
+                self.recorder = QuantizedRecorder(
+                    self.fname, self.device_id, chunk_size=self.flush_rows
+                )
+                # Estimate until the first flush measures real blocks
+                self._row_bytes = 8
+            if self.rotation_options:
+                self.rotation = RotatingFile(
+                    self.fname, self.recorder.header(), **asdict(self.rotation_options)
+                ).open()
+            self.recorder.open(self.rotation)
+        else:
+            if self.rotation_options:
+                self.rotation = RotatingFile(
+                    self.fname, CSV_HEADER, **asdict(self.rotation_options)
+                ).open()
+                self.csv_file = self.rotation
+            else:
+                self.csv_file = open(self.fname, "wb")
+                self.csv_file.write(CSV_HEADER.encode())
+            # Estimate until the first flush measures real rows
+            self._row_bytes = 160
+
+        self._recorded_bytes = 0
+        self._pending: list[Block] = []
+        self._pending_count = 0
+        self._last_flush = time.monotonic()
+        self._open_index()
+
+    def write_block(self, block: Block) -> int:
+        records = block.records
+        if self.rotation:
+            counters = records["counter"]
+            times = records["capture_time_ms"]
+            self.rotation.observe(
+                len(records), counters[0], counters[-1], times.min(), times.max()
+            )
+
+        if self.recorder:
+            self.recorder.write_records(records)
+        else:
+            self._pending.append(block)
+        self._pending_count += len(records)
+
+        flushed = self.bytes_flushed
+        self._maybe_flush()
+        return self.bytes_flushed - flushed
+
+    def flush(self):
+        """Write the pending rows if a flush is due, see the class docstring."""
+        self._maybe_flush()
+
+    def close(self):
+        try:
+            self._flush()
+        finally:
+            if self.csv_file:
+                self.csv_file.close()
+            if self.recorder:
+                self.recorder.close()
+            if self.index:
+                self.index.close()
+                if self.rotation and not self.index.rows:
+                    # Opened for a segment that never started after the last rotation
+                    os.remove(self.index.fname)
+
+    @property
+    def pending(self) -> int:
+        """Rows not written yet"""
+        return getattr(self, "_pending_count", 0)
+
+    def _maybe_flush(self):
+        if (
+            self._pending_count >= self.flush_rows
+            or (
+                self.flush_bytes
+                and self._pending_count * self._row_bytes >= self.flush_bytes
+            )
+            or (
+                self.flush_interval_s is not None
+                and time.monotonic() - self._last_flush >= self.flush_interval_s
+            )
+        ):
+            self._flush()
+
+    def _flush(self):
+        """Write every pending row, then hand the file to the OS."""
+        start = time.perf_counter_ns()
+        rows = self._pending_count
+
+        if isinstance(self.recorder, QuantizedRecorder):
+            # Including blocks the recorder wrote by itself when its chunk filled up
+            self.recorder.flush()
+            written = self.recorder.bytes_written - self._recorded_bytes
+            self._recorded_bytes = self.recorder.bytes_written
+            if rows:
+                self._row_bytes = written / rows
+            file = self.recorder.file
+        elif self.recorder:
+            self.recorder.flush()
+            written = rows * self._row_bytes
+            file = self.recorder.file
+        else:
+            written = 0
+            if self._pending:
+                out = b"".join(block.payload for block in self._pending)
+                self.csv_file.write(out)
+                if self.index:
+                    for block in self._pending:
+                        self.index.add_rows(block.rows)
+                self._pending.clear()
+                written = len(out)
+                self._row_bytes = written / rows
+            file = self.csv_file
+            file.flush()
+
+        self._pending_count = 0
+        self._last_flush = time.monotonic()
+        if not rows:
+            return
+
+        self.flush_count += 1
+        if self.fsync_every and self.flush_count % self.fsync_every == 0:
+            os.fsync(file.fileno())
+        if self.index:
+            self.index.flush()
+        if self.rotation and self.rotation.rotate_if_due():
+            # Every segment gets its own index
+            self._open_index()
+
+        self.rows_flushed += rows
+        self.bytes_flushed += written
+        self.last_flush_ns = time.perf_counter_ns() - start
+        self._flush_time.observe_ns(self.last_flush_ns)
+        self.max_flush_ns = max(self.max_flush_ns, self.last_flush_ns)
+        self.total_flush_ns += self.last_flush_ns
+
+    def _open_index(self):
+        # Quantized blocks have no fixed row offsets to index
+        if not self.index_every or isinstance(self.recorder, QuantizedRecorder):
+            return
+
+        if self.index:
+            self.index.close()
+        fname = self.rotation.fname if self.rotation else self.fname
+        header_bytes = (
+            len(self.recorder.header()) if self.recorder else len(CSV_HEADER.encode())
+        )
+        self.index = IndexWriter(fname + ".idx", header_bytes, self.index_every)
+        if self.recorder:
+            self.recorder.index = self.index
+
+    def flush_stats(self) -> dict[str, float]:
+        return {
+            "flushes": self.flush_count,
+            "rows": self.rows_flushed,
+            "bytes": self.bytes_flushed,
+            "last_flush_ms": self.last_flush_ns / 1e6,
+            "max_flush_ms": self.max_flush_ns / 1e6,
+            "mean_flush_ms": (
+                self.total_flush_ns / self.flush_count / 1e6 if self.flush_count else 0.0
+            ),
+        }
@@ -0,0 +1,156 @@
+from collections import deque
+from typing import Callable
+
+import numpy as np
+
+from .IMUBatch import IMUBatch
+from .TimeAligner import HOLD, TimeAligner
+
+# SH-2 timing reports that precede sensor reports in a batched packet
+BASE_TIMESTAMP = 0xFB
+TIMESTAMP_REBASE = 0xFA
+
+
+def report_delay_us(report_bytes) -> int:
+    """
+    Delay of a sensor report relative to its packet's base timestamp.
+    14 bits in 100 us ticks: the top 6 bits of byte 2 and all of byte 3.
+    """
+    return (((report_bytes[2] >> 2) << 8) | report_bytes[3]) * 100
+
+
+class ReportFIFO:
+    """Collects every BNO08X sensor report drained in a wakeup, with its own timestamp.
+
+    The upstream driver only keeps the latest value of each report, so when
+    several report periods pile up between two reads all but one are lost.
+    Fed with every report in packet order, this keeps them all and assembles
+    aligned IMU samples with a `TimeAligner`. By default that is one sample per
+    rotation vector report, holding the most recent accel/gyro/mag report.
+
+    Report time follows the SH-2 reference: the packet's arrival on the host,
+    minus the base timestamp delta, plus any rebase and the report's own delay.
+    Packets are polled rather than interrupt driven, so the arrival time is when
+    the packet was read.
+    """
+
+    CHANNELS = {"accel": 3, "gyro": 3, "mag": 3, "rotation": 4}
+
+    def __init__(
+        self,
+        accel_id: int,
+        gyro_id: int,
+        mag_id: int,
+        rotation_id: int,
+        method: str = HOLD,
+        interval_ms: float | None = None,
+        max_pending: int = 4096,
+    ):
+        """
+        method: how channels are aligned, see `TimeAligner`
+        interval_ms: emit samples on a fixed grid instead of one per rotation report
+        max_pending: reports kept per channel until `assemble`, the oldest are
+        dropped beyond that (e.g. when only `read_data` reads the IMU)
+        """
+        self.channel_ids = {
+            accel_id: "accel",
+            gyro_id: "gyro",
+            mag_id: "mag",
+            rotation_id: "rotation",
+        }
+        self.report_ids = tuple(self.channel_ids)
+        self.aligner = TimeAligner(
+            self.CHANNELS,
+            interval_ms=interval_ms,
+            reference=None if interval_ms else "rotation",
+            method=method,
+            quaternions=("rotation",),
+        )
+
+        self._reports: dict[int, deque] = {
+            report_id: deque(maxlen=max_pending) for report_id in self.report_ids
+        }
+        self._host_ns = 0
+        self._base_us = 0
+        self._rebase_us = 0
+
+        self.reports_recorded = 0
+        self.reports_dropped = 0
+        self.samples_assembled = 0
+
+    def begin_packet(self, host_ns: int):
+        """Start timestamping the reports of a packet read at `host_ns` (monotonic)"""
+        self._host_ns = host_ns
+        self._base_us = 0
+        self._rebase_us = 0
+
+    def timestamp(self, report_id: int, report_bytes) -> int | None:
+        """
+        Time of a report in monotonic ns, or None for the timing reports
+        themselves, which only update the packet's reference.
+        """
+        if report_id == BASE_TIMESTAMP:
+            # A delta back from the packet's arrival, signed like the rebase
+            self._base_us = int.from_bytes(report_bytes[1:5], "little", signed=True) * 100
+            return None
+        if report_id == TIMESTAMP_REBASE:
+            self._rebase_us = int.from_bytes(report_bytes[1:5], "little", signed=True) * 100
+            return None
+
+        delay_us = report_delay_us(report_bytes)
+        return self._host_ns - (self._base_us - self._rebase_us - delay_us) * 1000
+
+    def record(self, report_id: int, time_ns: int, values: tuple):
+        if report_id in self._reports:
+            reports = self._reports[report_id]
+            if len(reports) == reports.maxlen:
+                self.reports_dropped += 1
+            reports.append((time_ns, values))
+            self.reports_recorded += 1
+
+    def pending(self, report_id: int) -> int:
+        return len(self._reports[report_id])
+
+    def assemble(
+        self,
+        batch: IMUBatch,
+        quat_to_ypr: Callable[[np.ndarray], np.ndarray],
+        next_counters: Callable[[int], range],
+        wall_offset_ns: int,
+    ) -> int:
+        """
+        Append every sample that can be aligned so far to `batch`.
+        Returns the number of samples appended.
+
+        quat_to_ypr: converts an (N, 4) quaternion array to (N, 3) yaw/pitch/roll
+        wall_offset_ns: added to monotonic report times to get wall-clock times
+        """
+        for report_id, reports in self._reports.items():
+            if reports:
+                times, values = zip(*reports)
+                self.aligner.push(self.channel_ids[report_id], times, values)
+                reports.clear()
+
+        times_ns, aligned = self.aligner.align()
+        n = len(times_ns)
+        if not n:
+            return 0
+
+        counters = next_counters(n)
+        view = batch.reserve(n)
+        view["counter"] = np.arange(counters.start, counters.stop)
+        view["capture_time_ms"] = (times_ns + wall_offset_ns) // 1_000_000
+        view["recorded_at_time_ms"] = 0
+        for channel in ("accel", "gyro", "mag"):
+            for i, axis in enumerate("xyz"):
+                view[f"{channel}_{axis}"] = aligned[channel][:, i]
+
+        ypr = np.full((n, 3), np.nan)
+        # Rows before the first rotation report have no orientation yet
+        known = ~np.isnan(aligned["rotation"]).any(axis=1)
+        if known.any():
+            ypr[known] = quat_to_ypr(aligned["rotation"][known])
+        view["yaw"], view["pitch"], view["roll"] = ypr[:, 0], ypr[:, 1], ypr[:, 2]
+
+        self.samples_assembled += n
+        return n
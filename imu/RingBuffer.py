@@ -0,0 +1,137 @@
+from threading import Condition
+
+
+class RingBuffer:
+    """Bounded, preallocated FIFO shared between acquisition and writer threads.
+
+    All slots are allocated up front, so pushing a sample never grows memory.
+    What happens when the buffer is full is decided by `overflow`:
+
+    - `drop-oldest`: overwrite the oldest queued sample (default)
+    - `drop-newest`: discard the incoming sample
+    - `block`: wait until a consumer frees a slot
+    """
+
+    DROP_OLDEST = "drop-oldest"
+    DROP_NEWEST = "drop-newest"
+    BLOCK = "block"
+    POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+    def __init__(self, capacity: int = 1024, overflow: str = DROP_OLDEST):
+        if capacity < 1:
+            raise ValueError("RingBuffer capacity must be at least 1.")
+        if overflow not in self.POLICIES:
+            raise ValueError(
+                f"Unknown overflow policy {overflow!r}, expected one of {self.POLICIES}"
+            )
+
+        self.capacity = capacity
+        self.overflow = overflow
+
+        self._slots: list = [None] * capacity
+        self._head = 0
+        self._size = 0
+        self._closed = False
+        self._cond = Condition()
+
+        self.pushed = 0
+        self.popped = 0
+        self.dropped_oldest = 0
+        self.dropped_newest = 0
+        self.high_water = 0
+
+    @property
+    def dropped(self) -> int:
+        return self.dropped_oldest + self.dropped_newest
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __len__(self) -> int:
+        with self._cond:
+            return self._size
+
+    def put(self, item, timeout: float | None = None) -> bool:
+        """
+        Queue one item.
+        Returns False if the item was not queued (dropped, closed, or timed out).
+        """
+        with self._cond:
+            if self._closed:
+                return False
+
+            if self._size == self.capacity:
+                if self.overflow == self.DROP_NEWEST:
+                    self.dropped_newest += 1
+                    return False
+
+                if self.overflow == self.DROP_OLDEST:
+                    self._slots[self._head] = None
+                    self._head = (self._head + 1) % self.capacity
+                    self._size -= 1
+                    self.dropped_oldest += 1
+                else:
+                    if not self._cond.wait_for(
+                        lambda: self._closed or self._size < self.capacity, timeout
+                    ):
+                        self.dropped_newest += 1
+                        return False
+                    if self._closed:
+                        return False
+
+            self._slots[(self._head + self._size) % self.capacity] = item
+            self._size += 1
+            self.pushed += 1
+            if self._size > self.high_water:
+                self.high_water = self._size
+
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout: float | None = None):
+        """
+        Remove and return the oldest item.
+        Returns None on timeout, or once the buffer is closed and drained.
+        """
+        items = self.get_many(1, timeout)
+        return items[0] if items else None
+
+    def get_many(self, max_items: int, timeout: float | None = None) -> list:
+        """
+        Remove up to `max_items` of the oldest items in one lock acquisition.
+        Waits for at least one item unless the buffer is closed or `timeout` expires.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._closed or self._size, timeout):
+                return []
+
+            n = min(max_items, self._size)
+            items = []
+            for _ in range(n):
+                items.append(self._slots[self._head])
+                self._slots[self._head] = None
+                self._head = (self._head + 1) % self.capacity
+            self._size -= n
+            self.popped += n
+
+            self._cond.notify_all()
+            return items
+
+    def close(self):
+        """Stop accepting items and wake every waiting producer and consumer."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self) -> dict[str, int]:
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "queued": self._size,
+                "high_water": self.high_water,
+                "pushed": self.pushed,
+                "popped": self.popped,
+                "dropped_oldest": self.dropped_oldest,
+                "dropped_newest": self.dropped_newest,
+            }
@@ -0,0 +1,283 @@
+import gzip
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from threading import Thread
+
+from .RingBuffer import RingBuffer
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        import zstandard as zstd
+    except ImportError:
+        zstd = None
+
+COMPRESSIONS = ("gzip", "zstd")
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+# Per segment files kept and deleted with it, e.g. the `RecordingIndex` sidecar
+SIDECARS = (".idx",)
+
+
+@dataclass
+class RotationOptions:
+    """When a recording starts a new segment and how segments are kept, see `RotatingFile`"""
+
+    max_bytes: int | None = None
+    max_age_s: float | None = None
+    compression: str | None = None
+    # Oldest segments are deleted above this many bytes on disk
+    retention_bytes: int | None = None
+
+    def __post_init__(self):
+        if self.compression is not None and self.compression not in COMPRESSIONS:
+            raise ValueError(
+                f"Unknown compression {self.compression!r}, expected one of {COMPRESSIONS}"
+            )
+
+
+def _compress(src: str, dst: str, compression: str):
+    with open(src, "rb") as raw:
+        if compression == "gzip":
+            with gzip.open(dst, "wb", compresslevel=6) as out:
+                shutil.copyfileobj(raw, out, 1 << 20)
+        elif hasattr(zstd, "ZstdCompressor") and hasattr(zstd.ZstdCompressor, "copy_stream"):
+            # zstandard package
+            with open(dst, "wb") as out:
+                zstd.ZstdCompressor().copy_stream(raw, out)
+        else:
+            with zstd.open(dst, "wb") as out:
+                shutil.copyfileobj(raw, out, 1 << 20)
+
+
+def open_segment(fname: str):
+    """Open a (possibly compressed) segment for reading, as a binary file."""
+    if fname.endswith(".gz"):
+        return gzip.open(fname, "rb")
+    if fname.endswith(".zst"):
+        if zstd is None:
+            raise RuntimeError("Reading .zst segments needs Python 3.14 or `zstandard`.")
+        if hasattr(zstd, "open"):
+            return zstd.open(fname, "rb")
+        return zstd.ZstdDecompressor().stream_reader(open(fname, "rb"), closefd=True)
+    return open(fname, "rb")
+
+
+def read_manifest(fname: str) -> list[dict]:
+    """Segments listed in a manifest that still exist on disk, oldest first."""
+    segments = {}
+    with open(fname) as f:
+        for line in f:
+            entry = json.loads(line)
+            if "deleted" in entry:
+                segments.pop(entry["deleted"], None)
+            else:
+                segments[entry["file"]] = entry
+    return list(segments.values())
+
+
+class RotatingFile:
+    """A recording split into segment files, `<base>-0000<ext>`, `<base>-0001<ext>`, ...
+
+    Writes go to the current segment like to a normal file. `rotate_if_due`
+    starts a new segment once the current one holds `max_bytes` or is
+    `max_age_s` old; every segment starts with `header`. Finished segments
+    are handed to a background thread, which compresses them (`gzip`, or
+    `zstd` on Python 3.14+ or with `zstandard` installed), deletes the
+    oldest ones (with their `SIDECARS`) while all segments and sidecars
+    together exceed `retention_bytes`, and
+    appends one JSON line per segment to the manifest, with the counter and
+    capture time ranges passed to `observe`.
+    """
+
+    def __init__(
+        self,
+        fname: str,
+        header: bytes | str = b"",
+        max_bytes: int | None = None,
+        max_age_s: float | None = None,
+        compression: str | None = None,
+        retention_bytes: int | None = None,
+        manifest_fname: str | None = None,
+    ):
+        if compression is not None and compression not in COMPRESSIONS:
+            raise ValueError(
+                f"Unknown compression {compression!r}, expected one of {COMPRESSIONS}"
+            )
+        if compression == "zstd" and zstd is None:
+            raise ValueError("zstd compression needs Python 3.14 or `pip install zstandard`.")
+
+        self.base, self.ext = os.path.splitext(fname)
+        self.header = header.encode() if isinstance(header, str) else header
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.compression = compression
+        self.retention_bytes = retention_bytes
+        self.manifest_fname = manifest_fname or f"{self.base}.manifest.jsonl"
+
+        self.index = 0
+        self.file = None
+        self._finished = RingBuffer(64, RingBuffer.BLOCK)
+        self._thread: Thread | None = None
+        # Finished segments still on disk as (file names, total size), oldest first
+        self._kept: list[tuple[list[str], int]] = []
+
+        self.segments = 0
+        self.deleted = 0
+        self.stored_bytes = 0
+        self._new_span()
+
+    def open(self) -> "RotatingFile":
+        self._thread = Thread(target=self._run, name="segment-finisher", daemon=True)
+        self._thread.start()
+        self._open_segment()
+        return self
+
+    @property
+    def fname(self) -> str:
+        """Name of the current segment"""
+        return f"{self.base}-{self.index:04d}{self.ext}"
+
+    def write(self, data):
+        if self.file is None:
+            self._open_segment()
+        if isinstance(data, str):
+            data = data.encode()
+        self.file.write(data)
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def fileno(self) -> int:
+        if self.file is None:
+            self._open_segment()
+        return self.file.fileno()
+
+    def observe(
+        self, rows: int, first_counter: int, last_counter: int, first_ms: int, last_ms: int
+    ):
+        """Account for rows that are written to the current segment."""
+        if not rows:
+            return
+        if self._span["rows"] == 0:
+            self._span.update(first_counter=int(first_counter), first_capture_ms=int(first_ms))
+        self._span.update(
+            rows=self._span["rows"] + rows,
+            last_counter=int(last_counter),
+            last_capture_ms=int(last_ms),
+        )
+
+    def rotate_if_due(self) -> bool:
+        """Finish the current segment if it is big or old enough. Call between whole rows."""
+        if self.file is None:
+            return False
+
+        size = self.file.tell()
+        if (self.max_bytes is not None and size >= self.max_bytes) or (
+            self.max_age_s is not None
+            and time.monotonic() - self._opened >= self.max_age_s
+        ):
+            self._finish_segment()
+            return True
+        return False
+
+    def close(self, timeout: float | None = None):
+        """Finish the last segment and wait until every segment is compressed and listed."""
+        if self.file is not None:
+            self._finish_segment()
+        self._finished.close()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _new_span(self):
+        # Rows may be observed before the segment they go to is opened
+        self._span = {
+            "index": self.index,
+            "opened_at": None,
+            "rows": 0,
+            "first_counter": None,
+            "last_counter": None,
+            "first_capture_ms": None,
+            "last_capture_ms": None,
+        }
+
+    def _open_segment(self):
+        self.file = open(self.fname, "wb")
+        self.file.write(self.header)
+        self._opened = time.monotonic()
+        self._span["opened_at"] = datetime.now().isoformat()
+
+    def _finish_segment(self):
+        fname = self.fname
+        self.file.close()
+        self.file = None
+        self._span.update(
+            closed_at=datetime.now().isoformat(), bytes=os.path.getsize(fname)
+        )
+        # Blocks only if the finisher is 64 segments behind
+        self._finished.put((fname, self._span))
+        self.index += 1
+        self._new_span()
+
+    def _run(self):
+        while True:
+            item = self._finished.get()
+            if item is None:
+                return
+            fname, entry = item
+            try:
+                self._finish(fname, entry)
+            except Exception as e:
+                print(f"Could not finish recording segment {fname}: {e}")
+
+    def _finish(self, fname: str, entry: dict):
+        if self.compression:
+            stored = fname + SUFFIXES[self.compression]
+            _compress(fname, stored, self.compression)
+            os.remove(fname)
+        else:
+            stored = fname
+
+        size = os.path.getsize(stored)
+        entry.update(
+            file=os.path.basename(stored), compression=self.compression, stored_bytes=size
+        )
+        self._append_manifest(entry)
+        # Sidecars are complete once their segment is finished
+        files = [stored] + [fname + suffix for suffix in SIDECARS if os.path.exists(fname + suffix)]
+        size = sum(map(os.path.getsize, files))
+        self._kept.append((files, size))
+        self.segments += 1
+        self.stored_bytes += size
+
+        if self.retention_bytes is None:
+            return
+        # Never delete the segment just finished
+        while len(self._kept) > 1 and sum(s for _, s in self._kept) > self.retention_bytes:
+            oldest, oldest_size = self._kept.pop(0)
+            for file in oldest:
+                try:
+                    os.remove(file)
+                except FileNotFoundError:
+                    pass
+            self._append_manifest({"deleted": os.path.basename(oldest[0])})
+            self.deleted += 1
+            self.stored_bytes -= oldest_size
+
+    def _append_manifest(self, entry: dict):
+        with open(self.manifest_fname, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "segment": self.index,
+            "segments": self.segments,
+            "deleted": self.deleted,
+            "stored_bytes": self.stored_bytes,
+        }
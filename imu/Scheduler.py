@@ -0,0 +1,144 @@
+import time
+from abc import ABC, abstractmethod
+
+from .Metrics import METRICS
+
+
+class Scheduler(ABC):
+    """Paces a loop on absolute deadlines of the monotonic clock.
+
+    Deadlines are `t0 + k * interval`, so time spent inside the loop body never
+    accumulates as drift. When an iteration overruns past one or more deadlines,
+    the missed slots are skipped instead of being replayed as a burst.
+
+    Its metrics are labelled with `name`, loops running side by side (e.g. the
+    acquisition threads of several IMUs) need different names.
+    """
+
+    def __init__(
+        self, interval_ms: float = 10, clock=time.monotonic_ns, name: str = "main"
+    ):
+        if interval_ms <= 0:
+            raise ValueError("Scheduler interval must be positive.")
+
+        self.interval_ns = int(interval_ms * 1e6)
+        self.clock = clock
+        self.name = name
+        self._lateness = METRICS.histogram(
+            "loop_lateness_seconds", "How late overrunning loop iterations were", loop=name
+        )
+        self._missed = METRICS.counter(
+            "loop_missed_slots_total", "Skipped loop deadlines", loop=name
+        )
+        self.start()
+
+    def start(self, t0_ns: int | None = None):
+        """
+        (Re)start the schedule, with the first deadline one interval from now.
+        Schedulers started with the same `t0_ns` share one grid of deadlines.
+        """
+        self._t0 = self.clock() if t0_ns is None else t0_ns
+        self._tick = 0
+        self.next_deadline = self._t0 + self.interval_ns
+
+        self.ticks = 0
+        self.overruns = 0
+        self.missed = 0
+        self.total_lateness_ns = 0
+        self.max_lateness_ns = 0
+
+    def wait(self) -> int:
+        """
+        Block until the next deadline.
+        Returns how late (in ns) the caller arrived, 0 if it was on time.
+        """
+        now = self.clock()
+        lateness = now - self.next_deadline
+
+        if lateness > 0:
+            self.overruns += 1
+            self.total_lateness_ns += lateness
+            self.max_lateness_ns = max(self.max_lateness_ns, lateness)
+
+            # Resynchronize on the grid instead of bursting through missed slots
+            skipped = lateness // self.interval_ns
+            self.missed += skipped
+            self._lateness.observe_ns(lateness)
+            self._missed.inc(skipped)
+            self._tick += skipped + 1
+        else:
+            self._wait_until(self.next_deadline)
+            self._tick += 1
+            lateness = 0
+
+        self.ticks += 1
+        self.next_deadline = self._t0 + (self._tick + 1) * self.interval_ns
+        return lateness
+
+    @abstractmethod
+    def _wait_until(self, deadline_ns: int) -> None:
+        pass
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "missed": self.missed,
+            "max_lateness_ms": self.max_lateness_ns / 1e6,
+            "mean_lateness_ms": (
+                self.total_lateness_ns / self.overruns / 1e6 if self.overruns else 0.0
+            ),
+        }
+
+
+class SpinScheduler(Scheduler):
+    """Busy-waits until the deadline. Most precise, but pins a full core."""
+
+    def _wait_until(self, deadline_ns: int) -> None:
+        while self.clock() < deadline_ns:
+            pass
+
+
+class SleepScheduler(Scheduler):
+    """Sleeps until the deadline. Lowest CPU use, at the cost of OS wake-up jitter."""
+
+    def _wait_until(self, deadline_ns: int) -> None:
+        # Recompute the remaining time from the absolute deadline on every wake-up
+        while (remaining := deadline_ns - self.clock()) > 0:
+            time.sleep(remaining / 1e9)
+
+
+class HybridScheduler(Scheduler):
+    """
+    Sleeps until shortly before the deadline, then spins for the remainder.
+    The spin phase yields the GIL so the MQTT and writer threads keep running.
+    """
+
+    def __init__(self, *args, spin_window_us: float = 500, **kwargs):
+        self.spin_window_ns = int(spin_window_us * 1e3)
+        super().__init__(*args, **kwargs)
+
+    def _wait_until(self, deadline_ns: int) -> None:
+        while (remaining := deadline_ns - self.clock()) > self.spin_window_ns:
+            time.sleep((remaining - self.spin_window_ns) / 1e9)
+
+        while self.clock() < deadline_ns:
+            time.sleep(0)
+
+
+SCHEDULERS: dict[str, type[Scheduler]] = {
+    "hybrid": HybridScheduler,
+    "sleep": SleepScheduler,
+    "spin": SpinScheduler,
+}
+
+
+def make_scheduler(
+    mode: str = "hybrid", interval_ms: float = 10, name: str = "main"
+) -> Scheduler:
+    try:
+        return SCHEDULERS[mode](interval_ms, name=name)
+    except KeyError:
+        raise ValueError(
+            f"Unknown pacing mode {mode!r}, expected one of {tuple(SCHEDULERS)}"
+        ) from None
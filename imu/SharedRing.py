@@ -0,0 +1,131 @@
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .IMUBatch import IMU_DTYPE
+
+# Control words in front of the records: written, read, dropped, closed
+_HEAD, _TAIL, _DROPPED, _CLOSED = range(4)
+_CONTROL_BYTES = 64
+
+
+class SharedRing:
+    """Fixed-size ring of IMU records in shared memory, for one producer and one
+    consumer process.
+
+    The producer (the acquisition process) only ever writes the records and the
+    write counter, the consumer only the read counter, so no lock is needed and
+    the producer never waits: when the ring is full, incoming records are
+    dropped and counted. Records are copied in and out as NumPy blocks.
+
+    Create the ring in the producer and attach to it by `name` in the consumer.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 4096,
+        name: str | None = None,
+        create: bool = True,
+        dtype: np.dtype = IMU_DTYPE,
+    ):
+        if capacity < 1:
+            raise ValueError("SharedRing capacity must be at least 1.")
+
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self._owner = create
+        self._shm = SharedMemory(
+            name=name,
+            create=create,
+            size=_CONTROL_BYTES + capacity * self.dtype.itemsize,
+        )
+
+        self._control = np.ndarray((4,), dtype=np.int64, buffer=self._shm.buf)
+        self._records = np.ndarray(
+            (capacity,), dtype=self.dtype, buffer=self._shm.buf, offset=_CONTROL_BYTES
+        )
+        if create:
+            self._control[:] = 0
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def closed(self) -> bool:
+        return bool(self._control[_CLOSED])
+
+    @property
+    def dropped(self) -> int:
+        return int(self._control[_DROPPED])
+
+    def __len__(self) -> int:
+        return int(self._control[_HEAD] - self._control[_TAIL])
+
+    def put_many(self, records: np.ndarray) -> int:
+        """
+        Copy as many records as there is room for into the ring (producer only).
+        Returns how many were queued, the rest is dropped.
+        """
+        head = int(self._control[_HEAD])
+        n = min(len(records), self.capacity - (head - int(self._control[_TAIL])))
+        if n < len(records):
+            self._control[_DROPPED] += len(records) - n
+
+        self._copy(records[:n], head)
+        # Publish the records only once they are complete
+        self._control[_HEAD] = head + n
+        return n
+
+    def get_many(self, max_items: int | None = None, timeout: float | None = None) -> np.ndarray:
+        """
+        Copy out up to `max_items` queued records (consumer only), waiting up to
+        `timeout` seconds for the first one. Returns an empty array once the
+        ring is closed and drained, or on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not len(self):
+            if self.closed or (deadline is not None and time.monotonic() >= deadline):
+                return np.zeros(0, dtype=self.dtype)
+            # Polling keeps the producer free of any locking or signalling
+            time.sleep(0.001)
+
+        tail = int(self._control[_TAIL])
+        n = int(self._control[_HEAD]) - tail
+        if max_items is not None:
+            n = min(n, max_items)
+
+        start = tail % self.capacity
+        first = min(n, self.capacity - start)
+        out = np.concatenate(
+            (self._records[start : start + first], self._records[: n - first])
+        )
+        self._control[_TAIL] = tail + n
+        return out
+
+    def close(self):
+        """Mark the end of the stream (producer), consumers drain what is left."""
+        self._control[_CLOSED] = 1
+
+    def release(self):
+        """Detach from the shared memory, and free it when this side created it."""
+        del self._control, self._records
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "capacity": self.capacity,
+            "queued": len(self),
+            "written": int(self._control[_HEAD]),
+            "read": int(self._control[_TAIL]),
+            "dropped": self.dropped,
+        }
+
+    def _copy(self, records: np.ndarray, head: int):
+        start = head % self.capacity
+        first = min(len(records), self.capacity - start)
+        self._records[start : start + first] = records[:first]
+        self._records[: len(records) - first] = records[first:]
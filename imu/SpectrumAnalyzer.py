@@ -0,0 +1,192 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+ACCEL_FIELDS = ("accel_x", "accel_y", "accel_z")
+
+
+@dataclass
+class SpectrumSummary:
+    """Spectral summary of the last analysis window, per analyzed field"""
+
+    capture_time_ms: int
+    sample_rate_hz: float
+    fields: tuple[str, ...]
+    # (low, high) Hz of every band
+    bands: tuple[tuple[float, float], ...]
+    # (fields,) RMS of the window, mean removed
+    rms: np.ndarray
+    # (fields, bands) signal energy (PSD integrated over the band)
+    band_energy: np.ndarray
+    # (fields, peaks) strongest frequencies and their PSD, strongest first,
+    # NaN Hz when there are fewer peaks
+    peak_hz: np.ndarray
+    peak_psd: np.ndarray
+
+
+@dataclass
+class SpectrumOptions:
+    """Spectra a `DataWriter` publishes, see `SpectrumAnalyzer`"""
+
+    every_s: float = 1.0
+    segment: int = 256
+    bands: tuple[tuple[float, float], ...] | None = None
+
+
+def parse_bands(spec: str) -> tuple[tuple[float, float], ...]:
+    """Parse `0-5,5-15,15-50` into ((0, 5), (5, 15), (15, 50))"""
+    bands = []
+    for band in filter(None, (part.strip() for part in spec.split(","))):
+        low, _, high = band.partition("-")
+        try:
+            bands.append((float(low), float(high)))
+        except ValueError:
+            raise ValueError(f"Band {band!r} must look like <low Hz>-<high Hz>.") from None
+        if bands[-1][0] >= bands[-1][1]:
+            raise ValueError(f"Band {band!r} must go from low to high.")
+
+    return tuple(bands)
+
+
+class SpectrumAnalyzer:
+    """Vibration spectrum of the sample stream (Welch's method).
+
+    Samples of `fields` go into a preallocated history. Every `every_s`
+    seconds of samples, once the history is full, the PSD is estimated from
+    `segments` Hann windowed segments of `segment` samples with 50 % overlap,
+    and summarized as band energies and the strongest frequencies.
+    All buffers are allocated up front.
+    """
+
+    def __init__(
+        self,
+        sample_rate_hz: float = 100.0,
+        segment: int = 256,
+        segments: int = 4,
+        every_s: float = 1.0,
+        bands: tuple[tuple[float, float], ...] | None = None,
+        peaks: int = 3,
+        fields: tuple[str, ...] = ACCEL_FIELDS,
+    ):
+        if segment < 4 or segment % 2:
+            raise ValueError(
+                "Spectrum segments must be an even number of samples, at least 4."
+            )
+        if segments < 1:
+            raise ValueError("At least one segment is needed.")
+
+        nyquist = sample_rate_hz / 2
+        self.sample_rate_hz = sample_rate_hz
+        self.segment = segment
+        self.segments = segments
+        self.hop = segment // 2
+        self.every = max(1, round(every_s * sample_rate_hz))
+        # Thirds of the spectrum unless told otherwise
+        self.bands = bands or tuple(
+            (nyquist * i / 3, nyquist * (i + 1) / 3) for i in range(3)
+        )
+        self.peaks = peaks
+        self.fields = tuple(fields)
+
+        self.length = segment + (segments - 1) * self.hop
+        self.frequencies = np.fft.rfftfreq(segment, 1 / sample_rate_hz)
+        self.df = self.frequencies[1]
+
+        self._window = np.hanning(segment)
+        # One-sided PSD scaling, so that sum(psd) * df is the signal's variance
+        self._scale = np.full(
+            len(self.frequencies), 2 / (sample_rate_hz * (self._window**2).sum())
+        )
+        self._scale[0] /= 2
+        self._scale[-1] /= 2
+        # Bands include their low edge, and the high edge only at Nyquist
+        self._band_masks = np.array(
+            [
+                (self.frequencies >= low)
+                & ((self.frequencies < high) | (self.frequencies == min(high, nyquist)))
+                for low, high in self.bands
+            ]
+        )
+
+        self._history = np.zeros((self.length, len(self.fields)))
+        self._contiguous = np.zeros((self.length, len(self.fields)))
+        self._segments = np.zeros((segments, len(self.fields), segment))
+        self._write = 0
+        self._seen = 0
+        self._since_summary = 0
+        self._last_time_ms = 0
+
+    def push(self, records: np.ndarray) -> list[SpectrumSummary]:
+        """Add a block of IMU records, return the summaries that became due."""
+        summaries = []
+        start = 0
+        while start < len(records):
+            # Stop at the next summary so it covers exactly the samples up to it
+            n = min(len(records) - start, self.every - self._since_summary)
+            self._append(records[start : start + n])
+            start += n
+            self._since_summary += n
+
+            if self._since_summary == self.every:
+                self._since_summary = 0
+                if self._seen >= self.length:
+                    summaries.append(self.summarize())
+
+        return summaries
+
+    def _append(self, records: np.ndarray):
+        for i, name in enumerate(self.fields):
+            values = records[name]
+            # Only the newest `length` samples fit, and they may wrap around
+            values = values[-self.length :]
+            first = min(len(values), self.length - self._write)
+            self._history[self._write : self._write + first, i] = values[:first]
+            self._history[: len(values) - first, i] = values[first:]
+
+        n = min(len(records), self.length)
+        self._write = (self._write + n) % self.length
+        self._seen += len(records)
+        if len(records):
+            self._last_time_ms = int(records["capture_time_ms"][-1])
+
+    def psd(self) -> np.ndarray:
+        """(fields, frequencies) Welch PSD of the current history"""
+        # Oldest sample first
+        tail = self.length - self._write
+        self._contiguous[:tail] = self._history[self._write :]
+        self._contiguous[tail:] = self._history[: self._write]
+
+        for k in range(self.segments):
+            self._segments[k] = self._contiguous[k * self.hop : k * self.hop + self.segment].T
+
+        self._segments -= self._segments.mean(axis=2, keepdims=True)
+        self._segments *= self._window
+        spectrum = np.fft.rfft(self._segments, axis=2)
+        power = spectrum.real**2 + spectrum.imag**2
+        return power.mean(axis=0) * self._scale
+
+    def summarize(self) -> SpectrumSummary:
+        psd = self.psd()
+
+        band_energy = (psd @ self._band_masks.T) * self.df
+
+        # Strongest local maxima, so one wide peak isn't reported as several
+        is_peak = np.zeros(psd.shape, dtype=bool)
+        is_peak[:, 1:-1] = (psd[:, 1:-1] >= psd[:, :-2]) & (psd[:, 1:-1] > psd[:, 2:])
+        is_peak[:, -1] = psd[:, -1] > psd[:, -2]
+        ranked = np.where(is_peak, psd, -1.0)
+        order = np.argsort(ranked, axis=1)[:, ::-1][:, : self.peaks]
+        peak_psd = np.take_along_axis(ranked, order, axis=1)
+        peak_hz = np.where(peak_psd >= 0, self.frequencies[order], np.nan)
+        peak_psd = np.maximum(peak_psd, 0.0)
+
+        return SpectrumSummary(
+            capture_time_ms=self._last_time_ms,
+            sample_rate_hz=self.sample_rate_hz,
+            fields=self.fields,
+            bands=self.bands,
+            rms=np.sqrt(psd.sum(axis=1) * self.df),
+            band_energy=band_energy,
+            peak_hz=peak_hz,
+            peak_psd=peak_psd,
+        )
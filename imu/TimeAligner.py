@@ -0,0 +1,262 @@
+import numpy as np
+
+HOLD = "hold"
+NEAREST = "nearest"
+LINEAR = "linear"
+METHODS = (HOLD, NEAREST, LINEAR)
+
+
+def _neighbours(times: np.ndarray, grid: np.ndarray):
+    """Index of the last sample at or before, and the first after, each grid time"""
+    after = np.searchsorted(times, grid, side="right")
+    last = len(times) - 1
+    return np.clip(after - 1, 0, last), np.clip(after, 0, last), after == 0
+
+
+def resample_hold(times: np.ndarray, values: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """Latest sample at or before each grid time (NaN before the first sample)"""
+    before, _, early = _neighbours(times, grid)
+    out = values[before].astype(np.float64)
+    out[early] = np.nan
+    return out
+
+
+def resample_nearest(times: np.ndarray, values: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """Sample closest in time to each grid time (NaN before the first sample)"""
+    before, after, early = _neighbours(times, grid)
+    use_after = (times[after] - grid) < (grid - times[before])
+    out = values[np.where(use_after, after, before)].astype(np.float64)
+    out[early] = np.nan
+    return out
+
+
+def resample_linear(times: np.ndarray, values: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """
+    Linear interpolation between the samples around each grid time, held at the
+    last sample after it (NaN before the first sample)
+    """
+    before, after, early = _neighbours(times, grid)
+    fraction = _fraction(times, grid, before, after)
+    v0, v1 = values[before], values[after]
+    out = v0 + fraction[:, None] * (v1 - v0)
+    out[early] = np.nan
+    return out
+
+
+def slerp(times: np.ndarray, quats: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """
+    Spherical linear interpolation of (N, 4) unit quaternions, along the shorter
+    arc (NaN before the first sample)
+    """
+    before, after, early = _neighbours(times, grid)
+    fraction = _fraction(times, grid, before, after)[:, None]
+    q0, q1 = quats[before], quats[after].copy()
+
+    dot = np.einsum("ij,ij->i", q0, q1)
+    # q and -q are the same rotation, go the short way round
+    q1[dot < 0] *= -1
+    dot = np.abs(dot)[:, None]
+
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.sin(theta)
+    # Nearly identical quaternions: linear interpolation is exact enough
+    close = sin_theta < 1e-6
+    safe_sin = np.where(close, 1.0, sin_theta)
+    w0 = np.where(close, 1 - fraction, np.sin((1 - fraction) * theta) / safe_sin)
+    w1 = np.where(close, fraction, np.sin(fraction * theta) / safe_sin)
+
+    out = w0 * q0 + w1 * q1
+    out /= np.linalg.norm(out, axis=1, keepdims=True)
+    out[early] = np.nan
+    return out
+
+
+def _fraction(times, grid, before, after) -> np.ndarray:
+    span = (times[after] - times[before]).astype(np.float64)
+    offset = (grid - times[before]).astype(np.float64)
+    return np.divide(offset, span, out=np.zeros(len(grid)), where=span > 0)
+
+
+class TimeAligner:
+    """Resamples channels reported at their own times onto one common timeline.
+
+    Each channel (e.g. accel at 400 Hz, mag at 50 Hz) is pushed with the time of
+    every report, and `align` returns all rows of the timeline that can be
+    computed so far, in vectorized blocks. The timeline is either a fixed grid
+    every `interval_ms`, or the report times of the `reference` channel.
+
+    method: `hold` (latest report), `nearest` or `linear`. Quaternion channels
+    are interpolated with `slerp` instead of `linear`.
+
+    `nearest` and `linear` need a report after a row's time on every channel, so
+    rows lag behind the slowest channel. `hold` on a reference timeline returns
+    a row for every reference report right away.
+
+    A channel without a report within `timeout_ms` of the newest report of any
+    channel (counting from the first report of any channel, if it never
+    reported) is silent: rows stop waiting for it, and it is NaN in rows more
+    than `timeout_ms` after its last report. With `timeout_ms=None`, rows wait
+    for every channel, buffering the others without bound.
+    """
+
+    def __init__(
+        self,
+        channels: dict[str, int],
+        interval_ms: float | None = None,
+        reference: str | None = None,
+        method: str = LINEAR,
+        quaternions: tuple[str, ...] = (),
+        timeout_ms: float | None = 1000.0,
+    ):
+        """channels: channel name -> number of values per report"""
+        if (interval_ms is None) == (reference is None):
+            raise ValueError("Align to either a fixed interval_ms or a reference channel.")
+        if interval_ms is not None and interval_ms <= 0:
+            raise ValueError("interval_ms must be positive.")
+        if reference is not None and reference not in channels:
+            raise ValueError(f"Unknown reference channel {reference!r}.")
+        if method not in METHODS:
+            raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+        if timeout_ms is not None and timeout_ms <= 0:
+            raise ValueError("timeout_ms must be positive.")
+
+        self.channels = dict(channels)
+        self.interval_ns = None if interval_ms is None else int(interval_ms * 1e6)
+        self.reference = reference
+        self.method = method
+        self.quaternions = tuple(quaternions)
+        self.timeout_ns = None if timeout_ms is None else int(timeout_ms * 1e6)
+
+        self._times = {name: np.zeros(0, dtype=np.int64) for name in channels}
+        self._values = {name: np.zeros((0, width)) for name, width in channels.items()}
+        # Time of the last row returned
+        self._last_row_ns: int | None = None
+        # Time of the first report of any channel, where silence starts for the others
+        self._first_report_ns: int | None = None
+
+        self.rows_aligned = 0
+
+    def push(self, name: str, times_ns, values):
+        """Add reports of one channel: (N,) times in ns and (N, width) values"""
+        times_ns = np.asarray(times_ns, dtype=np.int64).reshape(-1)
+        values = np.asarray(values, dtype=np.float64).reshape(
+            len(times_ns), self.channels[name]
+        )
+        if len(times_ns):
+            first = int(times_ns.min())
+            if self._first_report_ns is None or first < self._first_report_ns:
+                self._first_report_ns = first
+        times = np.concatenate((self._times[name], times_ns))
+        values = np.concatenate((self._values[name], values))
+        if len(times) > 1 and (np.diff(times) < 0).any():
+            order = np.argsort(times, kind="stable")
+            times, values = times[order], values[order]
+
+        self._times[name] = times
+        self._values[name] = values
+
+    def pending(self, name: str) -> int:
+        return len(self._times[name])
+
+    def align(self, flush: bool = False) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        """
+        Return the (M,) row times in ns and, per channel, the (M, width) values
+        at those times. `flush` also returns the rows that would otherwise wait
+        for later reports, extrapolating channels by holding their last report.
+        """
+        silent = self._silent()
+        grid = self._grid(flush, silent)
+        if not len(grid):
+            return grid, {
+                name: np.zeros((0, width)) for name, width in self.channels.items()
+            }
+
+        aligned = {}
+        for name in self.channels:
+            times, values = self._times[name], self._values[name]
+            if not len(times):
+                aligned[name] = np.full((len(grid), self.channels[name]), np.nan)
+                continue
+
+            if self.method == HOLD:
+                aligned[name] = resample_hold(times, values, grid)
+            elif self.method == NEAREST:
+                aligned[name] = resample_nearest(times, values, grid)
+            elif name in self.quaternions:
+                aligned[name] = slerp(times, values, grid)
+            else:
+                aligned[name] = resample_linear(times, values, grid)
+            if name in silent:
+                aligned[name][grid > times[-1] + self.timeout_ns] = np.nan
+
+            # Keep the last report at or before the last row for the next rows
+            keep = max(np.searchsorted(times, grid[-1], side="right") - 1, 0)
+            self._times[name] = times[keep:]
+            self._values[name] = values[keep:]
+
+        self._last_row_ns = int(grid[-1])
+        self.rows_aligned += len(grid)
+        return grid, aligned
+
+    def _silent(self) -> set[str]:
+        """Channels rows no longer wait for, see `timeout_ms`"""
+        lasts = [int(times[-1]) for times in self._times.values() if len(times)]
+        if self.timeout_ns is None or not lasts:
+            return set()
+
+        cutoff = max(lasts) - self.timeout_ns
+        return {
+            name
+            for name, times in self._times.items()
+            if (times[-1] if len(times) else self._first_report_ns) < cutoff
+        }
+
+    def _grid(self, flush: bool, silent: set[str]) -> np.ndarray:
+        empty = np.zeros(0, dtype=np.int64)
+
+        if self.reference is not None:
+            grid = self._times[self.reference]
+            if self._last_row_ns is not None:
+                grid = grid[grid > self._last_row_ns]
+            if flush or self.method == HOLD:
+                return grid.copy()
+
+            end = self._end_ns(silent, exclude=self.reference)
+            return empty if end is None else grid[grid <= end].copy()
+
+        live = [times for name, times in self._times.items() if name not in silent]
+        if any(not len(times) for times in live):
+            return empty
+
+        if self._last_row_ns is None:
+            # First row once every channel has reported, or fallen silent
+            first = max(int(times[0]) for times in live)
+            start = -(-first // self.interval_ns) * self.interval_ns
+        else:
+            start = self._last_row_ns + self.interval_ns
+
+        end = (
+            max(int(t[-1]) for t in self._times.values() if len(t))
+            if flush
+            else self._end_ns(silent)
+        )
+        if end is None or end < start:
+            return empty
+
+        return np.arange(start, end + 1, self.interval_ns, dtype=np.int64)
+
+    def _end_ns(self, silent: set[str], exclude: str | None = None) -> int | None:
+        """Latest row time every channel that isn't silent has caught up with"""
+        waiting = [
+            self._times[name]
+            for name in self.channels
+            if name != exclude and name not in silent
+        ]
+        if any(not len(times) for times in waiting):
+            return None
+        if waiting:
+            return min(int(times[-1]) for times in waiting)
+
+        # Only silent channels besides the reference: every reported row is due
+        lasts = [int(times[-1]) for times in self._times.values() if len(times)]
+        return max(lasts) if lasts else None
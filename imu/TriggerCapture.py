@@ -0,0 +1,162 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from .IMUBatch import IMU_DTYPE
+
+
+@dataclass
+class TriggerOptions:
+    """Conditions of a `DataWriter`'s `TriggerCapture`, with its windows in seconds"""
+
+    accel: float | None = None
+    gyro: float | None = None
+    orientation_deg: float | None = None
+    pre_s: float = 1.0
+    post_s: float = 2.0
+    heartbeat_s: float | None = 10.0
+
+
+class TriggerCapture:
+    """Only lets samples through around events, instead of the whole idle stream.
+
+    A sample triggers when any configured condition holds:
+
+    - accel_threshold: linear acceleration magnitude above this (m/s^2)
+    - gyro_threshold: angular rate magnitude above this (rad/s)
+    - orientation_deg: yaw, pitch or roll further than this from the tare reference
+
+    Around every trigger, `pre_samples` before and `post_samples` after are
+    passed; a trigger during a capture extends it. The samples before are kept
+    in a preallocated ring until they are either captured or suppressed. While
+    idle, one suppressed sample per `heartbeat_ms` (capture time) is passed as
+    a heartbeat, so consumers can tell an idle machine from a dead sensor.
+    """
+
+    def __init__(
+        self,
+        accel_threshold: float | None = None,
+        gyro_threshold: float | None = None,
+        orientation_deg: float | None = None,
+        pre_samples: int = 100,
+        post_samples: int = 200,
+        heartbeat_ms: int | None = 10_000,
+    ):
+        if accel_threshold is None and gyro_threshold is None and orientation_deg is None:
+            raise ValueError("A trigger needs at least one condition.")
+
+        self.accel_threshold = accel_threshold
+        self.gyro_threshold = gyro_threshold
+        self.orientation_deg = orientation_deg
+        self.pre_samples = max(0, pre_samples)
+        self.post_samples = max(0, post_samples)
+        self.heartbeat_ms = heartbeat_ms
+
+        self._ring = np.zeros(self.pre_samples, dtype=IMU_DTYPE)
+        self._ring_len = 0
+        # Samples still to capture after the last trigger
+        self._post_left = 0
+        self._next_heartbeat_ms: int | None = None
+
+        self.events = 0
+        self.triggers = 0
+        self.captured = 0
+        self.suppressed = 0
+        self.heartbeats = 0
+
+    def triggered(self, records: np.ndarray) -> np.ndarray:
+        """Boolean mask of the records that fire a condition"""
+        mask = np.zeros(len(records), dtype=bool)
+        if self.accel_threshold is not None:
+            mask |= _magnitude(records, "accel") > self.accel_threshold
+        if self.gyro_threshold is not None:
+            mask |= _magnitude(records, "gyro") > self.gyro_threshold
+        if self.orientation_deg is not None:
+            for name in ("yaw", "pitch", "roll"):
+                mask |= np.abs(records[name]) > self.orientation_deg
+        return mask
+
+    def process(self, records: np.ndarray) -> np.ndarray:
+        """Return the records of a block (and any held before it) to output, in order."""
+        data = np.concatenate((self._ring[: self._ring_len], records))
+        trigger = np.zeros(len(data), dtype=bool)
+        trigger[self._ring_len :] = self.triggered(records)
+
+        # Mark [t - pre, t + post] around every trigger with +1/-1 steps
+        steps = np.zeros(len(data) + 1, dtype=np.int64)
+        hits = np.flatnonzero(trigger)
+        np.add.at(steps, np.maximum(hits - self.pre_samples, 0), 1)
+        np.add.at(steps, np.minimum(hits + self.post_samples + 1, len(data)), -1)
+        # A capture still running from the last block
+        carried = min(self._post_left, len(records))
+        steps[self._ring_len] += 1
+        steps[self._ring_len + carried] -= 1
+        captured = np.cumsum(steps[:-1]) > 0
+
+        if len(hits):
+            self._post_left = max(0, hits[-1] + self.post_samples + 1 - len(data))
+        else:
+            self._post_left -= carried
+
+        starts = captured & ~np.concatenate(([False], captured[:-1]))
+        if carried:
+            starts[self._ring_len] = False
+        self.events += int(starts.sum())
+        self.triggers += len(hits)
+
+        # Idle samples after the last capture wait in the ring for a trigger
+        last_captured = np.flatnonzero(captured)[-1] if captured.any() else -1
+        keep_from = max(last_captured + 1, len(data) - self.pre_samples)
+        if self._post_left:
+            keep_from = len(data)
+        held = data[keep_from:]
+        self._ring[: len(held)] = held
+        self._ring_len = len(held)
+
+        dropped = ~captured
+        dropped[keep_from:] = False
+        heartbeat = self._heartbeats(data, dropped)
+
+        self.captured += int(captured.sum())
+        self.heartbeats += int(heartbeat.sum())
+        self.suppressed += int(dropped.sum() - heartbeat.sum())
+        return data[captured | heartbeat]
+
+    def flush(self):
+        """Give up on the held samples, e.g. at the end of a recording."""
+        self.suppressed += self._ring_len
+        self._ring_len = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "events": self.events,
+            "triggers": self.triggers,
+            "captured": self.captured,
+            "suppressed": self.suppressed,
+            "heartbeats": self.heartbeats,
+            "held": self._ring_len,
+        }
+
+    def _heartbeats(self, data: np.ndarray, dropped: np.ndarray) -> np.ndarray:
+        heartbeat = np.zeros(len(data), dtype=bool)
+        if self.heartbeat_ms is None:
+            return heartbeat
+
+        candidates = np.flatnonzero(dropped)
+        times = data["capture_time_ms"][candidates]
+        start = 0
+        while start < len(candidates):
+            if self._next_heartbeat_ms is not None:
+                start += int(np.searchsorted(times[start:], self._next_heartbeat_ms))
+                if start == len(candidates):
+                    break
+
+            heartbeat[candidates[start]] = True
+            self._next_heartbeat_ms = int(times[start]) + self.heartbeat_ms
+            start += 1
+        return heartbeat
+
+
+def _magnitude(records: np.ndarray, group: str) -> np.ndarray:
+    x, y, z = (records[f"{group}_{axis}"] for axis in "xyz")
+    return np.sqrt(x * x + y * y + z * z)
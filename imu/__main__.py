@@ -1,12 +1,43 @@
 import argparse
 from curses import window, wrapper
+from datetime import datetime
 import os
+import sys
+
+import numpy as np
 
 from .BaseIMU import BaseIMU
-from .readings import attended_reading, unattended_reading
+from .BinaryRecorder import MAGIC, binary_to_csv
+from .ClockSync import DEFAULT_PORT as CLOCK_PORT, ClockOptions, ClockServer, parse_address
+from .devices import DeviceSpec, open_device, parse_device_spec
+from .encoding import ENCODINGS
+from .FanOutWriter import parse_sink
+from .IMUBatch import CSV_HEADER, format_rows
+from .merge import merge_recordings, write_merged_csv
+from .Metrics import MetricsServer
+from .MQTTPublisher import MQTTOptions
+from .QualityMonitor import QualityOptions
+from .QuantizedRecorder import quantized_to_csv
+from .readings import (
+    MQTT_BROKER_IP,
+    attended_reading,
+    batched_reading,
+    buffered_reading,
+    multi_reading,
+    process_reading,
+    unattended_reading,
+)
+from .RecordingIndex import read_range
+from .RecordingSink import RecordingOptions
+from .RingBuffer import RingBuffer
+from .RotatingFile import COMPRESSIONS, RotationOptions
+from .Scheduler import SCHEDULERS
+from .SpectrumAnalyzer import SpectrumOptions, parse_bands
+from .TimeAligner import METHODS as ALIGN_METHODS
+from .TriggerCapture import TriggerOptions
 
 
-def ui(scr: window, imu: BaseIMU):
+def ui(scr: window, imu: BaseIMU, args: argparse.Namespace | None = None):
     scr.clear()
     scr.addstr(
         0,
@@ -17,11 +48,249 @@ def ui(scr: window, imu: BaseIMU):
 
     scr.erase()
 
-    attended_reading(scr, imu)
+    if args is not None:
+        attended_reading(
+            scr,
+            imu,
+            pacing=args.pacing,
+            refresh_hz=args.ui_refresh_hz,
+            **_writer_options(args),
+        )
+    else:
+        attended_reading(scr, imu)
+
+
+def no_ui(imu: BaseIMU, args: argparse.Namespace | None = None):
+    if args is not None and args.worker_processes:
+        process_reading(
+            imu,
+            workers=args.worker_processes,
+            capacity=args.shm_size,
+            block=args.shm_block,
+            interval_ms=args.wakeup_ms if args.fifo else 10,
+            pacing=args.pacing,
+            batched=args.fifo,
+            **_writer_options(args),
+        )
+    elif args is not None and args.fifo:
+        batched_reading(
+            imu,
+            interval_ms=args.wakeup_ms,
+            pacing=args.pacing,
+            **_writer_options(args),
+        )
+    elif args is not None and args.buffered:
+        buffered_reading(
+            imu,
+            capacity=args.buffer_size,
+            overflow=args.overflow,
+            writer_threads=args.writer_threads,
+            pacing=args.pacing,
+            **_writer_options(args),
+        )
+    elif args is not None:
+        unattended_reading(imu, pacing=args.pacing, **_writer_options(args))
+    else:
+        unattended_reading(imu)
+
+
+def _writer_options(args: argparse.Namespace) -> dict:
+    """DataWriter options selected on the command line"""
+    rotation = RotationOptions(
+        max_bytes=int(args.rotate_mb * 1e6) if args.rotate_mb else None,
+        max_age_s=args.rotate_minutes * 60 if args.rotate_minutes else None,
+        compression=args.compress,
+        retention_bytes=int(args.max_disk_mb * 1e6) if args.max_disk_mb else None,
+    )
+    recording = RecordingOptions(
+        format="quantized" if args.quantized else "binary" if args.binary else "csv",
+        flush_rows=args.flush_rows,
+        flush_interval_s=args.flush_interval,
+        fsync_every=args.fsync_every,
+        rotation=rotation if rotation != RotationOptions() else None,
+        index_every=args.index_every or None,
+    )
+    mqtt = MQTTOptions(
+        batch_size=args.mqtt_batch_size,
+        batch_ms=args.mqtt_batch_ms,
+        encoding=args.mqtt_encoding,
+        raw=not args.no_raw_mqtt,
+        asynchronous=args.async_mqtt,
+        queue_size=args.mqtt_queue_size,
+        spill_fname=args.mqtt_spill,
+        spill_max_bytes=int(args.mqtt_spill_mb * 1e6),
+        status_every_s=args.status_every,
+    )
+    conditions = (args.trigger_accel, args.trigger_gyro, args.trigger_orientation)
+    trigger = None
+    if any(condition is not None for condition in conditions):
+        trigger = TriggerOptions(
+            *conditions,
+            pre_s=args.pre_trigger,
+            post_s=args.post_trigger,
+            heartbeat_s=args.heartbeat or None,
+        )
+    spectrum = None
+    if args.spectrum_every:
+        spectrum = SpectrumOptions(
+            every_s=args.spectrum_every,
+            segment=args.spectrum_segment,
+            bands=parse_bands(args.spectrum_bands) if args.spectrum_bands else None,
+        )
+
+    return {
+        "mqtt_broker_ip": args.mqtt_broker,
+        "mqtt_broker_port": args.mqtt_port,
+        "recording": recording,
+        "mqtt": mqtt,
+        "processing": args.process,
+        "sample_rate_hz": 1000 / args.report_interval_ms,
+        "spectrum": spectrum,
+        "trigger": trigger,
+        "quality": QualityOptions(args.quality, args.quality_window) if args.quality else None,
+        "clock": ClockOptions(args.clock_sync, args.clock_sync_every) if args.clock_sync else None,
+        "sinks": args.sink,
+        "sink_queue_size": args.sink_queue,
+        "sink_overflow": args.sink_overflow,
+    }
+
 
+def _imu_options(args: argparse.Namespace) -> dict:
+    """BNO08X options selected on the command line"""
+    return {
+        "report_interval_ms": args.report_interval_ms,
+        "batch_mode": args.fifo,
+        "channel_intervals_ms": dict(args.channel_interval_ms),
+        "align": args.align,
+        "align_interval_ms": args.align_interval_ms,
+    }
 
-def no_ui(imu: BaseIMU):
-    unattended_reading(imu)
+
+def multi(args: argparse.Namespace, should_tare: bool = False):
+    """Drive every `--device` from this process"""
+    imus = {}
+    for device in args.device:
+        imu = open_device(
+            device,
+            test=args.test,
+            sample_filename=args.sample_file,
+            speed=args.replay_speed,
+            **_imu_options(args),
+        )
+        if should_tare and hasattr(imu, "tare"):
+            imu.tare()
+        imus[device.device_id] = imu
+
+    multi_reading(
+        imus,
+        interval_ms=args.wakeup_ms if args.fifo else 10,
+        pacing=args.pacing,
+        threads=args.device_threads,
+        batched=args.fifo,
+        **_writer_options(args),
+    )
+
+
+def _device_spec(value: str) -> DeviceSpec:
+    try:
+        return parse_device_spec(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def _sink(value: str) -> str:
+    # Every writer builds its own sink from the spec
+    try:
+        parse_sink(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+    return value
+
+
+def _time_ms(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return int(datetime.fromisoformat(value).timestamp() * 1000)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"{value!r} is neither epoch milliseconds nor an ISO date and time."
+        ) from None
+
+
+def query(args: argparse.Namespace):
+    records, device_id = read_range(
+        args.recording,
+        from_ms=args.from_ms,
+        to_ms=args.to_ms,
+        from_counter=args.from_counter,
+        to_counter=args.to_counter,
+    )
+    if args.output and args.output.endswith(".npy"):
+        np.save(args.output, records)
+        print(f"Wrote {len(records)} samples to {args.output}")
+        return
+
+    rows = "".join(row + "\n" for row in format_rows(records, device_id))
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(CSV_HEADER + rows)
+        print(f"Wrote {len(records)} samples to {args.output}")
+    else:
+        sys.stdout.write(CSV_HEADER + rows)
+
+
+def merge(args: argparse.Namespace):
+    clocks = None
+    if args.no_clock:
+        clocks = [None] * len(args.recordings)
+    elif args.clock:
+        if len(args.clock) != len(args.recordings):
+            raise SystemExit("Give one --clock per recording.")
+        clocks = [None if clock == "-" else clock for clock in args.clock]
+
+    rows = write_merged_csv(merge_recordings(args.recordings, clocks), args.output)
+    print(f"Wrote {rows} samples of {len(args.recordings)} recordings to {args.output}")
+
+
+def clock_server(args: argparse.Namespace):
+    server = ClockServer(args.port)
+    print(f"Serving the reference clock on UDP port {server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(f"Answered {server.requests} clock requests")
+
+
+def _clock_address(value: str) -> str:
+    try:
+        parse_address(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+    return value
+
+
+def convert(args: argparse.Namespace):
+    dst = args.output or os.path.splitext(args.recording)[0] + ".csv"
+    with open(args.recording, "rb") as f:
+        binary = f.read(len(MAGIC)) == MAGIC
+    rows = (binary_to_csv if binary else quantized_to_csv)(args.recording, dst)
+    print(f"Wrote {rows} rows to {dst}")
+
+
+def _channel_interval(value: str) -> tuple[str, float]:
+    name, _, interval_ms = value.partition("=")
+    if name not in ("accel", "gyro", "mag", "rotation") or not interval_ms:
+        raise argparse.ArgumentTypeError(
+            f"expected <accel|gyro|mag|rotation>=<ms>, got {value!r}"
+        )
+
+    return name, float(interval_ms)
 
 
 def _env_flag(name: str, default: bool = False) -> bool:
@@ -43,27 +312,462 @@ if __name__ == "__main__":
         help="Run the program in test mode, which does not require a physical IMU connection",
         action="store_true",
     )
+    parser.add_argument(
+        "--sample-file",
+        help="Recording replayed in test mode: CSV, binary or quantized "
+        + "(default: data/sample_data.csv)",
+        default="data/sample_data.csv",
+    )
+    parser.add_argument(
+        "--replay-speed",
+        help="Replay the test recording at this multiple of its original rate, "
+        + "instead of as fast as the loop reads",
+        type=float,
+        default=None,
+    )
     parser.add_argument(
         "--tare",
         help="Tare (zero) yaw/pitch/roll immediately after IMU connection",
         action="store_true",
     )
+    parser.add_argument(
+        "--device",
+        help="Drive several IMUs from this process, one per --device: "
+        + "<fake|[bus/]address>:<device_id>[:sample file], e.g. 0x4A:83 or fake:85",
+        type=_device_spec,
+        action="append",
+        default=[],
+    )
+    parser.add_argument(
+        "--device-threads",
+        help="Acquisition threads shared by the --device IMUs (default: one per IMU)",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "-b",
+        "--buffered",
+        help="Decouple sampling from output with a ring buffer and writer threads",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--buffer-size",
+        help="Number of samples the ring buffer can hold (default: 1024)",
+        type=int,
+        default=1024,
+    )
+    parser.add_argument(
+        "--overflow",
+        help="What to do when the ring buffer is full (default: drop-oldest)",
+        choices=RingBuffer.POLICIES,
+        default=RingBuffer.DROP_OLDEST,
+    )
+    parser.add_argument(
+        "--writer-threads",
+        help="Number of threads draining the ring buffer (default: 1)",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--worker-processes",
+        help="Format and write output in this many separate processes, fed through "
+        + "shared memory (default: 0, in the acquisition process)",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "--shm-size",
+        help="Samples each worker's shared memory ring can hold (default: 4096)",
+        type=int,
+        default=4096,
+    )
+    parser.add_argument(
+        "--shm-block",
+        help="Samples handed to a worker at a time (default: 10)",
+        type=int,
+        default=10,
+    )
+    parser.add_argument(
+        "--pacing",
+        help="How the sampling loop waits for the next 10 ms slot (default: hybrid)",
+        choices=tuple(SCHEDULERS),
+        default="hybrid",
+    )
+    parser.add_argument(
+        "--fifo",
+        help="Let the IMU queue its reports and write every queued sample on each wakeup",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--report-interval-ms",
+        help="How often the IMU produces each report (default: 10)",
+        type=float,
+        default=10,
+    )
+    parser.add_argument(
+        "--wakeup-ms",
+        help="How often the loop drains the IMU's queue in --fifo mode (default: 50)",
+        type=float,
+        default=50,
+    )
+    parser.add_argument(
+        "--channel-interval-ms",
+        help="Report interval of one channel, overriding --report-interval-ms, "
+        + "e.g. accel=2.5 (channels: accel, gyro, mag, rotation; repeatable)",
+        type=_channel_interval,
+        action="append",
+        default=[],
+    )
+    parser.add_argument(
+        "--align",
+        help="How --fifo aligns channels reported at different times (default: hold)",
+        choices=ALIGN_METHODS,
+        default="hold",
+    )
+    parser.add_argument(
+        "--align-interval-ms",
+        help="Emit --fifo samples on a fixed grid instead of one per rotation report",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--process",
+        help="Filter, decimate or derive features before output, e.g. "
+        + "'median:5,lowpass:10@accel+gyro,decimate:4' (see README)",
+        default=None,
+    )
+    parser.add_argument(
+        "--spectrum-every",
+        help="Publish a vibration spectrum summary of the acceleration every this many seconds",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--spectrum-segment",
+        help="Samples per FFT segment, 4 half-overlapping segments are averaged (default: 256)",
+        type=int,
+        default=256,
+    )
+    parser.add_argument(
+        "--spectrum-bands",
+        help="Frequency bands to report the energy of, e.g. '0-5,5-15,15-50' "
+        + "(default: thirds of the spectrum)",
+        default=None,
+    )
+    parser.add_argument(
+        "--no-raw-mqtt",
+        help="Don't publish samples over MQTT, only spectrum summaries",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--trigger-accel",
+        help="Only output samples around linear acceleration above this magnitude (m/s^2)",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--trigger-gyro",
+        help="Only output samples around angular rates above this magnitude (rad/s)",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--trigger-orientation",
+        help="Only output samples around yaw/pitch/roll beyond this many degrees from the tare",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--pre-trigger",
+        help="Seconds of samples kept before a trigger (default: 1.0)",
+        type=float,
+        default=1.0,
+    )
+    parser.add_argument(
+        "--post-trigger",
+        help="Seconds of samples kept after a trigger (default: 2.0)",
+        type=float,
+        default=2.0,
+    )
+    parser.add_argument(
+        "--heartbeat",
+        help="Output one sample every this many seconds between triggers (default: 10, 0: never)",
+        type=float,
+        default=10.0,
+    )
+    parser.add_argument(
+        "--sink",
+        help="Also stream the rows to udp://<host>:<port>, unix://<socket path>, csv://<file> "
+        + "or mqtt://<broker host>:<port> (repeatable)",
+        action="append",
+        type=_sink,
+        default=[],
+    )
+    parser.add_argument(
+        "--sink-queue",
+        help="Payloads queued per extra sink before it overflows (default: 1000)",
+        type=int,
+        default=1000,
+    )
+    parser.add_argument(
+        "--sink-overflow",
+        help="What to do when a sink's queue is full (default: drop-oldest)",
+        choices=RingBuffer.POLICIES,
+        default=RingBuffer.DROP_OLDEST,
+    )
+    parser.add_argument(
+        "--binary",
+        help="Record to a compact binary file (.imu) instead of CSV",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--quantized",
+        help="Record to a quantized, delta encoded and compressed file (.imuq) instead of CSV",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--rotate-mb",
+        help="Start a new recording segment after this many MB",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--rotate-minutes",
+        help="Start a new recording segment after this many minutes",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--compress",
+        help="Compress finished recording segments in the background",
+        choices=COMPRESSIONS,
+        default=None,
+    )
+    parser.add_argument(
+        "--max-disk-mb",
+        help="Delete the oldest finished segments beyond this many MB",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--index-every",
+        help="Index the recording every this many rows for `query` (default: 1000, 0: no index)",
+        type=int,
+        default=1000,
+    )
+    parser.add_argument(
+        "--flush-rows",
+        help="Write recorded rows to the file in chunks of this many rows (default: 100)",
+        type=int,
+        default=100,
+    )
+    parser.add_argument(
+        "--flush-interval",
+        help="Also write pending rows at least every this many seconds (default: 1.0)",
+        type=float,
+        default=1.0,
+    )
+    parser.add_argument(
+        "--fsync-every",
+        help="Force every n-th chunk onto the SD card with fsync (default: 0, never)",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "--mqtt-broker",
+        help=f"Address of the MQTT broker (default: {MQTT_BROKER_IP})",
+        default=MQTT_BROKER_IP,
+    )
+    parser.add_argument(
+        "--mqtt-port",
+        help="Port of the MQTT broker (default: 1883)",
+        type=int,
+        default=1883,
+    )
+    parser.add_argument(
+        "--mqtt-batch-size",
+        help="Publish this many samples per MQTT message (default: 1)",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--mqtt-batch-ms",
+        help="Publish a pending MQTT batch once it is this many ms old",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--mqtt-encoding",
+        help="Encoding of batched MQTT messages (default: csv)",
+        choices=ENCODINGS,
+        default="csv",
+    )
+    parser.add_argument(
+        "--async-mqtt",
+        help="Publish MQTT from a background thread that reconnects on its own",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--mqtt-queue-size",
+        help="Messages the background publisher can hold while the broker is slow (default: 1000)",
+        type=int,
+        default=1000,
+    )
+    parser.add_argument(
+        "--mqtt-spill",
+        help="File to keep unsent messages in during broker outages, replayed on reconnect",
+        default=None,
+    )
+    parser.add_argument(
+        "--mqtt-spill-mb",
+        help="Largest size of the --mqtt-spill file, newer messages are dropped (default: 100)",
+        type=float,
+        default=100.0,
+    )
+
+    parser.add_argument(
+        "--ui-refresh-hz",
+        help="How often the --ui dashboard is redrawn (default: 15)",
+        type=float,
+        default=15.0,
+    )
+    parser.add_argument(
+        "--metrics-port",
+        help="Serve loop, I2C, write and publish metrics for Prometheus on this port",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--status-every",
+        help="Publish a status message with all metrics over MQTT every this many seconds",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--quality",
+        help="Check for duplicate/stale readings and timestamp gaps and report them over MQTT; "
+        + "'mark' also replaces duplicate readings with NaN, 'drop' removes them",
+        choices=("report", "mark", "drop"),
+        default=None,
+    )
+    parser.add_argument(
+        "--quality-window",
+        help="Seconds of capture time per --quality report (default: 10)",
+        type=float,
+        default=10.0,
+    )
+    parser.add_argument(
+        "--clock-sync",
+        help="Estimate this host's clock offset against a reference clock server at HOST[:PORT] "
+        + f"(default port {CLOCK_PORT}), recorded next to the recording and published over MQTT",
+        type=_clock_address,
+        default=None,
+    )
+    parser.add_argument(
+        "--clock-sync-every",
+        help="Seconds between clock offset estimates (default: 10)",
+        type=float,
+        default=10.0,
+    )
+    parser.add_argument(
+        "--clock-server",
+        help="Also serve this host's clock as the reference for --clock-sync on this UDP port",
+        type=int,
+        default=None,
+    )
+
+    subparsers = parser.add_subparsers(dest="command")
+    convert_parser = subparsers.add_parser(
+        "convert", help="Convert a binary (.imu) or quantized (.imuq) recording to CSV"
+    )
+    convert_parser.add_argument("recording", help="Binary or quantized recording to convert")
+    convert_parser.add_argument(
+        "-o", "--output", help="CSV file to write (default: recording name with .csv)"
+    )
+    query_parser = subparsers.add_parser(
+        "query", help="Print the samples of a recording in a time or counter range"
+    )
+    query_parser.add_argument("recording", help="CSV or binary recording, or a segment of one")
+    query_parser.add_argument(
+        "--from",
+        dest="from_ms",
+        help="First capture time, epoch ms or ISO date and time",
+        type=_time_ms,
+    )
+    query_parser.add_argument(
+        "--to", dest="to_ms", help="Last capture time, epoch ms or ISO date and time", type=_time_ms
+    )
+    query_parser.add_argument("--from-counter", help="First counter", type=int)
+    query_parser.add_argument("--to-counter", help="Last counter", type=int)
+    query_parser.add_argument(
+        "-o", "--output", help="Write to this CSV or .npy file instead of printing CSV"
+    )
+    merge_parser = subparsers.add_parser(
+        "merge", help="Merge several devices' recordings into one CSV ordered by capture time"
+    )
+    merge_parser.add_argument("recordings", help="CSV, binary or quantized recordings", nargs="+")
+    merge_parser.add_argument("-o", "--output", help="CSV file to write", required=True)
+    merge_parser.add_argument(
+        "--clock",
+        help="Clock file of each recording, in order, '-' for none "
+        + "(default: <recording>.clock where it exists)",
+        action="append",
+    )
+    merge_parser.add_argument(
+        "--no-clock", help="Merge the capture times as recorded", action="store_true"
+    )
+    clock_parser = subparsers.add_parser(
+        "clock-server", help="Serve this host's clock as the reference for --clock-sync"
+    )
+    clock_parser.add_argument(
+        "--port", help=f"UDP port (default: {CLOCK_PORT})", type=int, default=CLOCK_PORT
+    )
     args = parser.parse_args()
 
+    if args.command == "convert":
+        convert(args)
+        raise SystemExit(0)
+    if args.command == "query":
+        query(args)
+        raise SystemExit(0)
+    if args.command == "merge":
+        merge(args)
+        raise SystemExit(0)
+    if args.command == "clock-server":
+        clock_server(args)
+        raise SystemExit(0)
+
+    if args.metrics_port is not None:
+        server = MetricsServer(args.metrics_port).start()
+        print(f"Serving metrics on http://0.0.0.0:{server.port}/metrics")
+    if args.clock_server is not None:
+        clock = ClockServer(args.clock_server).start()
+        print(f"Serving the reference clock on UDP port {clock.port}")
+
+    auto_tare_enabled = _env_flag("AUTO_TARE", default=False)
+    should_tare = args.tare or auto_tare_enabled
+
+    if args.device:
+        if args.ui or args.buffered or args.worker_processes:
+            parser.error(
+                "--device can't be combined with --ui, --buffered or --worker-processes"
+            )
+        multi(args, should_tare)
+        raise SystemExit(0)
+
     if args.test:
         from .FakeIMU import IMU
+
+        imu = IMU.get_conn(sample_filename=args.sample_file, speed=args.replay_speed)
     else:
         from .RealIMU import IMU
 
-    imu = IMU.get_conn()
-
-    auto_tare_enabled = _env_flag("AUTO_TARE", default=False)
-    should_tare = args.tare or auto_tare_enabled
+        imu = IMU.get_conn(**_imu_options(args))
 
     if should_tare and hasattr(imu, "tare"):
         imu.tare()
 
     if args.ui:
-        wrapper(ui, imu)
+        wrapper(ui, imu, args)
     else:
-        no_ui(imu)
+        no_ui(imu, args)
@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+
+from .BaseIMU import BaseIMU
+
+FAKE = "fake"
+
+
+@dataclass
+class DeviceSpec:
+    """One IMU driven by a multi-device process"""
+
+    device_id: int
+    # I2C address and bus of a BNO08X, unused for fake devices
+    address: int | None = None
+    bus: int | None = None
+    fake: bool = False
+    sample_filename: str | None = None
+
+    @property
+    def name(self) -> str:
+        if self.fake:
+            return f"fake-{self.device_id}"
+        bus = "" if self.bus is None else f"{self.bus}/"
+        address = "auto" if self.address is None else f"{self.address:#04x}"
+        return f"{bus}{address}-{self.device_id}"
+
+
+def parse_device_spec(spec: str) -> DeviceSpec:
+    """
+    Parse `<source>:<device_id>[:<sample file>]`, where source is `fake` for a
+    FakeIMU replay, or an I2C address optionally prefixed with its bus number,
+    e.g. `0x4A:83`, `3/0x4B:84`, `fake:85:data/sample_data.csv`.
+    """
+    source, _, rest = spec.partition(":")
+    device_id, _, sample_filename = rest.partition(":")
+    try:
+        device = DeviceSpec(int(device_id))
+    except ValueError:
+        raise ValueError(f"Device {spec!r} needs a numeric device id.") from None
+
+    if source == FAKE:
+        device.fake = True
+        device.sample_filename = sample_filename or None
+        return device
+
+    if sample_filename:
+        raise ValueError(f"Only fake devices take a sample file, got {spec!r}.")
+
+    bus, _, address = source.rpartition("/")
+    try:
+        device.address = int(address, 0)
+        device.bus = int(bus) if bus else None
+    except ValueError:
+        raise ValueError(
+            f"Device {spec!r} must start with `fake` or an I2C address like 0x4A."
+        ) from None
+
+    return device
+
+
+def open_device(device: DeviceSpec, test: bool = False, **imu_kwargs) -> BaseIMU:
+    """
+    Connect to the IMU of `device`. With `test`, every device is a FakeIMU.
+
+    imu_kwargs: options of the IMU class, only those of FakeIMU (sample_filename,
+    speed) are passed to fake devices, the rest only to BNO08X devices.
+    """
+    if device.fake or test:
+        from .FakeIMU import IMU
+
+        fake_kwargs = {
+            key: value
+            for key, value in imu_kwargs.items()
+            if key in ("sample_filename", "speed")
+        }
+        if device.sample_filename:
+            fake_kwargs["sample_filename"] = device.sample_filename
+        return IMU.get_conn(key=device.name, **fake_kwargs)
+
+    from .RealIMU import IMU
+
+    real_kwargs = {
+        key: value
+        for key, value in imu_kwargs.items()
+        if key not in ("sample_filename", "speed")
+    }
+    return IMU.get_conn(address=device.address, bus=device.bus, **real_kwargs)
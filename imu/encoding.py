@@ -0,0 +1,284 @@
+import base64
+import json
+
+import numpy as np
+
+from .BinaryRecorder import record_dtype
+from .ClockSync import ClockEstimate
+from .IMUBatch import FIELDS, IMU_DTYPE, format_rows
+from .QualityMonitor import QualityWindow
+from .QuantizedRecorder import decode_block, encode_block
+from .SpectrumAnalyzer import SpectrumSummary
+
+HEADER_PREFIX = "#imu-batch"
+SPECTRUM_PREFIX = "#spectrum"
+STATUS_PREFIX = "#status"
+QUALITY_PREFIX = "#quality"
+CLOCK_PREFIX = "#clock"
+SCHEMA_VERSION = 1
+ENCODINGS = ("csv", "struct", "delta", "quantized")
+
+_INT_FIELDS = FIELDS[:3]
+_STRUCT_DTYPE = record_dtype(4)
+_YPR_DECIMALS = 3
+
+
+def encode_batch(records: np.ndarray, device_id: int, encoding: str = "csv") -> str:
+    """Encode structured IMU records as one payload.
+
+    The payload is one schema header line followed by the encoded samples:
+
+        #imu-batch,<schema version>,<encoding>,<sample count>,<device_id>
+        <body>
+
+    - `csv`: one row per sample, exactly like the single-sample payload
+    - `struct`: base64 of packed little-endian records (int64 counter/timestamps,
+      float32 sensor values), since the MQTT client only publishes text
+    - `delta`: the first row in full, then per row the difference of the integer
+      fields to the previous row and only the sensor values that changed
+      (unchanged values are left empty), without device_id
+    - `quantized`: base64 of an `encode_block` block, i.e. sensor values rounded
+      to the BNO08X's resolution, delta and run-length encoded and compressed
+    """
+    if encoding == "csv":
+        body = "\n".join(format_rows(records, device_id))
+    elif encoding == "struct":
+        body = base64.b64encode(records.astype(_STRUCT_DTYPE).tobytes()).decode("ascii")
+    elif encoding == "delta":
+        body = _encode_delta(records)
+    elif encoding == "quantized":
+        body = base64.b64encode(encode_block(records)).decode("ascii")
+    else:
+        raise ValueError(f"Unknown encoding {encoding!r}, expected one of {ENCODINGS}")
+
+    return (
+        f"{HEADER_PREFIX},{SCHEMA_VERSION},{encoding},{len(records)},{device_id}\n"
+        + body
+    )
+
+
+def decode_payload(payload: str) -> tuple[int, np.ndarray]:
+    """
+    Decode any payload published by DataWriter into (device_id, records).
+    Payloads without a header are single-sample rows, as published by default.
+    """
+    if payload.startswith(SPECTRUM_PREFIX):
+        raise ValueError("Spectrum summaries are decoded with decode_spectrum.")
+    if payload.startswith(STATUS_PREFIX):
+        raise ValueError("Status reports are decoded with decode_status.")
+    if payload.startswith(QUALITY_PREFIX):
+        raise ValueError("Quality windows are decoded with decode_quality.")
+    if payload.startswith(CLOCK_PREFIX):
+        raise ValueError("Clock estimates are decoded with decode_clock.")
+    if not payload.startswith(HEADER_PREFIX):
+        *values, device_id = payload.strip().split(",")
+        return int(device_id), _records_from_rows([values])
+
+    header, _, body = payload.partition("\n")
+    _, version, encoding, count, device_id = header.split(",")
+    if int(version) > SCHEMA_VERSION:
+        raise ValueError(
+            f"Payload schema version {version} is newer than supported ({SCHEMA_VERSION})."
+        )
+
+    if encoding == "csv":
+        records = _records_from_rows(row.split(",")[:-1] for row in body.split("\n"))
+    elif encoding == "struct":
+        packed = np.frombuffer(base64.b64decode(body), dtype=_STRUCT_DTYPE)
+        records = packed.astype(IMU_DTYPE)
+        # Yaw/pitch/roll are rounded to 3 decimals at the source, float32 keeps that
+        for name in ("yaw", "pitch", "roll"):
+            records[name] = np.round(records[name], _YPR_DECIMALS)
+    elif encoding == "delta":
+        records = _decode_delta(body)
+    elif encoding == "quantized":
+        records, _ = decode_block(base64.b64decode(body))
+    else:
+        raise ValueError(f"Unknown encoding {encoding!r}, expected one of {ENCODINGS}")
+
+    if len(records) != int(count):
+        raise ValueError(f"Payload declares {count} samples but holds {len(records)}.")
+
+    return int(device_id), records
+
+
+def encode_spectrum(summary: SpectrumSummary, device_id: int) -> str:
+    """Encode a spectrum summary as one compact text payload:
+
+        #spectrum,<schema version>,<device_id>,<capture_time_ms>,<sample rate>,<low-high;...>
+        <field>,<rms>,<band energy;...>,<peak Hz:peak PSD;...>
+
+    with one line per analyzed field.
+    """
+    bands = ";".join(f"{low:g}-{high:g}" for low, high in summary.bands)
+    lines = [
+        f"{SPECTRUM_PREFIX},{SCHEMA_VERSION},{device_id},{summary.capture_time_ms},"
+        + f"{summary.sample_rate_hz:g},{bands}"
+    ]
+    for i, field in enumerate(summary.fields):
+        energy = ";".join(f"{value:.6g}" for value in summary.band_energy[i])
+        peaks = ";".join(
+            f"{hz:g}:{psd:.6g}"
+            for hz, psd in zip(summary.peak_hz[i], summary.peak_psd[i])
+            if not np.isnan(hz)
+        )
+        lines.append(f"{field},{summary.rms[i]:.6g},{energy},{peaks}")
+
+    return "\n".join(lines)
+
+
+def decode_spectrum(payload: str) -> tuple[int, SpectrumSummary]:
+    """Decode a payload of `encode_spectrum` into (device_id, summary)."""
+    header, *lines = payload.strip().split("\n")
+    _, version, device_id, capture_time_ms, sample_rate_hz, bands = header.split(",")
+    if int(version) > SCHEMA_VERSION:
+        raise ValueError(
+            f"Payload schema version {version} is newer than supported ({SCHEMA_VERSION})."
+        )
+
+    fields, rms, energies, peaks = [], [], [], []
+    for line in lines:
+        field, field_rms, energy, field_peaks = line.split(",")
+        fields.append(field)
+        rms.append(float(field_rms))
+        energies.append([float(value) for value in energy.split(";")])
+        peaks.append(
+            [tuple(map(float, peak.split(":"))) for peak in field_peaks.split(";") if peak]
+        )
+
+    n_peaks = max((len(p) for p in peaks), default=0)
+    peak_hz = np.full((len(fields), n_peaks), np.nan)
+    peak_psd = np.zeros((len(fields), n_peaks))
+    for i, field_peaks in enumerate(peaks):
+        for j, (hz, psd) in enumerate(field_peaks):
+            peak_hz[i, j], peak_psd[i, j] = hz, psd
+
+    return int(device_id), SpectrumSummary(
+        capture_time_ms=int(capture_time_ms),
+        sample_rate_hz=float(sample_rate_hz),
+        fields=tuple(fields),
+        bands=tuple(
+            (float(low), float(high))
+            for low, high in (band.split("-") for band in bands.split(";"))
+        ),
+        rms=np.array(rms),
+        band_energy=np.array(energies),
+        peak_hz=peak_hz,
+        peak_psd=peak_psd,
+    )
+
+
+def _records_from_rows(rows) -> np.ndarray:
+    rows = [tuple(row) for row in rows]
+    records = np.zeros(len(rows), dtype=IMU_DTYPE)
+    for name, column in zip(FIELDS, zip(*rows)):
+        records[name] = np.array(column, dtype=IMU_DTYPE[name])
+
+    return records
+
+
+def _encode_delta(records: np.ndarray) -> str:
+    rows = records.tolist()
+    if not rows:
+        return ""
+
+    lines = [",".join(str(value) for value in rows[0])]
+    n_int = len(_INT_FIELDS)
+    for previous, current in zip(rows, rows[1:]):
+        ints = [str(c - p) for p, c in zip(previous[:n_int], current[:n_int])]
+        floats = [
+            "" if c == p else str(c) for p, c in zip(previous[n_int:], current[n_int:])
+        ]
+        lines.append(",".join(ints + floats))
+
+    return "\n".join(lines)
+
+
+def _decode_delta(body: str) -> np.ndarray:
+    if not body:
+        return np.zeros(0, dtype=IMU_DTYPE)
+
+    lines = body.split("\n")
+    n_int = len(_INT_FIELDS)
+
+    first = lines[0].split(",")
+    previous = [int(v) for v in first[:n_int]] + [float(v) for v in first[n_int:]]
+    rows = [tuple(previous)]
+    for line in lines[1:]:
+        fields = line.split(",")
+        current = [p + int(d) for p, d in zip(previous[:n_int], fields[:n_int])] + [
+            p if v == "" else float(v) for p, v in zip(previous[n_int:], fields[n_int:])
+        ]
+        rows.append(tuple(current))
+        previous = current
+
+    return np.array(rows, dtype=IMU_DTYPE)
+
+
+def encode_status(metrics: dict, device_id: int, time_ms: int) -> str:
+    """Encode a metrics snapshot (see `Metrics.snapshot`) as one payload:
+
+        #status,<schema version>,<device_id>,<time_ms>
+        <JSON object of the metrics>
+    """
+    return (
+        f"{STATUS_PREFIX},{SCHEMA_VERSION},{device_id},{time_ms}\n"
+        + json.dumps(metrics, separators=(",", ":"))
+    )
+
+
+def decode_status(payload: str) -> tuple[int, int, dict]:
+    """Decode a payload of `encode_status` into (device_id, time_ms, metrics)."""
+    header, _, body = payload.partition("\n")
+    _, version, device_id, time_ms = header.split(",")
+    if int(version) > SCHEMA_VERSION:
+        raise ValueError(
+            f"Payload schema version {version} is newer than supported ({SCHEMA_VERSION})."
+        )
+    return int(device_id), int(time_ms), json.loads(body)
+
+
+def encode_quality(window: QualityWindow, device_id: int) -> str:
+    """Encode the quality of one window as one line:
+
+        #quality,<schema version>,<device_id>,<start_ms>,<end_ms>,<samples>,<duplicates>,
+        <stale>,<gaps>,<max_gap_ms>,<missing>
+    """
+    return (
+        f"{QUALITY_PREFIX},{SCHEMA_VERSION},{device_id},{window.start_ms},{window.end_ms},"
+        + f"{window.samples},{window.duplicates},{window.stale},{window.gaps},"
+        + f"{window.max_gap_ms},{window.missing}"
+    )
+
+
+def decode_quality(payload: str) -> tuple[int, QualityWindow]:
+    """Decode a payload of `encode_quality` into (device_id, window)."""
+    _, version, device_id, *values = payload.strip().split(",")
+    if int(version) > SCHEMA_VERSION:
+        raise ValueError(
+            f"Payload schema version {version} is newer than supported ({SCHEMA_VERSION})."
+        )
+    return int(device_id), QualityWindow(*map(int, values))
+
+
+def encode_clock(estimate: ClockEstimate, device_id: int) -> str:
+    """Encode a clock estimate as one line:
+
+        #clock,<schema version>,<device_id>,<time_ms>,<offset_ms>,<delay_ms>,<drift_ppm>
+    """
+    return (
+        f"{CLOCK_PREFIX},{SCHEMA_VERSION},{device_id},{estimate.time_ms},"
+        + f"{estimate.offset_ms:.3f},{estimate.delay_ms:.3f},{estimate.drift_ppm:.3f}"
+    )
+
+
+def decode_clock(payload: str) -> tuple[int, ClockEstimate]:
+    """Decode a payload of `encode_clock` into (device_id, estimate)."""
+    _, version, device_id, time_ms, offset_ms, delay_ms, drift_ppm = payload.strip().split(",")
+    if int(version) > SCHEMA_VERSION:
+        raise ValueError(
+            f"Payload schema version {version} is newer than supported ({SCHEMA_VERSION})."
+        )
+    return int(device_id), ClockEstimate(
+        int(time_ms), float(offset_ms), float(delay_ms), float(drift_ppm)
+    )
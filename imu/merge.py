@@ -0,0 +1,109 @@
+import os
+from collections.abc import Iterable, Iterator
+
+import numpy as np
+
+from .ClockSync import clock_fname, correct_times, read_clock
+from .IMUBatch import CSV_HEADER, FIELDS, IMU_DTYPE
+from .RecordingIndex import iter_records
+
+MERGED_DTYPE = np.dtype(IMU_DTYPE.descr + [("device_id", "<i8")])
+
+
+def merge_streams(
+    streams: list[Iterable[np.ndarray]], key: str = "capture_time_ms"
+) -> Iterator[np.ndarray]:
+    """
+    K-way merge time-ordered streams of record chunks into one stream of
+    chunks ordered by `key`. Ties keep the order of `streams`.
+
+    Only the current chunk of every stream is held: everything up to the
+    smallest last key among the streams that may still have more records is
+    merged with one stable sort and handed out, then the drained streams are
+    refilled.
+    """
+    iterators = [iter(stream) for stream in streams]
+    buffers: list[np.ndarray | None] = [None] * len(iterators)
+
+    while True:
+        for i, iterator in enumerate(iterators):
+            while iterator is not None and (buffers[i] is None or not len(buffers[i])):
+                chunk = next(iterator, None)
+                if chunk is None:
+                    iterators[i] = iterator = None
+                else:
+                    # Tolerate small disorder within a chunk, e.g. FIFO reports
+                    buffers[i] = chunk[np.argsort(chunk[key], kind="stable")]
+
+        pending = [i for i, buffer in enumerate(buffers) if buffer is not None and len(buffer)]
+        if not pending:
+            return
+
+        # Streams that may have more records bound what can be handed out
+        open_streams = [i for i in pending if iterators[i] is not None]
+        bound = min(buffers[i][key][-1] for i in open_streams) if open_streams else None
+
+        parts = []
+        for i in pending:
+            buffer = buffers[i]
+            n = len(buffer) if bound is None else np.searchsorted(buffer[key], bound, "right")
+            if n:
+                parts.append(buffer[:n])
+                buffers[i] = buffer[n:]
+
+        merged = np.concatenate(parts)
+        yield merged[np.argsort(merged[key], kind="stable")]
+
+
+def _device_chunks(
+    recording: str, clock: str | None, chunk_rows: int
+) -> Iterator[np.ndarray]:
+    estimates = read_clock(clock) if clock else []
+    for records, device_id in iter_records(recording, chunk_rows):
+        out = np.zeros(len(records), dtype=MERGED_DTYPE)
+        for name in FIELDS:
+            out[name] = records[name]
+        out["capture_time_ms"] = correct_times(records["capture_time_ms"], estimates)
+        out["device_id"] = device_id
+        yield out
+
+
+def merge_recordings(
+    recordings: list[str],
+    clocks: list[str | None] | None = None,
+    chunk_rows: int = 65536,
+) -> Iterator[np.ndarray]:
+    """
+    Stream several devices' recordings (CSV, binary or quantized, possibly
+    compressed segments) as one stream of MERGED_DTYPE chunks ordered by
+    capture time, with `device_id` per record.
+
+    Capture times are moved onto the reference clock with each recording's
+    clock sidecar (see `ClockSync`), `clocks[i]` or `<recording>.clock` when
+    it exists. Pass `clocks=[None, ...]` to merge the local times as recorded.
+    """
+    if clocks is None:
+        clocks = [clock_fname(recording) for recording in recordings]
+        clocks = [clock if os.path.exists(clock) else None for clock in clocks]
+    if len(clocks) != len(recordings):
+        raise ValueError("Give one clock file (or None) per recording.")
+
+    return merge_streams(
+        [
+            _device_chunks(recording, clock, chunk_rows)
+            for recording, clock in zip(recordings, clocks)
+        ]
+    )
+
+
+def write_merged_csv(chunks: Iterable[np.ndarray], fname: str) -> int:
+    """Write merged chunks in the CSV schema. Returns the number of rows."""
+    row_format = ",".join(["%s"] * len(MERGED_DTYPE.names))
+    rows = 0
+    with open(fname, "w") as out:
+        out.write(CSV_HEADER)
+        for chunk in chunks:
+            if len(chunk):
+                out.write("\n".join(row_format % values for values in chunk.tolist()) + "\n")
+                rows += len(chunk)
+    return rows
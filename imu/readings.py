@@ -1,86 +1,396 @@
+import multiprocessing
+import os
+import signal
 import time
+from contextlib import ExitStack
 from curses import curs_set, window
-from itertools import count
+from datetime import datetime
+from threading import Event, Lock, Thread
 
 from .BaseIMU import BaseIMU
-from .DataWriter import DataWriter
+from .Dashboard import Dashboard
+from .DataWriter import CounterGaps, DataWriter
+from .IMUBatch import IMUBatch
+from .RingBuffer import RingBuffer
+from .Scheduler import make_scheduler
+from .SharedRing import SharedRing
 
+# Broker of the deployment, unless the caller passes `mqtt_broker_ip`
+MQTT_BROKER_IP = "192.168.1.76"
 
-def unattended_reading(bno: BaseIMU):
+
+def _writer(**writer_kwargs) -> DataWriter:
+    return DataWriter(**{"mqtt_broker_ip": MQTT_BROKER_IP, **writer_kwargs})
+
+
+def _print_pacing_stats(scheduler):
+    stats = scheduler.stats()
+    print(
+        f"Loop iterations: {stats['ticks']}, overruns: {stats['overruns']}, "
+        + f"missed slots: {stats['missed']}, max lateness: {stats['max_lateness_ms']:.3f} ms"
+    )
+
+
+def unattended_reading(bno: BaseIMU, pacing: str = "hybrid", **writer_kwargs):
     """
     The function that will read, log, and send the data.
     For 'normal' use
+
+    writer_kwargs: extra DataWriter options, e.g. recording_format
     """
-    with DataWriter(mqtt_broker_ip="192.168.1.76") as writer:
+    with _writer(**writer_kwargs) as writer:
         interval_ms = 10
-        t0 = time.time_ns()
-        timer = count(t0, int(interval_ms * 1e6))
-        while True:
-            data = bno.read_data()
+        scheduler = make_scheduler(pacing, interval_ms)
+        try:
+            while True:
+                data = bno.read_data()
 
-            writer.write_data(data)
+                writer.write_data(data)
 
-            next_time = next(timer)
-            while time.time_ns() < next_time:
-                pass
+                scheduler.wait()
+        finally:
+            _print_pacing_stats(scheduler)
 
 
-def attended_reading(scr: window, bno: BaseIMU):
+def batched_reading(
+    bno: BaseIMU, interval_ms: float = 50, pacing: str = "hybrid", **writer_kwargs
+):
     """
-    The function that will read, log, and display the data.
-    For 'ui' use
+    Same as unattended_reading, but wakes up every `interval_ms` and writes every
+    sample the IMU queued since the last wakeup, each with its own timestamp.
+    With a BNO08X in batch mode the report rate can be raised above 100 Hz
+    without losing samples or waking up more often.
     """
-    with DataWriter(mqtt_broker_ip="192.168.1.76", scr=scr) as writer:
-        scr.addstr(0, 0, "Basic reading")
-        curs_set(False)
+    with _writer(**writer_kwargs) as writer:
+        scheduler = make_scheduler(pacing, interval_ms)
+        batch = IMUBatch()
+        samples = 0
+        try:
+            while True:
+                batch.clear()
+                bno.read_available(batch)
+                if batch.size:
+                    writer.write_batch(batch)
+                    samples += batch.size
+
+                scheduler.wait()
+        finally:
+            _print_pacing_stats(scheduler)
+            print(f"Samples read: {samples}")
+
+
+def buffered_reading(
+    bno: BaseIMU,
+    capacity: int = 1024,
+    overflow: str = RingBuffer.DROP_OLDEST,
+    writer_threads: int = 1,
+    pacing: str = "hybrid",
+    stop: Event | None = None,
+    **writer_kwargs,
+):
+    """
+    Same as unattended_reading, but sampling and output are decoupled.
+    An acquisition thread fills a bounded ring buffer and writer threads drain it,
+    so slow CSV flushes or MQTT publishes don't delay the next sample.
+
+    stop: ends the acquisition when set, otherwise it runs until interrupted
+    """
+    buffer = RingBuffer(capacity, overflow)
+    stop = stop or Event()
+
+    with _writer(**writer_kwargs) as writer:
+        # DataWriter is not thread safe, writers take turns on whole chunks.
+        # Taking a chunk and writing it is one turn, so chunks are written in order.
+        write_lock = Lock()
 
         interval_ms = 10
-        t0 = time.time_ns()
-        timer = count(t0, int(interval_ms * 1e6))
-        last_time = t0
-
-        scr.refresh()
-        while True:
-            data = bno.read_data()
-
-            scr.addstr(
-                1,
-                0,
-                f"Accel X:{data.accel_x: 08.3F}\n"
-                + f"Accel Y:{data.accel_y: 08.3F}\n"
-                + f"Accel Z:{data.accel_z: 08.3F}",
-            )
-            scr.addstr(
-                4,
-                0,
-                f"Gyro X:{data.gyro_x: 08.3F}\n"
-                + f"Gyro Y:{data.gyro_y: 08.3F}\n"
-                + f"Gyro Z:{data.gyro_z: 08.3F}",
+        scheduler = make_scheduler(pacing, interval_ms)
+
+        def acquire():
+            scheduler.start()
+            try:
+                while not stop.is_set():
+                    buffer.put(bno.read_data())
+
+                    scheduler.wait()
+            finally:
+                buffer.close()
+
+        def drain():
+            while True:
+                with write_lock:
+                    samples = buffer.get_many(64)
+                    if not samples:
+                        return
+
+                    for data in samples:
+                        writer.write_data(data)
+
+        threads = [Thread(target=acquire, name="imu-acquisition", daemon=True)] + [
+            Thread(target=drain, name=f"imu-writer-{i}", daemon=True)
+            for i in range(writer_threads)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while threads[0].is_alive():
+                threads[0].join(timeout=0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+            _print_pacing_stats(scheduler)
+            stats = buffer.stats()
+            print(
+                f"Samples buffered: {stats['pushed']}, written: {stats['popped']}, "
+                + f"dropped (oldest/newest): {stats['dropped_oldest']}/{stats['dropped_newest']}, "
+                + f"peak queue depth: {stats['high_water']}/{stats['capacity']}"
             )
-            scr.addstr(
-                7,
-                0,
-                f"Mag X:{data.mag_x: 08.3F}\n"
-                + f"Mag Y:{data.mag_y: 08.3F}\n"
-                + f"Mag Z:{data.mag_z: 08.3F}",
+
+
+def multi_reading(
+    imus: dict[int, BaseIMU],
+    interval_ms: float = 10,
+    pacing: str = "hybrid",
+    threads: int | None = None,
+    batched: bool = False,
+    stop: Event | None = None,
+    **writer_kwargs,
+):
+    """
+    Drive several IMUs from one process, keyed by device_id.
+    Every IMU gets its own DataWriter (recording file, MQTT device_id, counter).
+    The IMUs are spread over `threads` acquisition threads (default: one per IMU)
+    that all pace on the same grid of deadlines.
+
+    batched: write every sample each IMU queued (`read_available`) per wakeup
+    stop: ends the acquisition when set, otherwise it runs until interrupted
+    """
+    stop = stop or Event()
+    threads = min(threads or len(imus), len(imus))
+    csv_fname = writer_kwargs.pop(
+        "csv_fname", f"data/bno08X-{datetime.now().isoformat()}.csv"
+    )
+    errors = []
+
+    with ExitStack() as stack:
+        pipelines = []
+        for device_id, imu in imus.items():
+            base, ext = os.path.splitext(csv_fname)
+            writer = _writer(
+                csv_fname=f"{base}-{device_id}{ext}",
+                device_id=device_id,
+                use_env_device_id=False,
+                **writer_kwargs,
             )
-            scr.addstr(
-                10,
-                0,
-                f"Yaw (z):{data.yaw: 08.3F}\n"
-                + f"Pitch (y):{data.pitch: 08.3F}\n"
-                + f"Roll (x):{data.roll: 08.3F}\n",
+            pipelines.append((imu, stack.enter_context(writer)))
+
+        schedulers = [
+            make_scheduler(pacing, interval_ms, f"acquisition-{i}") for i in range(threads)
+        ]
+        t0_ns = time.monotonic_ns()
+
+        def acquire(devices, scheduler):
+            batch = IMUBatch()
+            scheduler.start(t0_ns)
+            try:
+                while not stop.is_set():
+                    for imu, writer in devices:
+                        if batched:
+                            batch.clear()
+                            imu.read_available(batch)
+                            if batch.size:
+                                writer.write_batch(batch)
+                        else:
+                            writer.write_data(imu.read_data())
+
+                    scheduler.wait()
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+
+        workers = [
+            Thread(
+                target=acquire,
+                args=(pipelines[i::threads], schedulers[i]),
+                name=f"imu-acquisition-{i}",
+                daemon=True,
             )
-            scr.addstr(
-                13,
-                0,
-                f"ms since last iteration: {(time.perf_counter_ns() - last_time) / 1e6: 08.3F}\n",
+            for i in range(threads)
+        ]
+        for worker in workers:
+            worker.start()
+
+        try:
+            while not stop.is_set():
+                stop.wait(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.join()
+
+            for scheduler in schedulers:
+                _print_pacing_stats(scheduler)
+
+    if errors:
+        raise errors[0]
+
+
+def _output_worker(ring_name: str, capacity: int, writer_kwargs: dict):
+    """Worker process: drains one shared ring into its own DataWriter"""
+    # Ctrl+C reaches the whole process group, keep draining until the ring closes
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    ring = SharedRing(capacity, name=ring_name, create=False)
+    try:
+        with _writer(**writer_kwargs) as writer:
+            batch = IMUBatch(capacity)
+            while True:
+                records = ring.get_many(capacity)
+                if not len(records):
+                    return
+
+                batch.clear()
+                batch.extend(records)
+                writer.write_batch(batch)
+    finally:
+        ring.release()
+
+
+def process_reading(
+    bno: BaseIMU,
+    workers: int = 1,
+    capacity: int = 4096,
+    block: int = 10,
+    interval_ms: float = 10,
+    pacing: str = "hybrid",
+    batched: bool = False,
+    stop: Event | None = None,
+    **writer_kwargs,
+):
+    """
+    Same as unattended_reading, but formatting and output run in `workers`
+    separate processes, so they use other cores instead of sharing the GIL
+    with acquisition. This process only reads samples and copies blocks of
+    `block` samples into a shared memory ring per worker, round robin.
+    A full ring drops the block instead of delaying the next sample.
+
+    With several workers every worker writes its own recording file
+    (`<name>-w<i>.csv`), the counter column gives the global order. Workers
+    then only see every n-th block, so gaps in the counter are counted here.
+
+    batched: read every sample the IMU queued (`read_available`) per wakeup
+    stop: ends the acquisition when set, otherwise it runs until interrupted
+    """
+    if workers > 1 and writer_kwargs.get("processing"):
+        raise ValueError(
+            "Processing needs the whole stream, use one worker process with it."
+        )
+
+    stop = stop or Event()
+    csv_fname = writer_kwargs.pop(
+        "csv_fname", f"data/bno08X-{datetime.now().isoformat()}.csv"
+    )
+    context = multiprocessing.get_context("spawn")
+
+    gaps = None
+    if workers > 1:
+        device_id = DataWriter._resolve_device_id(
+            writer_kwargs.get("device_id", 0), writer_kwargs.get("use_env_device_id", True)
+        )
+        gaps = CounterGaps(str(device_id))
+        writer_kwargs["count_gaps"] = False
+
+    rings = [SharedRing(capacity) for _ in range(workers)]
+    processes = []
+    for i, ring in enumerate(rings):
+        base, ext = os.path.splitext(csv_fname)
+        fname = csv_fname if workers == 1 else f"{base}-w{i}{ext}"
+        process = context.Process(
+            target=_output_worker,
+            args=(ring.name, capacity, {**writer_kwargs, "csv_fname": fname}),
+            name=f"imu-output-{i}",
+            daemon=True,
+        )
+        process.start()
+        processes.append(process)
+
+    scheduler = make_scheduler(pacing, interval_ms)
+    batch = IMUBatch(max(block, 1))
+    blocks = 0
+    try:
+        while not stop.is_set():
+            if batched:
+                bno.read_available(batch)
+            else:
+                bno.read_into(batch)
+
+            if batch.size >= block:
+                queued = rings[blocks % workers].put_many(batch.samples)
+                if gaps:
+                    # What a full ring drops is missing from the recording too
+                    gaps.observe(batch.column("counter")[:queued])
+                blocks += 1
+                batch.clear()
+
+            scheduler.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if batch.size:
+            queued = rings[blocks % workers].put_many(batch.samples)
+            if gaps:
+                gaps.observe(batch.column("counter")[:queued])
+
+        for ring in rings:
+            ring.close()
+        for process in processes:
+            process.join()
+
+        _print_pacing_stats(scheduler)
+        for i, ring in enumerate(rings):
+            stats = ring.stats()
+            print(
+                f"Worker {i}: samples queued: {stats['written']}, written: {stats['read']}, "
+                + f"dropped: {stats['dropped']}"
             )
-            last_time = time.perf_counter_ns()
+            ring.release()
+
+
+def attended_reading(
+    scr: window,
+    bno: BaseIMU,
+    pacing: str = "hybrid",
+    refresh_hz: float = 15,
+    **writer_kwargs,
+):
+    """
+    The function that will read, log, and display the data.
+    For 'ui' use
+
+    The screen is redrawn `refresh_hz` times per second by a `Dashboard`
+    thread, so terminal output never delays sampling.
+    """
+    with _writer(scr=scr, **writer_kwargs) as writer:
+        curs_set(False)
+
+        interval_ms = 10
+        scheduler = make_scheduler(pacing, interval_ms)
+        dashboard = Dashboard(
+            scr, refresh_hz=refresh_hz, scheduler=scheduler, writer=writer
+        )
+
+        with dashboard:
+            while True:
+                data = bno.read_data()
 
-            scr.refresh()
-            writer.write_data(data)
+                dashboard.update(data)
+                writer.write_data(data)
 
-            next_time = next(timer)
-            while time.time_ns() < next_time:
-                pass
+                scheduler.wait()
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from imu.BinaryRecorder import BinaryRecorder, binary_to_csv, read_header, read_recording
+from imu.DataWriter import DataWriter
+from imu.FanOutWriter import Block
+from imu.IMUBatch import IMUBatch
+from imu.IMUData import IMUData
+from imu.RecordingSink import RecordingOptions, RecordingSink
+
+from .test_counter import DummyClient
+
+
+def make_sample(counter: int) -> IMUData:
+    return IMUData(
+        counter, 1711111111111 + 10 * counter, 0, *(0.125 * i for i in range(1, 13))
+    )
+
+
+def test_binary_recording_round_trips(tmp_path):
+    fname = tmp_path / "rec.imu"
+
+    with BinaryRecorder(str(fname), device_id=83, chunk_size=4) as recorder:
+        recorder.write_data(make_sample(0))
+        recorder.write_batch(IMUBatch.from_samples(make_sample(i) for i in range(1, 10)))
+
+    header, records = read_recording(str(fname))
+
+    assert header["device_id"] == 83
+    assert header["schema_version"] == 1
+    assert list(records["counter"]) == list(range(10))
+    assert records[3]["capture_time_ms"] == 1711111111141
+    np.testing.assert_array_equal(records["roll"], np.full(10, 1.5))
+
+
+def test_binary_recording_float32_is_smaller(tmp_path):
+    fname = tmp_path / "rec32.imu"
+    with BinaryRecorder(str(fname), value_size=4) as recorder:
+        recorder.write_batch(IMUBatch.from_samples(make_sample(i) for i in range(10)))
+
+    header, records = read_recording(str(fname))
+
+    assert header["value_size"] == 4
+    assert records.dtype.itemsize == 3 * 8 + 12 * 4
+    assert records[9]["accel_y"] == 0.25
+
+
+def test_truncated_record_is_ignored(tmp_path):
+    fname = tmp_path / "cut.imu"
+    with BinaryRecorder(str(fname)) as recorder:
+        recorder.write_batch(IMUBatch.from_samples(make_sample(i) for i in range(3)))
+
+    with open(fname, "ab") as f:
+        f.write(b"\x00" * 7)
+
+    _, records = read_recording(str(fname))
+    assert len(records) == 3
+
+
+def test_non_recording_is_rejected(tmp_path):
+    fname = tmp_path / "not.imu"
+    fname.write_bytes(b"counter,capture_time_ms\n")
+
+    with pytest.raises(ValueError):
+        read_header(str(fname))
+
+
+def test_binary_to_csv_matches_data_writer_csv(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+
+    samples = [make_sample(i) for i in range(5)]
+    for data in samples:
+        data.recorded_at_time_ms = 1711111111999
+    records = IMUBatch.from_samples(samples).samples
+
+    # Written by the recording sink as is, DataWriter would stamp recorded_at_time_ms
+    csv_fname = tmp_path / "direct.csv"
+    direct = RecordingSink(str(csv_fname), device_id=84)
+    direct.open()
+    direct.write_block(Block(records, 84))
+    direct.close()
+
+    recording = RecordingSink(str(tmp_path / "rec.csv"), 84, RecordingOptions("binary"))
+    assert recording.fname.endswith(".imu")
+    recording.open()
+    recording.write_block(Block(records, 84))
+    recording.close()
+
+    converted = tmp_path / "converted.csv"
+    assert binary_to_csv(str(tmp_path / "rec.imu"), str(converted)) == 5
+
+    assert converted.read_text().splitlines() == csv_fname.read_text().splitlines()
+
+
+def test_data_writer_records_binary_and_publishes_rows(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+
+    with DataWriter(
+        csv_fname=str(tmp_path / "rec.csv"), device_id=84, recording=RecordingOptions("binary")
+    ) as writer:
+        assert writer.csv_fname.endswith(".imu")
+        writer.write_batch(IMUBatch.from_samples(make_sample(i) for i in range(5)))
+        writer.write_data(make_sample(5))
+
+    assert writer.mqtt_client.messages[5].startswith("5,")
+    _, records = read_recording(str(tmp_path / "rec.imu"))
+    assert list(records["counter"]) == list(range(6))
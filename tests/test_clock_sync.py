@@ -0,0 +1,153 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from imu.ClockSync import (
+    ClockEstimate,
+    ClockOptions,
+    ClockServer,
+    ClockSync,
+    append_estimate,
+    clock_fname,
+    correct_times,
+    read_clock,
+)
+from imu.DataWriter import DataWriter
+from imu.encoding import CLOCK_PREFIX, decode_clock, decode_payload
+from imu.IMUBatch import CSV_HEADER, IMU_DTYPE, IMUBatch
+from imu.merge import MERGED_DTYPE, merge_recordings, merge_streams, write_merged_csv
+from imu.RecordingSink import RecordingOptions
+
+from .test_counter import DummyClient
+
+START_NS = 1_700_000_000_000_000_000
+
+
+def make_records(counters, times) -> np.ndarray:
+    records = np.zeros(len(counters), dtype=IMU_DTYPE)
+    records["counter"] = counters
+    records["capture_time_ms"] = times
+    records["accel_x"] = np.asarray(counters, dtype=float)
+    return records
+
+
+def test_estimates_offset_and_drift_against_a_server():
+    # The reference runs 1.5 s ahead and gains 100 ppm on the local clock
+    local = [START_NS]
+    server = ClockServer(
+        0,
+        "127.0.0.1",
+        clock=lambda: local[0] + 1_500_000_000 + (local[0] - START_NS) // 10_000,
+    ).start()
+    try:
+        sync = ClockSync(f"127.0.0.1:{server.port}", exchanges=4, clock=lambda: local[0])
+        first = sync.measure()
+        local[0] += 100_000_000_000
+        second = sync.measure()
+    finally:
+        server.stop()
+
+    assert first.offset_ms == pytest.approx(1500)
+    assert second.offset_ms == pytest.approx(1510)
+    assert second.delay_ms == 0
+    assert second.drift_ppm == pytest.approx(100)
+    assert server.requests == 8
+    assert sync.poll() == [first, second]
+    assert sync.poll() == []
+    assert sync.offset_at(second.time_ms + 10_000) == pytest.approx(1511)
+
+
+def test_measures_a_real_clock():
+    server = ClockServer(0, "127.0.0.1", clock=lambda: time.time_ns() + 250_000_000).start()
+    try:
+        estimate = ClockSync(f"127.0.0.1:{server.port}", exchanges=4).measure()
+    finally:
+        server.stop()
+
+    assert estimate.offset_ms == pytest.approx(250, abs=5)
+    assert 0 <= estimate.delay_ms < 50
+
+
+def test_no_reference_gives_no_estimate():
+    sync = ClockSync("127.0.0.1:9", exchanges=2, timeout_s=0.05)
+    assert sync.measure() is None
+    assert sync.failures == 1
+    assert sync.offset_at(0) is None
+
+
+def test_correct_times_interpolates_and_extrapolates_with_drift():
+    estimates = [
+        ClockEstimate(1000, 10.0, 1.0, 0.0),
+        ClockEstimate(2000, 20.0, 1.0, 10_000.0),
+    ]
+    corrected = correct_times(np.array([0, 1000, 1500, 2000, 3000]), estimates)
+    assert list(corrected) == [10, 1010, 1515, 2020, 3030]
+    assert list(correct_times(np.array([5, 6]), [])) == [5, 6]
+
+
+def test_merge_streams_orders_across_chunks():
+    a = make_records(range(6), [0, 10, 20, 30, 40, 50])
+    b = make_records(range(100, 104), [5, 10, 45, 70])
+    c = make_records([], [])
+
+    chunks = list(merge_streams([[a[:2], a[2:4], a[4:]], [b[:1], b[1:]], [c]]))
+    merged = np.concatenate(chunks)
+
+    assert list(merged["capture_time_ms"]) == [0, 5, 10, 10, 20, 30, 40, 45, 50, 70]
+    # Ties keep the order of the streams
+    assert list(merged["counter"][2:4]) == [1, 101]
+    assert max(len(chunk) for chunk in chunks) < len(merged)
+
+
+def test_writer_records_clock_and_merge_aligns_devices(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+    server = ClockServer(0, "127.0.0.1", clock=lambda: time.time_ns() + 250_000_000).start()
+    now = int(time.time() * 1000)
+    try:
+        with DataWriter(
+            csv_fname=str(tmp_path / "a.csv"),
+            device_id=83,
+            clock=ClockOptions(f"127.0.0.1:{server.port}", every_s=60),
+        ) as writer:
+            writer.write_batch(IMUBatch.from_array(make_records(range(5), now + np.arange(5) * 10)))
+    finally:
+        server.stop()
+
+    estimates = read_clock(clock_fname(str(tmp_path / "a.csv")))
+    assert len(estimates) == 1
+    assert estimates[0].offset_ms == pytest.approx(250, abs=5)
+    assert not any(m.startswith(CLOCK_PREFIX) for m in writer.mqtt_client.messages)
+    payloads = writer.mqtt_client.subtopic("clock")
+    device_id, published = decode_clock(payloads[0])
+    assert device_id == 83
+    assert published.offset_ms == pytest.approx(estimates[0].offset_ms, abs=1e-3)
+    with pytest.raises(ValueError):
+        decode_payload(payloads[0])
+
+    # Device 84 records on a clock 250 ms behind, device 83 on the reference clock
+    with DataWriter(
+        csv_fname=str(tmp_path / "b.imu"), device_id=84, recording=RecordingOptions("binary")
+    ) as writer:
+        writer.write_batch(
+            IMUBatch.from_array(make_records(range(5), now - 245 + np.arange(5) * 10))
+        )
+    append_estimate(str(tmp_path / "b.imu.clock"), ClockEstimate(now, 250.0, 1.0), 84)
+    os.remove(tmp_path / "a.csv.clock")
+    append_estimate(str(tmp_path / "a.csv.clock"), ClockEstimate(now, 0.0, 1.0), 83)
+
+    recordings = [str(tmp_path / "a.csv"), str(tmp_path / "b.imu")]
+    merged = np.concatenate(list(merge_recordings(recordings, chunk_rows=2)))
+    assert merged.dtype == MERGED_DTYPE
+    assert list(merged["device_id"]) == [83, 84] * 5
+    assert list(merged["capture_time_ms"] - now) == [0, 5, 10, 15, 20, 25, 30, 35, 40, 45]
+
+    rows = write_merged_csv(
+        merge_recordings(recordings, [None, None]), str(tmp_path / "merged.csv")
+    )
+    assert rows == 10
+    lines = (tmp_path / "merged.csv").read_text().splitlines()
+    assert lines[0] + "\n" == CSV_HEADER
+    # Uncorrected, device 84's clock puts its samples first
+    assert lines[1].endswith(",84")
@@ -3,15 +3,31 @@ from imu.FakeIMU import FakeIMU
 from imu.IMUData import IMUData
 
 
+class DummyMQTT:
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, topic: str, payload: str):
+        self.messages.append((topic, payload))
+
+
 class DummyClient:
     IMU = "IMU"
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, client_type=IMU, device_id="0", **kwargs):
+        self.client_type = client_type
+        self.device_id = device_id
         self.messages = []
+        self.mqtt = DummyMQTT()
 
     def publish(self, payload: str):
         self.messages.append(payload)
 
+    def subtopic(self, name: str) -> list[str]:
+        """Payloads published on `name` below the device topic"""
+        topic = f"{self.client_type}/{self.device_id}/{name}"
+        return [payload for t, payload in self.mqtt.messages if t == topic]
+
     def disconnect(self):
         return None
 
@@ -24,7 +40,7 @@ def test_fake_imu_counter_starts_at_zero_and_increments():
     assert first_sample.counter == 0
     assert second_sample.counter == 1
 
-    imu.file.close()
+    imu.close()
 
 
 def test_data_writer_includes_counter_in_csv_and_mqtt(monkeypatch, tmp_path):
@@ -52,6 +68,7 @@ def test_data_writer_includes_counter_in_csv_and_mqtt(monkeypatch, tmp_path):
         )
 
         writer.write_data(sample)
+        writer.sync()
 
         assert writer.mqtt_client.messages[0].startswith("1523,")
         mqtt_fields = writer.mqtt_client.messages[0].split(",")
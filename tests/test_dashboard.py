@@ -0,0 +1,73 @@
+import time
+
+import numpy as np
+
+from imu.Dashboard import SPARK_CHARS, Dashboard, sparkline
+from imu.IMUData import IMUData
+from imu.Scheduler import SpinScheduler
+
+
+class FakeScreen:
+    def __init__(self):
+        self.lines = {}
+        self.refreshes = 0
+
+    def addstr(self, y, x, text):
+        self.lines[y] = text
+
+    def clrtoeol(self):
+        pass
+
+    def refresh(self):
+        self.refreshes += 1
+
+
+def sample(counter: int, value: float) -> IMUData:
+    return IMUData(counter, 0, 0, value, 0, 9.81, 0, 0, -value, 0, 0, 0, 0, 0, 0)
+
+
+def test_sparkline_scales_to_its_range():
+    assert sparkline(np.array([0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0])) == SPARK_CHARS
+    assert sparkline(np.array([np.nan, 2.0, 2.0])) == " " + SPARK_CHARS[0] * 2
+    assert sparkline(np.full(3, np.nan)) == "   "
+    assert sparkline(np.arange(10.0), width=4) == SPARK_CHARS[0] + "▃▅" + SPARK_CHARS[-1]
+
+
+def test_update_never_touches_the_screen():
+    screen = FakeScreen()
+    dashboard = Dashboard(screen, history=4)
+    for i in range(6):
+        dashboard.update(sample(i, float(i)))
+
+    assert screen.refreshes == 0
+    assert dashboard.samples == 6
+    assert list(dashboard.history()[:, 0]) == [2.0, 3.0, 4.0, 5.0]
+
+
+def test_lines_show_values_sparklines_and_stats():
+    screen = FakeScreen()
+    scheduler = SpinScheduler(10)
+    dashboard = Dashboard(screen, history=8, scheduler=scheduler)
+    for i in range(8):
+        dashboard.update(sample(i, float(i)))
+
+    lines = dashboard.lines()
+    assert lines[0] == "Basic reading"
+    assert lines[1].startswith("Accel X: 007.000")
+    assert lines[1].endswith(SPARK_CHARS)
+    # Gyro Z falls
+    assert lines[6].endswith(SPARK_CHARS[::-1])
+    assert any(line.startswith("Sample rate:") for line in lines)
+    assert any(line.startswith("Overruns: 0") for line in lines)
+
+
+def test_draws_at_the_refresh_rate_from_its_own_thread():
+    screen = FakeScreen()
+    with Dashboard(screen, refresh_hz=50) as dashboard:
+        for i in range(30):
+            dashboard.update(sample(i, float(i)))
+            time.sleep(0.01)
+
+    # About 0.3 s at 50 Hz, independent of the 30 samples
+    assert 5 <= screen.refreshes <= 21
+    assert screen.lines[1].startswith("Accel X: 029.000")
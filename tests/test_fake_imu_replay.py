@@ -0,0 +1,120 @@
+import time
+
+import numpy as np
+import pytest
+
+from imu.BinaryRecorder import BinaryRecorder
+from imu.DataWriter import DataWriter
+from imu.FakeIMU import FakeIMU, load_recording
+from imu.IMUBatch import IMUBatch
+from imu.IMUData import IMUData
+
+from .test_counter import DummyClient
+
+
+def write_legacy_csv(path, rows: int):
+    path.write_text(
+        "".join(",".join(str(i + 0.5 * j) for j in range(12)) + "\n" for i in range(rows))
+    )
+
+
+def test_batches_replay_the_same_samples_as_single_reads():
+    single = FakeIMU(sample_filename="data/sample_data.csv")
+    batched = FakeIMU(sample_filename="data/sample_data.csv")
+
+    samples = [single.read_data() for _ in range(20)]
+    batch = batched.read_batch(15)
+    batched.read_batch(5, out=batch)
+
+    for data, replayed in zip(samples, batch):
+        assert replayed.counter == data.counter
+        assert replayed.accel_x == data.accel_x
+        assert replayed.roll == data.roll
+
+
+def test_replay_loops_at_the_end(tmp_path):
+    recording = tmp_path / "short.csv"
+    write_legacy_csv(recording, 3)
+    imu = FakeIMU(sample_filename=str(recording))
+
+    batch = imu.read_batch(7)
+
+    assert list(batch.column("accel_x")) == [0, 1, 2, 0, 1, 2, 0]
+    assert list(batch.column("counter")) == list(range(7))
+
+
+def test_recordings_in_every_format_load_the_same(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+    samples = [
+        IMUData(i, 1711111111111 + 20 * i, 0, *(i + 0.25 * j for j in range(12)))
+        for i in range(5)
+    ]
+
+    csv_fname = tmp_path / "rec.csv"
+    with DataWriter(csv_fname=str(csv_fname)) as writer:
+        writer.write_batch(IMUBatch.from_samples(samples))
+
+    imu_fname = tmp_path / "rec.imu"
+    with BinaryRecorder(str(imu_fname)) as recorder:
+        recorder.write_batch(IMUBatch.from_samples(samples))
+
+    for fname in (csv_fname, imu_fname):
+        values, offsets_ms = load_recording(str(fname))
+        assert values.shape == (5, 12)
+        assert values[4, 11] == 4 + 0.25 * 11
+        assert list(offsets_ms) == [0, 20, 40, 60, 80]
+
+    values, offsets_ms = load_recording("data/sample_data.csv")
+    assert values.shape[1] == 12
+    assert list(offsets_ms[:3]) == [0, 10, 20]
+
+
+@pytest.mark.parametrize("speed", [10.0, 20.0])
+def test_replay_at_scaled_rate(tmp_path, speed):
+    recording = tmp_path / "paced.csv"
+    write_legacy_csv(recording, 10)
+    imu = FakeIMU(sample_filename=str(recording), speed=speed)
+
+    start = time.monotonic()
+    batch = imu.read_batch(11)
+    elapsed_ms = (time.monotonic() - start) * 1e3
+
+    # 11th sample is due one full 100 ms pass later
+    assert elapsed_ms >= 100 / speed - 1
+    np.testing.assert_allclose(
+        np.diff(batch.column("capture_time_ms")), 10 / speed, atol=1
+    )
+
+
+def test_as_fast_as_possible_does_not_wait():
+    imu = FakeIMU(sample_filename="data/sample_data.csv")
+
+    start = time.monotonic()
+    imu.read_batch(100_000)
+
+    assert time.monotonic() - start < 1.0
+
+
+def test_read_available_returns_samples_due_so_far(tmp_path):
+    recording = tmp_path / "legacy.csv"
+    write_legacy_csv(recording, 1000)
+    imu = FakeIMU(sample_filename=str(recording), speed=100.0)
+
+    assert imu.read_available().size <= 1
+    time.sleep(0.05)
+    batch = imu.read_available()
+
+    # 50 ms at 100x is 5 s of recording, 10 ms apart
+    assert 300 <= imu._played <= 1000
+    assert np.array_equal(batch.column("counter"), np.arange(imu._played - batch.size, imu._played))
+    assert (np.diff(batch.column("capture_time_ms")) >= 0).all()
+
+
+def test_reads_after_close_raise():
+    imu = FakeIMU(sample_filename="data/sample_data.csv")
+    imu.read_data()
+    imu.close()
+
+    for read in (imu.read_data, lambda: imu.read_batch(4), imu.read_available):
+        with pytest.raises(ValueError, match="FakeIMU is closed"):
+            read()
@@ -0,0 +1,248 @@
+import socket
+import time
+from threading import Event
+
+import numpy as np
+import pytest
+
+from imu.DataWriter import DataWriter
+from imu.FanOutWriter import (
+    CSVSink,
+    FanOutWriter,
+    MQTTSink,
+    Sink,
+    SocketSink,
+    parse_sink,
+)
+from imu.IMUBatch import CSV_HEADER, IMU_DTYPE, IMUBatch
+from imu.Metrics import METRICS
+from imu.RecordingSink import RecordingOptions
+from imu.RingBuffer import RingBuffer
+
+from .test_counter import DummyClient
+
+
+class ListSink(Sink):
+    name = "list"
+
+    def __init__(self):
+        self.payloads = []
+        self.closed = False
+
+    def write(self, payload):
+        self.payloads.append(payload)
+
+    def close(self):
+        self.closed = True
+
+
+class StuckSink(Sink):
+    name = "stuck"
+
+    def __init__(self):
+        self.release = Event()
+
+    def write(self, payload):
+        self.release.wait(5)
+
+
+class BrokenSink(Sink):
+    name = "broken"
+
+    def write(self, payload):
+        raise OSError("disk on fire")
+
+
+ROWS = [f"{i},0,0" for i in range(10)]
+
+
+def test_sinks_share_one_payload(tmp_path):
+    first, second = ListSink(), ListSink()
+    csv_sink = CSVSink(str(tmp_path / "out.csv"))
+
+    with FanOutWriter([first, second, csv_sink]) as writer:
+        writer.write_rows(ROWS[:5])
+        writer.write_rows(ROWS[5:])
+
+    assert b"".join(first.payloads) == ("\n".join(ROWS) + "\n").encode()
+    assert all(a is b for a, b in zip(first.payloads, second.payloads))
+    assert first.closed
+    assert (tmp_path / "out.csv").read_text() == CSV_HEADER + "\n".join(ROWS) + "\n"
+
+    stats = writer.stats()
+    assert stats["list"]["samples"] == 10
+    assert stats["list"]["payloads"] == 2
+    assert stats["list#2"]["samples"] == 10
+    assert stats[f"csv:{tmp_path / 'out.csv'}"]["errors"] == 0
+
+
+def test_stuck_and_broken_sinks_are_isolated():
+    stuck, broken, healthy = StuckSink(), BrokenSink(), ListSink()
+    writer = FanOutWriter([stuck, broken, healthy], queue_size=4, overflow=RingBuffer.DROP_NEWEST)
+    writer.start()
+
+    start = time.monotonic()
+    for row in ROWS:
+        writer.write_rows([row])
+        # Time for the healthy sink to keep up
+        time.sleep(0.01)
+    assert time.monotonic() - start < 0.5
+
+    stuck.release.set()
+    writer.close()
+
+    stats = writer.stats()
+    assert len(healthy.payloads) == 10
+    assert stats["stuck"]["dropped"] >= 5
+    assert stats["broken"]["errors"] == 10
+    assert "disk on fire" in stats["broken"]["last_error"]
+
+
+def test_block_policy_waits_at_most_the_timeout():
+    stuck = StuckSink()
+    writer = FanOutWriter([stuck], queue_size=1, overflow=RingBuffer.BLOCK, block_timeout_s=0.05)
+    writer.start()
+
+    start = time.monotonic()
+    for row in ROWS[:4]:
+        writer.write_rows([row])
+    assert time.monotonic() - start < 1.0
+
+    stuck.release.set()
+    writer.close()
+    assert writer.stats()["stuck"]["dropped"] >= 1
+
+
+def test_udp_sink_cuts_datagrams_at_rows():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(2)
+    sink = SocketSink(receiver.getsockname(), max_datagram=20)
+
+    with FanOutWriter([sink]) as writer:
+        writer.write_rows(ROWS)
+
+    datagrams = []
+    while sum(d.count(b"\n") for d in datagrams) < len(ROWS):
+        datagrams.append(receiver.recv(100))
+    receiver.close()
+
+    assert all(len(d) <= 20 and d.endswith(b"\n") for d in datagrams)
+    assert b"".join(datagrams) == ("\n".join(ROWS) + "\n").encode()
+
+
+def test_unix_sink(tmp_path):
+    path = str(tmp_path / "imu.sock")
+    receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    receiver.bind(path)
+    receiver.settimeout(2)
+
+    with FanOutWriter([parse_sink(f"unix://{path}")]) as writer:
+        writer.write_rows(ROWS[:2])
+
+    assert receiver.recv(100) == b"0,0,0\n1,0,0\n"
+    receiver.close()
+
+
+def test_mqtt_sink_publishes_rows():
+    sink = MQTTSink(lambda: DummyClient(broker_ip="x", client_type=None, device_id="0"))
+
+    with FanOutWriter([sink]) as writer:
+        writer.write_rows(ROWS[:3])
+
+    assert sink.client.messages == ROWS[:3]
+
+
+def test_parse_sink():
+    assert parse_sink("udp://10.0.0.2:9870").address == ("10.0.0.2", 9870)
+    assert parse_sink("udp://:9870").address == ("127.0.0.1", 9870)
+    assert parse_sink("unix:///tmp/imu.sock").address == "/tmp/imu.sock"
+    assert parse_sink("csv://copy.csv").fname == "copy.csv"
+    assert parse_sink("mqtt://broker:1883").name == "mqtt:broker:1883"
+    for spec in ("udp://host", "mqtt://broker", "tcp://host:1", "copy.csv"):
+        with pytest.raises(ValueError):
+            parse_sink(spec)
+
+
+def test_data_writer_streams_the_recorded_rows(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+    output_csv = tmp_path / "main.csv"
+    copy_csv = tmp_path / "copy.csv"
+    records = np.zeros(50, dtype=IMU_DTYPE)
+    records["counter"] = np.arange(50)
+
+    with DataWriter(csv_fname=str(output_csv), sinks=[f"csv://{copy_csv}"]) as writer:
+        writer.write_batch(IMUBatch.from_array(records[:30]))
+        for i in range(30, 50):
+            writer.write_data(IMUBatch.from_array(records[i : i + 1])[0])
+
+    assert copy_csv.read_text() == output_csv.read_text()
+    assert len(writer.mqtt_client.messages) == 50
+
+
+class BrokerClient(DummyClient):
+    def __init__(self, **kwargs):
+        super().__init__()
+        self.kwargs = kwargs
+
+
+def test_mqtt_sink_from_spec_publishes_as_the_device(monkeypatch):
+    monkeypatch.setattr("imu.FanOutWriter.Client", BrokerClient)
+    sink = parse_sink("mqtt://10.0.0.5:1884", device_id=83)
+
+    with FanOutWriter([sink]) as writer:
+        writer.write_rows(ROWS[:2])
+
+    assert sink.client.kwargs["broker_ip"] == "10.0.0.5"
+    assert sink.client.kwargs["broker_port"] == 1884
+    assert sink.client.kwargs["device_id"] == "83"
+    assert sink.client.messages == ROWS[:2]
+
+
+def test_data_writer_shares_the_csv_text_with_the_sinks(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+    sink = ListSink()
+    records = np.zeros(20, dtype=IMU_DTYPE)
+    records["counter"] = np.arange(20)
+
+    with DataWriter(csv_fname=str(tmp_path / "main.csv"), sinks=[sink]) as writer:
+        writer.write_batch(IMUBatch.from_array(records[:10]))
+        writer.write_batch(IMUBatch.from_array(records[10:]))
+
+    # Formatted once per block, for the recording, MQTT and the sinks
+    assert len(sink.payloads) == 2
+    assert (tmp_path / "main.csv").read_bytes() == CSV_HEADER.encode() + b"".join(sink.payloads)
+    assert writer.mqtt_client.messages == b"".join(sink.payloads).decode().splitlines()
+
+
+def test_stuck_broker_does_not_delay_the_recording(monkeypatch, tmp_path):
+    release = Event()
+
+    class StuckClient(DummyClient):
+        def publish(self, payload: str):
+            release.wait(5)
+            super().publish(payload)
+
+    monkeypatch.setattr("imu.DataWriter.Client", StuckClient)
+    records = np.zeros(100, dtype=IMU_DTYPE)
+    records["counter"] = np.arange(100)
+
+    with DataWriter(
+        csv_fname=str(tmp_path / "main.csv"),
+        recording=RecordingOptions(flush_rows=10),
+        sink_queue_size=4,
+    ) as writer:
+        start = time.monotonic()
+        for i in range(0, 100, 10):
+            writer.write_batch(IMUBatch.from_array(records[i : i + 10]))
+        assert time.monotonic() - start < 1.0
+        assert writer.fanout.channels[0].sync(2.0)
+        release.set()
+
+    lines = (tmp_path / "main.csv").read_text().splitlines()[1:]
+    assert [int(line.split(",")[0]) for line in lines] == list(range(100))
+    stats = writer.fanout.stats()
+    assert stats["mqtt"]["dropped"] > 0
+    assert stats["recording"]["dropped"] == 0
+    dropped = METRICS.snapshot()['sink_dropped_total{device="0",sink="mqtt"}']
+    assert dropped >= stats["mqtt"]["dropped"]
@@ -0,0 +1,103 @@
+from imu.DataWriter import DataWriter
+from imu.IMUBatch import IMUBatch
+from imu.IMUData import IMUData
+from imu.RecordingSink import RecordingOptions
+
+from .test_counter import DummyClient
+
+
+class FailingClient(DummyClient):
+    def __init__(self, *args, **kwargs):
+        raise ConnectionError("no broker")
+
+
+def make_sample(counter: int) -> IMUData:
+    return IMUData(counter, 1711111111111, 0, *(float(i) for i in range(12)))
+
+
+def data_lines(path) -> list[str]:
+    return path.read_text().splitlines()[1:]
+
+
+def test_rows_are_buffered_until_flush_rows(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", FailingClient)
+    output_csv = tmp_path / "rows.csv"
+
+    with DataWriter(
+        csv_fname=str(output_csv),
+        recording=RecordingOptions(flush_rows=3, flush_bytes=None, flush_interval_s=None),
+    ) as writer:
+        writer.write_data(make_sample(0))
+        writer.write_data(make_sample(1))
+        writer.sync()
+        assert data_lines(output_csv) == []
+
+        writer.write_data(make_sample(2))
+        writer.sync()
+        assert [line.split(",")[0] for line in data_lines(output_csv)] == ["0", "1", "2"]
+
+        writer.write_data(make_sample(3))
+        writer.sync()
+        assert writer.flush_stats()["flushes"] == 1
+
+    assert len(data_lines(output_csv)) == 4
+    assert writer.flush_stats()["rows"] == 4
+
+
+def test_flush_by_bytes_and_time(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", FailingClient)
+
+    by_bytes = tmp_path / "bytes.csv"
+    with DataWriter(
+        csv_fname=str(by_bytes),
+        recording=RecordingOptions(flush_rows=1000, flush_bytes=300, flush_interval_s=None),
+    ) as writer:
+        writer.write_data(make_sample(0))
+        writer.sync()
+        assert data_lines(by_bytes) == []
+        writer.write_data(make_sample(1))
+        writer.sync()
+        assert len(data_lines(by_bytes)) == 2
+
+    by_time = tmp_path / "time.csv"
+    with DataWriter(
+        csv_fname=str(by_time),
+        recording=RecordingOptions(flush_rows=1000, flush_bytes=None, flush_interval_s=0),
+    ) as writer:
+        writer.write_data(make_sample(0))
+        writer.sync()
+        assert len(data_lines(by_time)) == 1
+
+
+def test_buffered_rows_keep_order_with_mqtt(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+    output_csv = tmp_path / "mqtt.csv"
+
+    with DataWriter(
+        csv_fname=str(output_csv), recording=RecordingOptions(flush_rows=1000, fsync_every=1)
+    ) as writer:
+        writer.write_data(make_sample(0))
+        writer.write_batch(IMUBatch.from_samples(make_sample(i) for i in (1, 2)))
+        writer.write_data(make_sample(3))
+        writer.sync()
+
+        assert [m.split(",")[0] for m in writer.mqtt_client.messages] == ["0", "1", "2", "3"]
+
+    lines = data_lines(output_csv)
+    assert [line.split(",")[0] for line in lines] == ["0", "1", "2", "3"]
+    assert lines == writer.mqtt_client.messages
+
+
+def test_single_samples_and_batches_keep_order(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", FailingClient)
+    output_csv = tmp_path / "mixed.csv"
+
+    with DataWriter(
+        csv_fname=str(output_csv), recording=RecordingOptions(flush_rows=1000)
+    ) as writer:
+        writer.write_data(make_sample(0))
+        writer.write_batch(IMUBatch.from_samples(make_sample(i) for i in (1, 2)))
+        writer.write_data(make_sample(3))
+        writer.write_data(make_sample(4))
+
+    assert [line.split(",")[0] for line in data_lines(output_csv)] == ["0", "1", "2", "3", "4"]
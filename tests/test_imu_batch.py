@@ -0,0 +1,101 @@
+import numpy as np
+
+from imu.DataWriter import DataWriter
+from imu.FakeIMU import FakeIMU
+from imu.IMUBatch import FIELDS, IMU_DTYPE, IMUBatch
+from imu.IMUData import IMUData
+
+from .test_counter import DummyClient
+
+
+def make_sample(counter: int) -> IMUData:
+    return IMUData(counter, 1711111111111 + counter, 0, *(float(i) for i in range(1, 13)))
+
+
+def test_imu_batch_appends_in_place_and_indexes_as_imu_data():
+    batch = IMUBatch(capacity=4)
+    buffer = batch.data
+
+    for i in range(3):
+        batch.append(make_sample(i))
+
+    assert len(batch) == 3
+    assert batch.data is buffer
+    assert batch[1] == make_sample(1)
+    assert batch[-1].counter == 2
+    assert list(batch.column("counter")) == [0, 1, 2]
+    assert [data.counter for data in batch] == [0, 1, 2]
+
+    batch.clear()
+    batch.append(make_sample(7))
+    assert batch.data is buffer
+    assert batch[0].counter == 7
+
+
+def test_imu_batch_grows_when_full():
+    batch = IMUBatch.from_samples(make_sample(i) for i in range(3))
+    batch.extend(batch.samples.copy())
+
+    assert len(batch) == 6
+    assert batch.capacity >= 6
+    assert list(batch.column("counter")) == [0, 1, 2, 0, 1, 2]
+
+
+def test_imu_dtype_is_little_endian_and_follows_field_order():
+    assert IMU_DTYPE.names == FIELDS
+    assert all(IMU_DTYPE[name].byteorder in "<|=" for name in FIELDS)
+    assert IMU_DTYPE.itemsize == 15 * 8
+
+
+def test_fake_imu_reads_batches_matching_read_data():
+    imu = FakeIMU(sample_filename="data/sample_data.csv")
+    batch = imu.read_batch(5)
+    single = imu.read_data()
+
+    assert list(batch.column("counter")) == [0, 1, 2, 3, 4]
+    assert single.counter == 5
+    np.testing.assert_allclose(
+        batch.column("accel_x")[:2], [-0.0390625, 0.015625]
+    )
+
+    imu.close()
+
+
+def test_write_batch_matches_write_data_rows(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+
+    single_csv = tmp_path / "single.csv"
+    batch_csv = tmp_path / "batch.csv"
+    samples = [make_sample(i) for i in range(3)]
+
+    with DataWriter(csv_fname=str(single_csv), device_id=5) as writer:
+        for data in samples:
+            writer.write_data(data)
+
+    with DataWriter(csv_fname=str(batch_csv), device_id=5) as writer:
+        writer.write_batch(IMUBatch.from_samples(samples))
+        writer.sync()
+
+        assert len(writer.mqtt_client.messages) == 3
+        assert writer.mqtt_client.messages[0].startswith("0,1711111111111,")
+        assert writer.mqtt_client.messages[0].endswith(",12.0,5")
+
+    def without_recorded_at(path):
+        rows = [line.split(",") for line in path.read_text().splitlines()[1:]]
+        return [row[:2] + row[3:] for row in rows]
+
+    assert without_recorded_at(single_csv) == without_recorded_at(batch_csv)
+
+
+def test_written_samples_carry_their_recording_time(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+    data = make_sample(0)
+    batch = IMUBatch.from_samples(make_sample(i) for i in range(1, 4))
+
+    with DataWriter(csv_fname=str(tmp_path / "out.csv")) as writer:
+        writer.write_data(data)
+        writer.write_batch(batch)
+
+    rows = [line.split(",") for line in (tmp_path / "out.csv").read_text().splitlines()[1:]]
+    assert data.recorded_at_time_ms == int(rows[0][2]) > 0
+    assert list(batch.column("recorded_at_time_ms")) == [int(row[2]) for row in rows[1:]]
@@ -0,0 +1,162 @@
+import sys
+import time
+import urllib.request
+from threading import Thread
+
+import numpy as np
+import pytest
+
+from imu.DataWriter import DataWriter
+from imu.encoding import STATUS_PREFIX, decode_payload, decode_status
+from imu.IMUBatch import IMU_DTYPE, IMUBatch
+from imu.Metrics import METRICS, Metrics, MetricsServer
+from imu.MQTTPublisher import MQTTOptions
+from imu.RecordingSink import RecordingOptions
+from imu.Scheduler import SpinScheduler
+
+from .test_counter import DummyClient
+
+
+def test_histogram_buckets_and_snapshot():
+    metrics = Metrics()
+    hist = metrics.histogram("read_seconds", "Read time", imu="0x4b")
+    for ms in (0.05, 0.3, 0.3, 7, 3000):
+        hist.observe_ns(int(ms * 1e6))
+
+    assert metrics.histogram("read_seconds", imu="0x4b") is hist
+    snapshot = metrics.snapshot()['read_seconds{imu="0x4b"}']
+    assert snapshot["count"] == 5
+    assert snapshot["max_ms"] == pytest.approx(3000)
+
+    text = metrics.render_prometheus()
+    assert "# TYPE read_seconds histogram" in text
+    assert 'read_seconds_bucket{imu="0x4b",le="0.0001"} 1' in text
+    assert 'read_seconds_bucket{imu="0x4b",le="0.0005"} 3' in text
+    assert 'read_seconds_bucket{imu="0x4b",le="+Inf"} 5' in text
+    assert 'read_seconds_count{imu="0x4b"} 5' in text
+
+
+def test_counters_with_labels():
+    metrics = Metrics()
+    metrics.counter("errors_total", "Errors", error="packet").inc()
+    metrics.counter("errors_total", error="batch").inc(3)
+
+    text = metrics.render_prometheus()
+    assert text.count("# TYPE errors_total counter") == 1
+    assert 'errors_total{error="batch"} 3' in text
+    assert 'errors_total{error="packet"} 1' in text
+    with pytest.raises(ValueError):
+        metrics.gauge("errors_total", error="packet")
+
+
+def test_cheap_enough_for_the_hot_path():
+    hist = Metrics().histogram("t")
+    start = time.perf_counter()
+    for i in range(100_000):
+        hist.observe_ns(i * 100)
+    # Far below the 10 ms budget of a 100 Hz loop per observation
+    assert (time.perf_counter() - start) / 100_000 < 20e-6
+
+
+def test_server_serves_prometheus_text():
+    metrics = Metrics()
+    metrics.gauge("queue_depth").set(7)
+    server = MetricsServer(0, "127.0.0.1", metrics).start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            body = response.read().decode()
+    finally:
+        server.stop()
+
+    assert "queue_depth 7" in body
+
+
+def test_counters_and_histograms_count_every_thread():
+    # Switch threads as often as possible to expose lost updates
+    previous = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    metrics = Metrics()
+    counter = metrics.counter("writes_total")
+    hist = metrics.histogram("write_seconds")
+
+    def work():
+        for _ in range(20_000):
+            counter.inc()
+            hist.observe_ns(1000)
+
+    try:
+        threads = [Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(previous)
+
+    assert counter.value == 160_000
+    assert hist.count == 160_000
+    assert hist.cumulative()[-1] == 160_000
+
+
+def test_scheduler_reports_overruns():
+    METRICS.reset()
+    now = [0]
+    scheduler = SpinScheduler(10, clock=lambda: now[0])
+    now[0] = 35_000_000
+    scheduler.wait()
+
+    snapshot = METRICS.snapshot()
+    assert snapshot['loop_missed_slots_total{loop="main"}'] == 2
+    assert snapshot['loop_lateness_seconds{loop="main"}']["max_ms"] == pytest.approx(25)
+
+    # Loops running side by side count separately
+    other = SpinScheduler(10, clock=lambda: now[0], name="acquisition-1")
+    now[0] += 15_000_000
+    other.wait()
+    snapshot = METRICS.snapshot()
+    assert snapshot['loop_missed_slots_total{loop="main"}'] == 2
+    assert snapshot['loop_missed_slots_total{loop="acquisition-1"}'] == 0
+
+
+def test_data_writer_counts_gaps_and_publishes_status(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+    METRICS.reset()
+    records = np.zeros(10, dtype=IMU_DTYPE)
+    records["counter"] = [0, 1, 2, 5, 6, 7, 8, 20, 21, 22]
+
+    with DataWriter(
+        csv_fname=str(tmp_path / "out.csv"),
+        device_id=3,
+        recording=RecordingOptions(flush_rows=4),
+        mqtt=MQTTOptions(status_every_s=1e-9),
+    ) as writer:
+        writer.write_batch(IMUBatch.from_array(records[:5]))
+        for i in range(5, 10):
+            writer.write_data(IMUBatch.from_array(records[i : i + 1])[0])
+
+    snapshot = METRICS.snapshot()
+    assert snapshot['sample_gaps_total{device="3"}'] == 2
+    assert snapshot['samples_missing_total{device="3"}'] == 2 + 11
+    assert snapshot['samples_written_total{device="3"}'] == 10
+    assert snapshot['writer_flush_seconds{device="3"}']["count"] >= 2
+
+    assert not any(m.startswith(STATUS_PREFIX) for m in writer.mqtt_client.messages)
+    statuses = writer.mqtt_client.subtopic("status")
+    assert len(statuses) == 6
+    device_id, _, metrics = decode_status(statuses[-1])
+    assert device_id == 3
+    assert metrics['samples_written_total{device="3"}'] == 10
+    with pytest.raises(ValueError):
+        decode_payload(statuses[0])
+
+
+def test_data_writer_without_gap_counting(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+    METRICS.reset()
+    records = np.zeros(4, dtype=IMU_DTYPE)
+    records["counter"] = [0, 10, 20, 30]
+
+    with DataWriter(csv_fname=str(tmp_path / "out.csv"), device_id=4, count_gaps=False) as writer:
+        writer.write_batch(IMUBatch.from_array(records))
+
+    assert 'sample_gaps_total{device="4"}' not in METRICS.snapshot()
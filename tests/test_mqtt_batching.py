@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from imu.DataWriter import DataWriter
+from imu.encoding import ENCODINGS, decode_payload, encode_batch
+from imu.FakeIMU import FakeIMU
+from imu.IMUData import IMUData
+from imu.MQTTPublisher import MQTTOptions
+from imu.QuantizedRecorder import STEPS
+
+from .test_counter import DummyClient
+
+
+@pytest.fixture
+def records():
+    imu = FakeIMU(sample_filename="data/sample_data.csv")
+    batch = imu.read_batch(50)
+    imu.close()
+    # Yaw/pitch/roll come rounded to 3 decimals from a real IMU
+    for name in ("yaw", "pitch", "roll"):
+        batch.column(name)[:] = np.round(batch.column(name), 3)
+    return batch.samples
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_batch_encodings_round_trip(records, encoding):
+    payload = encode_batch(records, 84, encoding)
+
+    assert payload.startswith(f"#imu-batch,1,{encoding},50,84\n")
+
+    device_id, decoded = decode_payload(payload)
+    assert device_id == 84
+    for name in records.dtype.names:
+        # Quantized values are exact to half the sensor's resolution
+        atol = STEPS.get(name, 0) / 2 if encoding == "quantized" else 0
+        np.testing.assert_allclose(decoded[name], records[name], rtol=1e-6, atol=atol)
+
+
+def test_delta_encoding_is_smaller_than_csv(records):
+    csv_payload = encode_batch(records, 84, "csv")
+    delta_payload = encode_batch(records, 84, "delta")
+
+    assert len(delta_payload) < 0.8 * len(csv_payload)
+
+
+def test_single_row_payload_decodes(records):
+    row = ",".join(str(v) for v in records[0].tolist()) + ",83"
+
+    device_id, decoded = decode_payload(row)
+    assert device_id == 83
+    assert decoded[0]["counter"] == records[0]["counter"]
+
+
+def test_data_writer_publishes_single_rows_by_default(monkeypatch, tmp_path, records):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+
+    with DataWriter(csv_fname=str(tmp_path / "out.csv")) as writer:
+        for i in range(3):
+            writer.write_data(_sample(records, i))
+        writer.sync()
+
+        assert len(writer.mqtt_client.messages) == 3
+        assert not writer.mqtt_client.messages[0].startswith("#")
+
+
+def test_data_writer_coalesces_samples(monkeypatch, tmp_path, records):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+
+    with DataWriter(
+        csv_fname=str(tmp_path / "out.csv"), mqtt=MQTTOptions(batch_size=4, encoding="delta")
+    ) as writer:
+        for i in range(10):
+            writer.write_data(_sample(records, i))
+        writer.sync()
+
+        messages = writer.mqtt_client.messages
+        assert len(messages) == 2
+
+    # The partial batch is published on exit
+    assert len(messages) == 3
+    counters = np.concatenate([decode_payload(m)[1]["counter"] for m in messages])
+    assert list(counters) == list(range(10))
+
+
+def test_data_writer_publishes_batches_by_age(monkeypatch, tmp_path, records):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+
+    with DataWriter(
+        csv_fname=str(tmp_path / "out.csv"), mqtt=MQTTOptions(batch_size=1000, batch_ms=0)
+    ) as writer:
+        writer.write_data(_sample(records, 0))
+        writer.sync()
+        assert writer.mqtt_client.messages[0].startswith("#imu-batch,1,csv,1,")
+
+
+def _sample(records, i):
+    return IMUData(*records[i].tolist())
@@ -0,0 +1,198 @@
+import time
+
+from imu.DataWriter import DataWriter
+from imu.IMUData import IMUData
+from imu.MQTTPublisher import AsyncPublisher, MQTTOptions
+
+from .test_counter import DummyClient
+
+
+class Broker:
+    """Stand-in broker whose availability can be toggled"""
+
+    def __init__(self, up: bool = True):
+        self.up = up
+        self.messages = []
+        self.clients = 0
+
+    def connect(self):
+        if not self.up:
+            raise ConnectionError("broker down")
+        self.clients += 1
+        return BrokerClient(self)
+
+
+class BrokerClient:
+    def __init__(self, broker: Broker):
+        self.broker = broker
+
+    def publish(self, payload: str):
+        if not self.broker.up:
+            raise ConnectionError("broker down")
+        self.broker.messages.append(payload)
+
+    def disconnect(self):
+        return None
+
+
+def wait_for(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_publisher_sends_queued_payloads_in_order():
+    broker = Broker()
+    publisher = AsyncPublisher(broker.connect).start()
+
+    for i in range(100):
+        assert publisher.publish(str(i))
+    publisher.disconnect()
+
+    assert broker.messages == [str(i) for i in range(100)]
+    assert publisher.stats()["sent"] == 100
+
+
+def test_publisher_reconnects_with_backoff():
+    broker = Broker(up=False)
+    publisher = AsyncPublisher(
+        broker.connect, backoff_initial_s=0.01, backoff_max_s=0.02
+    ).start()
+
+    publisher.publish("queued while down")
+    wait_for(lambda: publisher.connect_failures >= 2)
+    broker.up = True
+    wait_for(lambda: broker.messages)
+    publisher.disconnect()
+
+    assert broker.messages == ["queued while down"]
+    assert publisher.connects == 1
+
+
+def test_publisher_spills_during_outage_and_replays(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    broker = Broker()
+    publisher = AsyncPublisher(
+        broker.connect, spill_fname=str(spill), backoff_initial_s=0.01
+    ).start()
+
+    publisher.publish("before")
+    wait_for(lambda: broker.messages == ["before"])
+
+    broker.up = False
+    publisher.publish("during\noutage")
+    publisher.publish("also during")
+    wait_for(lambda: publisher.spilled == 2)
+    assert spill.exists()
+
+    broker.up = True
+    publisher.publish("after")
+    wait_for(lambda: len(broker.messages) == 4)
+    publisher.disconnect()
+
+    assert broker.messages == ["before", "during\noutage", "also during", "after"]
+    assert publisher.replayed == 2
+    assert not spill.exists()
+
+
+class FlakyClient(BrokerClient):
+    """Goes down after `limit` publishes"""
+
+    def __init__(self, broker: Broker, limit: int):
+        super().__init__(broker)
+        self.limit = limit
+
+    def publish(self, payload: str):
+        if len(self.broker.messages) >= self.limit:
+            self.broker.up = False
+        super().publish(payload)
+
+
+def test_publisher_keeps_only_unsent_spill_after_failed_replay(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    broker = Broker()
+    publisher = AsyncPublisher(broker.connect, spill_fname=str(spill))
+    publisher._spill(["a", "b\nc", "d", "e"])
+
+    publisher.client = FlakyClient(broker, limit=2)
+    publisher._replay_spill()
+
+    assert broker.messages == ["a", "b\nc"]
+    assert publisher.replayed == 2
+    assert publisher.client is None
+    assert spill.read_text().splitlines() == ['"d"', '"e"']
+
+    broker.up = True
+    publisher.client = broker.connect()
+    publisher._replay_spill()
+
+    assert broker.messages == ["a", "b\nc", "d", "e"]
+    assert not spill.exists()
+
+
+def test_publisher_stops_spilling_at_the_limit(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    publisher = AsyncPublisher(Broker().connect, spill_fname=str(spill), spill_max_bytes=12)
+
+    publisher._spill(["one", "two", "three"])
+
+    assert spill.read_text() == '"one"\n"two"\n'
+    assert publisher.spilled == 2
+    assert publisher.spill_dropped == 1
+
+
+def test_publisher_drops_oldest_when_queue_is_full():
+    broker = Broker(up=False)
+    publisher = AsyncPublisher(broker.connect, queue_size=2, backoff_initial_s=10)
+
+    for i in range(5):
+        publisher.publish(str(i))
+
+    assert publisher.stats()["dropped"] == 3
+    assert publisher.queue.get_many(10) == ["3", "4"]
+
+
+def test_data_writer_publishes_asynchronously(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+
+    with DataWriter(
+        csv_fname=str(tmp_path / "out.csv"), mqtt=MQTTOptions(asynchronous=True)
+    ) as writer:
+        publisher = writer.mqtt_client
+        writer.write_data(IMUData(7, 1711111111111, 0, *(0.0,) * 12))
+
+    assert publisher.sent == 1
+    assert publisher.stats()["queued"] == 0
+
+
+def test_data_writer_passes_the_spill_limit(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+
+    with DataWriter(
+        csv_fname=str(tmp_path / "out.csv"),
+        mqtt=MQTTOptions(
+            asynchronous=True, spill_fname=str(tmp_path / "spill.jsonl"), spill_max_bytes=1000
+        ),
+    ) as writer:
+        assert writer.mqtt_client.spill_max_bytes == 1000
+
+
+def test_publisher_sends_and_spills_subtopic_payloads(tmp_path):
+    client = DummyClient(client_type="imu", device_id="4")
+    publisher = AsyncPublisher(lambda: client).start()
+    publisher.publish("1,2,3")
+    publisher.publish("#status", "status")
+    publisher.disconnect()
+
+    assert client.messages == ["1,2,3"]
+    assert client.mqtt.messages == [("imu/4/status", "#status")]
+
+    spill = tmp_path / "spill.jsonl"
+    publisher = AsyncPublisher(lambda: client, spill_fname=str(spill))
+    publisher._spill(["4,5,6", ("clock", "#clock\n")])
+    publisher.client = client
+    publisher._replay_spill()
+
+    assert client.messages == ["1,2,3", "4,5,6"]
+    assert client.subtopic("clock") == ["#clock\n"]
@@ -0,0 +1,77 @@
+from threading import Event, Timer
+
+import pytest
+
+from imu.DataWriter import DataWriter
+from imu.devices import DeviceSpec, open_device, parse_device_spec
+from imu.FakeIMU import FakeIMU, IMU
+from imu.readings import multi_reading
+from imu.Scheduler import SleepScheduler
+
+from .test_counter import DummyClient
+
+
+def test_parse_device_spec():
+    assert parse_device_spec("0x4A:83") == DeviceSpec(83, address=0x4A)
+    assert parse_device_spec("3/0x4B:84") == DeviceSpec(84, address=0x4B, bus=3)
+    assert parse_device_spec("fake:85") == DeviceSpec(85, fake=True)
+    assert parse_device_spec("fake:86:data/x.csv") == DeviceSpec(
+        86, fake=True, sample_filename="data/x.csv"
+    )
+
+    for spec in ("0x4A", "0x4A:abc", "i2c:83", "0x4A:83:data/x.csv"):
+        with pytest.raises(ValueError):
+            parse_device_spec(spec)
+
+
+def test_fake_connections_are_per_key():
+    first = open_device(parse_device_spec("fake:91"))
+    second = open_device(parse_device_spec("fake:92"))
+
+    assert isinstance(first, FakeIMU) and first is not second
+    assert open_device(parse_device_spec("fake:91")) is first
+    # Test mode replays real devices too
+    assert isinstance(open_device(parse_device_spec("0x4A:93"), test=True), FakeIMU)
+
+    IMU._imus.clear()
+
+
+def test_explicit_device_id_beats_environment(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+    monkeypatch.setenv("DEVICE_ID", "84")
+
+    writer = DataWriter(
+        csv_fname=str(tmp_path / "x.csv"), device_id=12, use_env_device_id=False
+    )
+    assert writer.device_id == 12
+
+
+def test_schedulers_share_a_grid():
+    first, second = SleepScheduler(10), SleepScheduler(10)
+    first.start(1_000)
+    second.start(1_000)
+
+    assert first.next_deadline == second.next_deadline == 1_000 + 10_000_000
+
+
+@pytest.mark.parametrize("threads", [1, 2])
+def test_multi_reading_writes_one_file_per_device(monkeypatch, tmp_path, threads):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+    imus = {83: FakeIMU(), 84: FakeIMU(), 85: FakeIMU()}
+
+    stop = Event()
+    Timer(0.1, stop.set).start()
+    multi_reading(
+        imus,
+        interval_ms=5,
+        pacing="sleep",
+        threads=threads,
+        stop=stop,
+        csv_fname=str(tmp_path / "run.csv"),
+    )
+
+    for device_id in imus:
+        lines = (tmp_path / f"run-{device_id}.csv").read_text().splitlines()[1:]
+        assert len(lines) >= 5
+        assert {line.split(",")[-1] for line in lines} == {str(device_id)}
+        assert [int(line.split(",")[0]) for line in lines] == list(range(len(lines)))
@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+
+from imu import Pipeline as pipeline_module
+from imu.DataWriter import DataWriter
+from imu.FakeIMU import FakeIMU
+from imu.IMUBatch import IMUBatch
+from imu.Pipeline import (
+    Biquad,
+    Decimate,
+    Median,
+    MovingAverage,
+    Pipeline,
+    RollingFeature,
+)
+
+from .test_counter import DummyClient
+
+
+@pytest.fixture
+def records():
+    return FakeIMU(sample_filename="data/sample_data.csv").read_batch(97).samples.copy()
+
+
+def run_blocks(stage, records, sizes):
+    out, start = [], 0
+    for size in sizes:
+        out.append(stage.process(records[start : start + size]))
+        start += size
+    out.append(stage.process(records[start:]))
+    return np.concatenate(out)
+
+
+@pytest.mark.parametrize(
+    "make_stage",
+    [
+        lambda: MovingAverage(8),
+        lambda: Median(5),
+        lambda: RollingFeature("rms", 10),
+        lambda: RollingFeature("peak", 3),
+        lambda: RollingFeature("var", 6),
+        lambda: Biquad(5, 100),
+        lambda: Decimate(4),
+        lambda: Pipeline.from_spec("median:3,lowpass:8,decimate:3,rms:4@accel"),
+    ],
+)
+def test_blocks_match_sample_by_sample(records, make_stage):
+    whole = make_stage().process(records)
+    single = run_blocks(make_stage(), records, [1] * len(records))
+    mixed = run_blocks(make_stage(), records, [5, 1, 30, 0, 17])
+
+    for out in (single, mixed):
+        assert out.dtype == whole.dtype
+        for name in whole.dtype.names:
+            assert np.allclose(out[name], whole[name]), name
+
+
+def test_moving_average_and_untouched_fields(records):
+    out = MovingAverage(4, ("accel_x",)).process(records)
+
+    expected = [records["accel_x"][max(0, i - 3) : i + 1].mean() for i in range(len(records))]
+    assert np.allclose(out["accel_x"], expected)
+    assert np.array_equal(out["gyro_x"], records["gyro_x"])
+    assert np.array_equal(out["counter"], records["counter"])
+
+
+def test_median_removes_spikes(records):
+    records["accel_x"] = 1.0
+    records["accel_x"][50] = 1000.0
+
+    assert np.all(Median(3).process(records)["accel_x"] == 1.0)
+
+
+def test_lowpass_settles_on_constant_input(records):
+    records["accel_x"] = 2.5
+    out = Biquad(5, 100).process(records)
+    assert np.allclose(out["accel_x"], 2.5)
+
+
+def test_biquad_without_scipy_matches(monkeypatch, records):
+    with_scipy = Biquad(10, 100).process(records)
+    monkeypatch.setattr(pipeline_module, "lfilter", None)
+    without_scipy = Biquad(10, 100).process(records)
+
+    assert np.allclose(with_scipy["gyro_z"], without_scipy["gyro_z"])
+
+
+def test_lowpass_skips_nan_samples(records):
+    # Mag reports arrive after the first samples, which ReportFIFO fills with NaN
+    records["mag_x"] = 1.0
+    records["mag_x"][:3] = np.nan
+    records["mag_x"][40] = np.nan
+    stage = Biquad(5, 100)
+    out = np.concatenate([stage.process(records[:50]), stage.process(records[50:])])
+
+    assert np.isnan(out["mag_x"][:3]).all()
+    assert np.isnan(out["mag_x"][40])
+    finite = np.delete(out["mag_x"][3:], 37)
+    assert np.allclose(finite, 1.0)
+    assert np.isfinite(out["accel_x"]).all()
+
+
+def test_decimate_keeps_every_nth_sample(records):
+    out = run_blocks(Decimate(4), records, [3, 3, 3])
+    assert list(out["counter"]) == list(range(0, 97, 4))
+
+
+def test_from_spec():
+    pipeline = Pipeline.from_spec("ma:5@accel+yaw, lowpass:10, decimate:2, lowpass:10", 100)
+
+    ma, lowpass, decimate, lowpass_after = pipeline.stages
+    assert ma.fields == ("accel_x", "accel_y", "accel_z", "yaw")
+    assert lowpass.fields[-1] == "mag_z"
+    assert decimate.factor == 2
+    # The second low-pass runs at the decimated rate
+    assert not np.allclose(lowpass.b, lowpass_after.b)
+
+    for spec in ("ma", "smooth:3", "ma:3@accel_w", "lowpass:60"):
+        with pytest.raises(ValueError):
+            Pipeline.from_spec(spec, 100)
+
+
+def test_data_writer_processes_before_output(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+    imu = FakeIMU(sample_filename="data/sample_data.csv")
+    output_csv = tmp_path / "processed.csv"
+
+    with DataWriter(csv_fname=str(output_csv), processing="decimate:10") as writer:
+        for _ in range(25):
+            writer.write_data(imu.read_data())
+        writer.write_batch(imu.read_batch(25, IMUBatch(25)))
+
+    lines = output_csv.read_text().splitlines()[1:]
+    assert [int(line.split(",")[0]) for line in lines] == [0, 10, 20, 30, 40]
+    assert len(writer.mqtt_client.messages) == 5
@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+
+from imu.DataWriter import DataWriter
+from imu.encoding import QUALITY_PREFIX, decode_payload, decode_quality
+from imu.IMUBatch import IMU_DTYPE, IMUBatch
+from imu.MQTTPublisher import MQTTOptions
+from imu.QualityMonitor import DUPLICATE, GAP, STALE, QualityMonitor, QualityOptions
+from imu.SpectrumAnalyzer import SpectrumOptions
+
+from .test_counter import DummyClient
+
+
+def make_records(n: int, interval_ms: int = 10) -> np.ndarray:
+    records = np.zeros(n, dtype=IMU_DTYPE)
+    records["counter"] = np.arange(n)
+    records["capture_time_ms"] = np.arange(n) * interval_ms
+    records["accel_x"] = np.arange(n, dtype=float)
+    return records
+
+
+def test_flags_duplicates_stale_runs_and_gaps():
+    records = make_records(20)
+    # Sensor repeats sample 4 twelve times
+    records["accel_x"][5:17] = records["accel_x"][4]
+    records["capture_time_ms"][18:] += 30
+
+    flags = QualityMonitor(10, stale_samples=10).check(records)
+
+    assert list(np.nonzero(flags & DUPLICATE)[0]) == list(range(5, 17))
+    assert list(np.nonzero(flags & STALE)[0]) == [14, 15, 16]
+    assert list(np.nonzero(flags & GAP)[0]) == [18]
+
+
+def test_state_carries_across_blocks():
+    records = make_records(30)
+    records["accel_x"][10:25] = records["accel_x"][9]
+    records["capture_time_ms"][15:] += 50
+
+    whole = QualityMonitor(10).check(records)
+    monitor = QualityMonitor(10)
+    split = np.concatenate([monitor.check(records[i : i + 7]) for i in range(0, 30, 7)])
+
+    assert np.array_equal(whole, split)
+
+
+def test_windows_follow_capture_time():
+    records = make_records(250)
+    records["counter"][100:] += 3
+    records["accel_x"][50] = records["accel_x"][49]
+    # Nothing captured for 1.5 s after sample 149
+    records["capture_time_ms"][150:] += 1500
+
+    monitor = QualityMonitor(10, window_s=0.5)
+    windows = []
+    for i in range(0, 250, 16):
+        windows.extend(monitor.process(records[i : i + 16])[1])
+    windows.append(monitor.flush())
+
+    assert [(w.start_ms, w.end_ms) for w in windows] == [
+        (0, 500),
+        (500, 1000),
+        (1000, 1500),
+        (3000, 3500),
+        (3500, 4000),
+    ]
+    assert [w.samples for w in windows] == [50, 50, 50, 50, 50]
+    assert windows[1].duplicates == 1
+    assert windows[1].duplicate_ratio == pytest.approx(0.02)
+    assert windows[2].missing == 3
+    assert windows[3].gaps == 1
+    assert windows[3].max_gap_ms == 1510
+    assert windows[0].rate_hz == pytest.approx(100)
+    assert monitor.stats()["samples"] == 250
+    assert monitor.flush() is None
+
+
+def test_drop_and_mark_duplicates():
+    records = make_records(10)
+    records["accel_x"][3:6] = records["accel_x"][2]
+
+    kept, _ = QualityMonitor(10, action="drop").process(records)
+    assert list(kept["counter"]) == [0, 1, 2, 6, 7, 8, 9]
+
+    marked, _ = QualityMonitor(10, action="mark").process(records)
+    assert len(marked) == 10
+    assert np.isnan(marked["accel_x"][3:6]).all()
+    assert np.isnan(marked["yaw"][3:6]).all()
+    assert list(marked["counter"]) == list(range(10))
+    # The input is left alone
+    assert records["accel_x"][3] == 2
+
+
+def test_data_writer_drops_and_publishes_quality(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+    records = make_records(30)
+    records["accel_x"][10:13] = records["accel_x"][9]
+
+    with DataWriter(
+        csv_fname=str(tmp_path / "out.csv"),
+        device_id=5,
+        quality=QualityOptions("drop", window_s=0.1),
+        mqtt=MQTTOptions(batch_size=100),
+    ) as writer:
+        writer.write_batch(IMUBatch.from_array(records[:20]))
+        for i in range(20, 30):
+            writer.write_data(IMUBatch.from_array(records[i : i + 1])[0])
+
+    lines = (tmp_path / "out.csv").read_text().splitlines()
+    assert len(lines) == 1 + 27
+
+    assert not any(m.startswith(QUALITY_PREFIX) for m in writer.mqtt_client.messages)
+    payloads = writer.mqtt_client.subtopic("quality")
+    assert len(payloads) == 3
+    decoded = [decode_quality(payload) for payload in payloads]
+    assert all(device_id == 5 for device_id, _ in decoded)
+    assert [w.samples for _, w in decoded] == [10, 10, 10]
+    assert decoded[1][1].duplicates == 3
+    with pytest.raises(ValueError):
+        decode_payload(payloads[0])
+
+
+def test_data_writer_rejects_marking_before_spectra():
+    with pytest.raises(ValueError):
+        DataWriter(quality=QualityOptions("mark"), spectrum=SpectrumOptions(every_s=1.0))
+    with pytest.raises(ValueError):
+        QualityOptions("skip")
+
+
+def test_marked_duplicates_pass_through_processing(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+    records = make_records(40)
+    records["accel_x"][1:4] = records["accel_x"][0]
+
+    with DataWriter(
+        csv_fname=str(tmp_path / "out.csv"),
+        quality=QualityOptions("mark"),
+        processing="lowpass:5,ma:3",
+        sample_rate_hz=100,
+    ) as writer:
+        writer.write_batch(IMUBatch.from_array(records))
+
+    lines = (tmp_path / "out.csv").read_text().splitlines()[1:]
+    accel_x = np.array([float(line.split(",")[3]) for line in lines])
+    assert len(accel_x) == 40
+    # Only the marked samples themselves are unknown, the filter state survives them
+    assert np.isfinite(accel_x[4:]).all()
@@ -0,0 +1,121 @@
+import numpy as np
+
+from imu.DataWriter import DataWriter
+from imu.encoding import decode_payload, encode_batch
+from imu.FakeIMU import FakeIMU, load_recording
+from imu.IMUBatch import IMU_DTYPE, IMUBatch, format_rows
+from imu.QuantizedRecorder import (
+    STEPS,
+    QuantizedRecorder,
+    decode_block,
+    encode_block,
+    read_quantized,
+)
+from imu.MQTTPublisher import MQTTOptions
+from imu.RecordingIndex import query
+from imu.RecordingSink import RecordingOptions
+
+from .test_counter import DummyClient
+
+
+def sample_records(n: int = 500) -> np.ndarray:
+    imu = FakeIMU(sample_filename="data/sample_data.csv")
+    records = imu.read_batch(n).samples.copy()
+    imu.close()
+    records["capture_time_ms"] = 1711111111111 + 10 * np.arange(n)
+    records["recorded_at_time_ms"] = records["capture_time_ms"] + 3
+    for name in ("yaw", "pitch", "roll"):
+        records[name] = np.round(records[name], 3)
+    return records
+
+
+def assert_quantized_equal(decoded, records):
+    for name in records.dtype.names:
+        np.testing.assert_allclose(
+            decoded[name], records[name], rtol=0, atol=STEPS.get(name, 0) / 2
+        )
+
+
+def test_block_round_trips_to_the_sensor_resolution():
+    records = sample_records()
+    # Values already on the Q-point grid come back exactly
+    records["accel_x"][:5] = [0.0, 1 / 256, -3 / 256, 9.8046875, -0.5]
+
+    for compress in (False, True):
+        decoded, end = decode_block(encode_block(records, compress))
+        assert_quantized_equal(decoded, records)
+        np.testing.assert_array_equal(decoded["accel_x"][:5], records["accel_x"][:5])
+        np.testing.assert_array_equal(decoded["yaw"], records["yaw"])
+
+
+def test_nan_empty_and_single_sample_blocks():
+    records = sample_records(20)
+    records["gyro_y"][3:6] = np.nan
+
+    decoded, _ = decode_block(encode_block(records))
+    assert np.isnan(decoded["gyro_y"][3:6]).all()
+    assert_quantized_equal(np.delete(decoded, [3, 4, 5]), np.delete(records, [3, 4, 5]))
+
+    assert len(decode_block(encode_block(records[:0]))[0]) == 0
+    assert_quantized_equal(decode_block(encode_block(records[:1]))[0], records[:1])
+
+
+def test_at_least_five_times_smaller_than_csv():
+    records = sample_records(1000)
+    csv_bytes = sum(len(row) + 1 for row in format_rows(records, 0))
+
+    blocks = [encode_block(records[i : i + 100]) for i in range(0, 1000, 100)]
+    assert csv_bytes / sum(map(len, blocks)) >= 10
+
+    # Small MQTT batches carry the per-block overhead and base64
+    payloads = [encode_batch(records[i : i + 10], 0, "quantized") for i in range(0, 1000, 10)]
+    csv_payloads = [encode_batch(records[i : i + 10], 0, "csv") for i in range(0, 1000, 10)]
+    assert sum(map(len, csv_payloads)) / sum(map(len, payloads)) >= 5
+
+
+def test_recording_survives_a_partial_last_block(tmp_path):
+    fname = tmp_path / "rec.imuq"
+    records = sample_records(250)
+    with QuantizedRecorder(str(fname), device_id=83, chunk_size=100) as recorder:
+        recorder.write_data(IMUBatch.from_array(records[:1])[0])
+        recorder.write_batch(IMUBatch.from_array(records[1:]))
+
+    header, decoded = read_quantized(str(fname))
+    assert header["device_id"] == 83
+    assert_quantized_equal(decoded, records)
+
+    with open(fname, "r+b") as f:
+        f.truncate(fname.stat().st_size - 10)
+    _, decoded = read_quantized(str(fname))
+    assert len(decoded) == 200
+
+
+def test_data_writer_records_quantized_and_reads_back(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+    records = sample_records(300)
+
+    with DataWriter(
+        csv_fname=str(tmp_path / "out.csv"),
+        recording=RecordingOptions("quantized", flush_rows=64, index_every=10),
+        mqtt=MQTTOptions(batch_size=50, encoding="quantized"),
+    ) as writer:
+        writer.write_batch(IMUBatch.from_array(records))
+
+    fname = tmp_path / "out.imuq"
+    _, decoded = read_quantized(str(fname))
+    assert list(decoded["counter"]) == list(records["counter"])
+    assert writer.flush_stats()["bytes"] == fname.stat().st_size - 16
+    assert not (tmp_path / "out.imuq.idx").exists()
+
+    selected = query(str(fname), from_counter=100, to_counter=149)
+    assert list(selected["counter"]) == list(range(100, 150))
+
+    values, times = load_recording(str(fname))
+    assert values.shape == (300, 12)
+    assert times[-1] == 2990
+
+    published = np.concatenate(
+        [decode_payload(m)[1] for m in writer.mqtt_client.messages]
+    ).astype(IMU_DTYPE)
+    assert len(published) == 300
+    np.testing.assert_allclose(published["mag_z"], records["mag_z"], atol=STEPS["mag_z"] / 2)
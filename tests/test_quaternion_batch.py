@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from imu.FakeIMU import FakeIMU
+
+
+@pytest.fixture
+def imu():
+    imu = FakeIMU(sample_filename="data/sample_data.csv")
+    yield imu
+    imu.close()
+
+
+def legacy_quat_to_ypr(q):
+    """The original NumPy-per-scalar conversion, kept as a reference"""
+    w, x, y, z = q
+    magnitude = np.sqrt(w**2 + x**2 + y**2 + z**2)
+    w, x, y, z = w / magnitude, x / magnitude, y / magnitude, z / magnitude
+
+    yaw = np.degrees(np.arctan2(2.0 * (y * z + w * x), 1 - 2 * (x * x + y * y)))
+    pitch = np.degrees(np.arcsin(2.0 * (w * y - x * z)))
+    roll = np.degrees(np.arctan2(2.0 * (x * y + w * z), 1 - 2 * (y * y + z * z)))
+
+    return tuple(np.round((yaw, pitch, roll), decimals=3))
+
+
+def test_scalar_and_batch_conversion_match_legacy(imu):
+    quats = np.random.default_rng(0).normal(size=(1000, 4))
+
+    batch = imu._quat_to_ypr_batch(quats)
+    scalar = np.array([imu._quat_to_ypr(tuple(q)) for q in quats])
+    legacy = np.array([legacy_quat_to_ypr(q) for q in quats])
+
+    np.testing.assert_allclose(scalar, legacy, atol=1e-3)
+    np.testing.assert_allclose(batch, scalar, atol=1e-3)
+
+
+def test_batch_conversion_applies_tare_and_wraps(imu):
+    quats = np.random.default_rng(1).normal(size=(100, 4))
+    imu._yaw_offset, imu._pitch_offset, imu._roll_offset = 170.0, -20.0, 90.0
+
+    batch = imu._quat_to_ypr_batch(quats)
+    scalar = np.array([imu._tared_ypr(tuple(q)) for q in quats])
+
+    np.testing.assert_allclose(batch, scalar, atol=1e-3)
+    assert batch.min() >= -180 and batch.max() < 180
+
+    untared = imu._quat_to_ypr_batch(quats, tare=False)
+    np.testing.assert_allclose(untared[0], imu._quat_to_ypr(tuple(quats[0])))
+
+
+def test_gimbal_lock_is_clamped(imu):
+    assert imu._quat_to_ypr((1, 0, 1, 0))[1] == 90
+    assert imu._quat_to_ypr_batch([(1, 0, 1, 0)])[0, 1] == 90
+
+
+def test_zero_quaternion_is_rejected(imu):
+    with pytest.raises(ValueError):
+        imu._quat_to_ypr((0, 0, 0, 0))
+
+    with pytest.raises(ValueError):
+        imu._quat_to_ypr_batch([(1, 0, 0, 0), (0, 0, 0, 0)])
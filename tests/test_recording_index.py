@@ -0,0 +1,129 @@
+import os
+
+import numpy as np
+import pytest
+
+from imu.DataWriter import DataWriter
+from imu.IMUBatch import IMU_DTYPE, IMUBatch
+from imu.RecordingIndex import IndexWriter, index_fname, query, read_index, read_range
+from imu.RecordingSink import RecordingOptions
+from imu.RotatingFile import RotationOptions, read_manifest
+
+from .test_counter import DummyClient
+
+T0 = 1_700_000_000_000
+
+
+def records(n: int) -> np.ndarray:
+    out = np.zeros(n, dtype=IMU_DTYPE)
+    out["counter"] = np.arange(n)
+    out["capture_time_ms"] = T0 + np.arange(n) * 10
+    out["accel_x"] = np.arange(n) / 8
+    out["yaw"] = np.nan
+    return out
+
+
+def record(tmp_path, monkeypatch, n=5000, recording_format="csv", rotation=None) -> str:
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+    fname = str(tmp_path / "rec.csv")
+    data = records(n)
+    recording = RecordingOptions(recording_format, index_every=100, rotation=rotation)
+    with DataWriter(csv_fname=fname, recording=recording) as writer:
+        for start in range(0, n, 70):
+            writer.write_batch(IMUBatch.from_array(data[start : start + 70]))
+    return writer.csv_fname
+
+
+@pytest.mark.parametrize("recording_format", ["csv", "binary"])
+def test_query_time_range(tmp_path, monkeypatch, recording_format):
+    fname = record(tmp_path, monkeypatch, recording_format=recording_format)
+
+    every, entries = read_index(index_fname(fname))
+    assert every == 100
+    assert list(entries["row"]) == list(range(0, 5000, 100))
+    assert list(entries["counter"]) == list(range(0, 5000, 100))
+
+    out, device_id = read_range(fname, from_ms=T0 + 12_345, to_ms=T0 + 20_000)
+    assert device_id == 0
+    assert out["counter"][0] == 1235 and out["counter"][-1] == 2000
+    assert np.array_equal(out["accel_x"], out["counter"] / 8)
+    assert np.isnan(out["yaw"]).all()
+
+    out = query(fname, from_counter=4990)
+    assert list(out["counter"]) == list(range(4990, 5000))
+
+
+def test_index_offsets_point_at_rows(tmp_path, monkeypatch):
+    fname = record(tmp_path, monkeypatch, n=1000)
+    _, entries = read_index(index_fname(fname))
+
+    with open(fname, "rb") as f:
+        for entry in entries:
+            f.seek(entry["offset"])
+            assert f.readline().split(b",")[0] == str(entry["counter"]).encode()
+
+
+def test_query_reads_only_the_range(tmp_path, monkeypatch):
+    fname = record(tmp_path, monkeypatch, n=20_000)
+    reads = []
+    real_open = open
+
+    class CountingFile:
+        def __init__(self, f):
+            self.f = f
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.f.close()
+
+        def read(self, n=-1):
+            data = self.f.read(n)
+            reads.append(len(data))
+            return data
+
+        def __getattr__(self, name):
+            return getattr(self.f, name)
+
+    monkeypatch.setattr(
+        "imu.RotatingFile.open", lambda *a, **kw: CountingFile(real_open(*a, **kw)), raising=False
+    )
+    out = query(fname, from_ms=T0 + 100_000, to_ms=T0 + 101_000)
+
+    assert len(out) == 101
+    assert sum(reads) < os.path.getsize(fname) / 20
+
+
+def test_query_without_index_scans(tmp_path, monkeypatch):
+    fname = record(tmp_path, monkeypatch, n=300)
+    os.remove(index_fname(fname))
+
+    assert list(query(fname, from_counter=10, to_counter=12)["counter"]) == [10, 11, 12]
+
+
+def test_compressed_segments_keep_their_index(tmp_path, monkeypatch):
+    rotation = RotationOptions(max_bytes=100_000, compression="gzip")
+    record(tmp_path, monkeypatch, n=3000, rotation=rotation)
+
+    segments = read_manifest(str(tmp_path / "rec.manifest.jsonl"))
+    assert len(segments) > 1
+    second = segments[1]
+    path = str(tmp_path / second["file"])
+    assert os.path.exists(index_fname(path))
+
+    middle = (second["first_counter"] + second["last_counter"]) // 2
+    out = query(path, from_counter=middle, to_counter=middle + 5)
+    assert list(out["counter"]) == list(range(middle, middle + 6))
+
+
+def test_index_writer_every_row_across_calls(tmp_path):
+    writer = IndexWriter(str(tmp_path / "x.idx"), header_bytes=4, every=3)
+    writer.add_rows(["0,10,a", "1,11,bb"])
+    writer.add_rows(["2,12,c", "3,13,dd", "4,14,e"])
+    writer.close()
+
+    _, entries = read_index(str(tmp_path / "x.idx"))
+    assert list(entries["row"]) == [0, 3]
+    assert list(entries["offset"]) == [4, 4 + 7 + 8 + 7]
+    assert list(entries["capture_time_ms"]) == [10, 13]
@@ -0,0 +1,122 @@
+import numpy as np
+
+from imu.BaseIMU import BaseIMU
+from imu.IMUBatch import IMUBatch
+from imu.ReportFIFO import BASE_TIMESTAMP, TIMESTAMP_REBASE, ReportFIFO, report_delay_us
+
+ACCEL, GYRO, MAG, ROTATION = 0x04, 0x02, 0x03, 0x05
+
+
+class StubIMU(BaseIMU):
+    def read_data(self):
+        raise NotImplementedError
+
+
+def sensor_report(report_id: int, delay_ticks: int) -> bytearray:
+    return bytearray([report_id, 0, (delay_ticks >> 8) << 2, delay_ticks & 0xFF, 0, 0])
+
+
+def test_report_delay():
+    assert report_delay_us(sensor_report(ACCEL, 0)) == 0
+    assert report_delay_us(sensor_report(ACCEL, 25)) == 2500
+    assert report_delay_us(sensor_report(ACCEL, 0x3FFF)) == 0x3FFF * 100
+
+
+def test_timestamps_follow_base_and_rebase():
+    fifo = ReportFIFO(ACCEL, GYRO, MAG, ROTATION)
+    fifo.begin_packet(1_000_000_000)
+
+    # The base timestamp is 5 ms before the packet was read
+    assert fifo.timestamp(BASE_TIMESTAMP, bytearray([BASE_TIMESTAMP, 50, 0, 0, 0])) is None
+    assert fifo.timestamp(ROTATION, sensor_report(ROTATION, 10)) == 996_000_000
+
+    rebase = (-20).to_bytes(4, "little", signed=True)
+    assert fifo.timestamp(TIMESTAMP_REBASE, bytearray([TIMESTAMP_REBASE]) + rebase) is None
+    assert fifo.timestamp(ROTATION, sensor_report(ROTATION, 10)) == 994_000_000
+
+
+def test_assemble_keeps_every_rotation_report():
+    imu = StubIMU()
+    fifo = ReportFIFO(ACCEL, GYRO, MAG, ROTATION)
+    identity = (1.0, 0.0, 0.0, 0.0)
+
+    for i in range(5):
+        t = i * 2_000_000
+        fifo.record(ACCEL, t, (i, i, i))
+        fifo.record(ROTATION, t + 1, identity)
+    fifo.record(GYRO, 3_000_000, (7.0, 8.0, 9.0))
+
+    batch = IMUBatch(2)
+    assert fifo.assemble(batch, imu._quat_to_ypr_batch, imu._next_counters, 0) == 5
+
+    assert batch.size == 5
+    assert list(batch.column("counter")) == [0, 1, 2, 3, 4]
+    assert list(batch.column("accel_x")) == [0, 1, 2, 3, 4]
+    # Gyro holds its report from t=3ms on, and is unknown before
+    gyro_x = batch.column("gyro_x")
+    assert np.isnan(gyro_x[:2]).all() and list(gyro_x[2:]) == [7.0, 7.0, 7.0]
+    assert np.isnan(batch.column("mag_x")).all()
+    assert (batch.column("yaw") == 0).all()
+
+    # The next wakeup holds the last values it saw
+    fifo.record(ROTATION, 20_000_000, identity)
+    batch.clear()
+    fifo.assemble(batch, imu._quat_to_ypr_batch, imu._next_counters, 0)
+    assert batch.size == 1
+    assert batch[0].counter == 5
+    assert (batch[0].accel_x, batch[0].gyro_x) == (4, 7.0)
+
+
+def test_assemble_without_rotation_reports():
+    imu = StubIMU()
+    fifo = ReportFIFO(ACCEL, GYRO, MAG, ROTATION)
+    fifo.record(ACCEL, 0, (1.0, 2.0, 3.0))
+
+    batch = IMUBatch()
+    assert fifo.assemble(batch, imu._quat_to_ypr_batch, imu._next_counters, 0) == 0
+    assert batch.size == 0
+    assert fifo.pending(ACCEL) == 0
+
+
+def test_assemble_on_fixed_grid():
+    imu = StubIMU()
+    fifo = ReportFIFO(ACCEL, GYRO, MAG, ROTATION, method="linear", interval_ms=5)
+    identity = (1.0, 0.0, 0.0, 0.0)
+
+    # Accel at 400 Hz, the others at 100 Hz
+    for t in range(0, 25_000_000, 2_500_000):
+        fifo.record(ACCEL, t, (t / 1e6, 0.0, 0.0))
+    for t in range(0, 30_000_000, 10_000_000):
+        for report_id in (GYRO, MAG, ROTATION):
+            fifo.record(report_id, t, identity if report_id == ROTATION else (t / 1e6, 0.0, 0.0))
+
+    batch = IMUBatch()
+    assert fifo.assemble(batch, imu._quat_to_ypr_batch, imu._next_counters, 0) == 5
+    assert list(batch.column("capture_time_ms")) == [0, 5, 10, 15, 20]
+    assert np.allclose(batch.column("accel_x"), [0, 5, 10, 15, 20])
+    assert np.allclose(batch.column("gyro_x"), [0, 5, 10, 15, 20])
+
+
+def test_negative_base_timestamp_delta():
+    fifo = ReportFIFO(ACCEL, GYRO, MAG, ROTATION)
+    fifo.begin_packet(1_000_000_000)
+
+    base = (-50).to_bytes(4, "little", signed=True)
+    assert fifo.timestamp(BASE_TIMESTAMP, bytearray([BASE_TIMESTAMP]) + base) is None
+    assert fifo.timestamp(ROTATION, sensor_report(ROTATION, 0)) == 1_005_000_000
+
+
+def test_pending_reports_are_capped():
+    # Reports recorded while nothing assembles them, e.g. read_data in the UI
+    fifo = ReportFIFO(ACCEL, GYRO, MAG, ROTATION, max_pending=3)
+    for i in range(10):
+        fifo.record(ROTATION, i, (1.0, 0.0, 0.0, 0.0))
+
+    assert fifo.pending(ROTATION) == 3
+    assert fifo.reports_recorded == 10
+    assert fifo.reports_dropped == 7
+
+    imu = StubIMU()
+    batch = IMUBatch(4)
+    assert fifo.assemble(batch, imu._quat_to_ypr_batch, imu._next_counters, 0) == 3
+    assert fifo.pending(ROTATION) == 0
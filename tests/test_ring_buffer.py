@@ -0,0 +1,100 @@
+import time
+from threading import Event, Thread, Timer
+
+import pytest
+
+from imu.DataWriter import DataWriter
+from imu.FakeIMU import FakeIMU
+from imu.readings import buffered_reading
+from imu.RecordingSink import RecordingOptions
+from imu.RingBuffer import RingBuffer
+
+from .test_counter import DummyClient
+
+
+def test_ring_buffer_is_fifo():
+    buffer = RingBuffer(capacity=4)
+    for i in range(3):
+        assert buffer.put(i)
+
+    assert buffer.get_many(10) == [0, 1, 2]
+    assert len(buffer) == 0
+
+
+def test_ring_buffer_drop_oldest_overwrites_and_counts():
+    buffer = RingBuffer(capacity=3, overflow=RingBuffer.DROP_OLDEST)
+    for i in range(5):
+        assert buffer.put(i)
+
+    assert buffer.get_many(10) == [2, 3, 4]
+    assert buffer.dropped_oldest == 2
+    assert buffer.dropped == 2
+
+
+def test_ring_buffer_drop_newest_rejects_and_counts():
+    buffer = RingBuffer(capacity=3, overflow=RingBuffer.DROP_NEWEST)
+    results = [buffer.put(i) for i in range(5)]
+
+    assert results == [True, True, True, False, False]
+    assert buffer.get_many(10) == [0, 1, 2]
+    assert buffer.dropped_newest == 2
+
+
+def test_ring_buffer_block_waits_for_consumer():
+    buffer = RingBuffer(capacity=2, overflow=RingBuffer.BLOCK)
+    buffer.put(0)
+    buffer.put(1)
+
+    assert not buffer.put(2, timeout=0.01)
+
+    producer = Thread(target=buffer.put, args=(3,))
+    producer.start()
+    assert buffer.get() == 0
+    producer.join(timeout=1)
+
+    assert not producer.is_alive()
+    assert buffer.get_many(10) == [1, 3]
+    assert buffer.dropped_newest == 1
+
+
+def test_ring_buffer_close_drains_then_returns_empty():
+    buffer = RingBuffer(capacity=4)
+    buffer.put("a")
+    buffer.close()
+
+    assert not buffer.put("b")
+    assert buffer.get() == "a"
+    assert buffer.get() is None
+    assert buffer.get_many(4) == []
+
+
+def test_ring_buffer_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        RingBuffer(overflow="drop-everything")
+
+
+def test_buffered_reading_writes_in_order_with_several_writers(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+
+    class SlowWriter(DataWriter):
+        def write_data(self, data):
+            # Give the other writer threads every chance to overtake
+            time.sleep(0.015)
+            super().write_data(data)
+
+    monkeypatch.setattr("imu.readings.DataWriter", SlowWriter)
+    stop = Event()
+    Timer(0.5, stop.set).start()
+    buffered_reading(
+        FakeIMU(),
+        writer_threads=4,
+        pacing="sleep",
+        stop=stop,
+        csv_fname=str(tmp_path / "out.csv"),
+        recording=RecordingOptions(flush_rows=1),
+    )
+
+    lines = (tmp_path / "out.csv").read_text().splitlines()[1:]
+    counters = [int(line.split(",")[0]) for line in lines]
+    assert len(counters) >= 10
+    assert counters == list(range(len(counters)))
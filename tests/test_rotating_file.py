@@ -0,0 +1,151 @@
+import gzip
+import os
+
+import numpy as np
+import pytest
+
+from imu.BinaryRecorder import read_recording
+from imu.DataWriter import DataWriter
+from imu.IMUBatch import CSV_HEADER, IMU_DTYPE, IMUBatch
+from imu.RecordingSink import RecordingOptions
+from imu.RotatingFile import RotatingFile, RotationOptions, open_segment, read_manifest
+
+from .test_counter import DummyClient
+
+
+def records(n: int, start: int = 0) -> np.ndarray:
+    out = np.zeros(n, dtype=IMU_DTYPE)
+    out["counter"] = np.arange(start, start + n)
+    out["capture_time_ms"] = 1_700_000_000_000 + out["counter"] * 10
+    return out
+
+
+def write_rows(f: RotatingFile, first: int, n: int):
+    f.write("".join(f"{i},x\n" for i in range(first, first + n)))
+    f.observe(n, first, first + n - 1, first * 10, (first + n - 1) * 10)
+
+
+def test_rotates_by_size_and_lists_segments(tmp_path):
+    f = RotatingFile(str(tmp_path / "rec.csv"), "h\n", max_bytes=30).open()
+    for first in range(0, 40, 5):
+        write_rows(f, first, 5)
+        f.rotate_if_due()
+    f.close()
+
+    segments = read_manifest(str(tmp_path / "rec.manifest.jsonl"))
+    assert [s["file"] for s in segments] == [f"rec-{i:04d}.csv" for i in range(len(segments))]
+    assert segments[0]["first_counter"] == 0
+    assert segments[-1]["last_counter"] == 39
+    assert sum(s["rows"] for s in segments) == 40
+    for s, after in zip(segments, segments[1:]):
+        assert after["first_counter"] == s["last_counter"] + 1
+
+    content = b""
+    for s in segments:
+        data = (tmp_path / s["file"]).read_bytes()
+        assert data.startswith(b"h\n")
+        content += data[2:]
+    assert content.decode().splitlines() == [f"{i},x" for i in range(40)]
+
+
+def test_compresses_and_enforces_retention(tmp_path):
+    f = RotatingFile(
+        str(tmp_path / "rec.csv"),
+        "h\n",
+        max_bytes=1,
+        compression="gzip",
+        retention_bytes=200,
+    ).open()
+    for first in range(0, 200, 20):
+        write_rows(f, first, 20)
+        f.rotate_if_due()
+    f.close()
+
+    segments = read_manifest(str(tmp_path / "rec.manifest.jsonl"))
+    on_disk = sorted(os.listdir(tmp_path))
+    assert on_disk == sorted([s["file"] for s in segments] + ["rec.manifest.jsonl"])
+    assert sum(s["stored_bytes"] for s in segments) <= 200
+    assert f.stats()["deleted"] == 10 - len(segments)
+    # The newest segments survive
+    assert segments[-1]["last_counter"] == 199
+
+    with open_segment(str(tmp_path / segments[-1]["file"])) as seg:
+        assert seg.read().decode().splitlines()[1] == "180,x"
+
+
+def test_unknown_compression():
+    with pytest.raises(ValueError):
+        RotatingFile("rec.csv", compression="rar")
+    with pytest.raises(ValueError):
+        RotationOptions(compression="rar")
+
+
+def test_data_writer_rotates_csv(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+
+    with DataWriter(
+        csv_fname=str(tmp_path / "rec.csv"),
+        recording=RecordingOptions(
+            flush_rows=100, rotation=RotationOptions(max_bytes=1, compression="gzip")
+        ),
+    ) as writer:
+        data = records(1000)
+        for start in range(0, 1000, 50):
+            writer.write_batch(IMUBatch.from_array(data[start : start + 50]))
+
+    segments = read_manifest(str(tmp_path / "rec.manifest.jsonl"))
+    # One segment per flush of 100 rows
+    assert len(segments) == 10
+    assert [(s["first_counter"], s["last_counter"]) for s in segments] == [
+        (i, i + 99) for i in range(0, 1000, 100)
+    ]
+    with gzip.open(tmp_path / segments[3]["file"], "rt") as seg:
+        lines = seg.read().splitlines()
+    assert lines[0] + "\n" == CSV_HEADER
+    assert lines[1].startswith("300,")
+
+
+def test_data_writer_rotates_binary(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+
+    with DataWriter(
+        csv_fname=str(tmp_path / "rec.csv"),
+        recording=RecordingOptions(
+            "binary", flush_rows=100, rotation=RotationOptions(max_bytes=1)
+        ),
+    ) as writer:
+        data = records(300)
+        for start in range(0, 300, 100):
+            writer.write_batch(IMUBatch.from_array(data[start : start + 100]))
+
+    segments = read_manifest(str(tmp_path / "rec.manifest.jsonl"))
+    assert [s["file"] for s in segments] == ["rec-0000.imu", "rec-0001.imu", "rec-0002.imu"]
+    _, recording = read_recording(str(tmp_path / "rec-0001.imu"))
+    assert list(recording["counter"]) == list(range(100, 200))
+
+
+def test_retention_deletes_segment_indexes(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+
+    with DataWriter(
+        csv_fname=str(tmp_path / "rec.csv"),
+        recording=RecordingOptions(
+            flush_rows=100,
+            rotation=RotationOptions(max_bytes=1, retention_bytes=20_000),
+            index_every=10,
+        ),
+    ) as writer:
+        data = records(1000)
+        for start in range(0, 1000, 100):
+            writer.write_batch(IMUBatch.from_array(data[start : start + 100]))
+
+    segments = read_manifest(str(tmp_path / "rec.manifest.jsonl"))
+    assert 1 < len(segments) < 10
+    on_disk = sorted(os.listdir(tmp_path))
+    kept = [s["file"] for s in segments]
+    assert on_disk == sorted(kept + [f + ".idx" for f in kept] + ["rec.manifest.jsonl"])
+    # Indexes count toward the retention limit
+    assert sum(os.path.getsize(tmp_path / f) for f in on_disk if f.startswith("rec-")) <= 20_000
+    assert writer.rotation.stats()["stored_bytes"] == sum(
+        os.path.getsize(tmp_path / f) for f in on_disk if f.startswith("rec-")
+    )
@@ -0,0 +1,64 @@
+import pytest
+
+from imu.Scheduler import HybridScheduler, SleepScheduler, SpinScheduler, make_scheduler
+
+
+class FakeClock:
+    def __init__(self, now: int = 0):
+        self.now = now
+
+    def __call__(self) -> int:
+        return self.now
+
+
+class FakeSleepScheduler(SleepScheduler):
+    """Advances the fake clock instead of sleeping."""
+
+    def _wait_until(self, deadline_ns: int) -> None:
+        self.clock.now = max(self.clock.now, deadline_ns)
+
+
+def test_scheduler_waits_on_absolute_deadlines_without_drift():
+    clock = FakeClock()
+    scheduler = FakeSleepScheduler(interval_ms=10, clock=clock)
+
+    for i in range(1, 6):
+        # Loop body takes 3 ms, which must not accumulate
+        clock.now += 3_000_000
+        assert scheduler.wait() == 0
+        assert clock.now == i * 10_000_000
+
+    assert scheduler.overruns == 0
+
+
+def test_scheduler_skips_missed_slots_after_overrun():
+    clock = FakeClock()
+    scheduler = FakeSleepScheduler(interval_ms=10, clock=clock)
+
+    clock.now = 35_000_000
+    assert scheduler.wait() == 25_000_000
+    assert scheduler.next_deadline == 40_000_000
+
+    scheduler.wait()
+    assert clock.now == 40_000_000
+
+    stats = scheduler.stats()
+    assert stats["overruns"] == 1
+    assert stats["missed"] == 2
+    assert stats["max_lateness_ms"] == 25.0
+
+
+@pytest.mark.parametrize("scheduler_type", [SpinScheduler, SleepScheduler, HybridScheduler])
+def test_real_schedulers_reach_deadline(scheduler_type):
+    scheduler = scheduler_type(interval_ms=2)
+
+    for _ in range(3):
+        scheduler.wait()
+        assert scheduler.clock() >= scheduler.next_deadline - scheduler.interval_ns
+
+
+def test_make_scheduler_rejects_unknown_mode():
+    assert isinstance(make_scheduler("sleep", 10), SleepScheduler)
+
+    with pytest.raises(ValueError):
+        make_scheduler("nap", 10)
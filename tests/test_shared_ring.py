@@ -0,0 +1,90 @@
+from threading import Event, Timer
+
+import numpy as np
+import pytest
+
+from imu.FakeIMU import FakeIMU
+from imu.IMUBatch import IMU_DTYPE
+from imu.Metrics import METRICS
+from imu.readings import process_reading
+from imu.SharedRing import SharedRing
+
+
+def make_records(start: int, n: int) -> np.ndarray:
+    records = np.zeros(n, dtype=IMU_DTYPE)
+    records["counter"] = np.arange(start, start + n)
+    records["yaw"] = records["counter"] / 2
+    return records
+
+
+@pytest.fixture
+def ring():
+    ring = SharedRing(8)
+    yield ring
+    ring.release()
+
+
+def test_round_trip_across_attachments(ring):
+    consumer = SharedRing(8, name=ring.name, create=False)
+    try:
+        assert ring.put_many(make_records(0, 5)) == 5
+        out = consumer.get_many(3)
+        assert list(out["counter"]) == [0, 1, 2]
+
+        # Wraps around the end of the ring
+        assert ring.put_many(make_records(5, 6)) == 6
+        out = consumer.get_many()
+        assert list(out["counter"]) == list(range(3, 11))
+        assert np.array_equal(out["yaw"], out["counter"] / 2)
+    finally:
+        consumer.release()
+
+
+def test_full_ring_drops_and_counts(ring):
+    assert ring.put_many(make_records(0, 6)) == 6
+    assert ring.put_many(make_records(6, 6)) == 2
+    assert ring.dropped == 4
+    assert list(ring.get_many()["counter"]) == list(range(8))
+
+
+def test_closed_ring_drains_then_ends(ring):
+    ring.put_many(make_records(0, 2))
+    ring.close()
+
+    assert len(ring.get_many()) == 2
+    assert len(ring.get_many()) == 0
+    assert len(ring.get_many(timeout=None)) == 0
+
+
+def test_get_many_times_out(ring):
+    assert len(ring.get_many(timeout=0.01)) == 0
+
+
+def test_process_reading_writes_from_worker_processes(monkeypatch, tmp_path):
+    # Worker processes are spawned, so they can't see a monkeypatched client;
+    # they run without a reachable broker, which DataWriter tolerates.
+    monkeypatch.delenv("DEVICE_ID", raising=False)
+    METRICS.reset()
+    stop = Event()
+    Timer(0.3, stop.set).start()
+    process_reading(
+        FakeIMU(),
+        workers=2,
+        block=4,
+        interval_ms=2,
+        pacing="sleep",
+        stop=stop,
+        csv_fname=str(tmp_path / "run.csv"),
+        mqtt_broker_ip="127.0.0.1",
+        mqtt_broker_port=1,
+    )
+
+    counters = []
+    for i in range(2):
+        lines = (tmp_path / f"run-w{i}.csv").read_text().splitlines()[1:]
+        counters += [int(line.split(",")[0]) for line in lines]
+
+    assert len(counters) >= 8
+    assert sorted(counters) == list(range(len(counters)))
+    # Each worker only sees every other block, gaps are counted on the whole stream
+    assert METRICS.snapshot()['sample_gaps_total{device="0"}'] == 0
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from imu.DataWriter import DataWriter
+from imu.encoding import SPECTRUM_PREFIX, decode_payload, decode_spectrum, encode_spectrum
+from imu.IMUBatch import IMU_DTYPE, IMUBatch
+from imu.MQTTPublisher import MQTTOptions
+from imu.SpectrumAnalyzer import SpectrumAnalyzer, SpectrumOptions, parse_bands
+
+from .test_counter import DummyClient
+
+RATE_HZ = 200
+
+
+def vibration(n: int) -> np.ndarray:
+    records = np.zeros(n, dtype=IMU_DTYPE)
+    t = np.arange(n) / RATE_HZ
+    records["counter"] = np.arange(n)
+    records["capture_time_ms"] = 1_700_000_000_000 + np.arange(n) * 5
+    records["accel_x"] = 2 * np.sin(2 * np.pi * 30 * t) + 0.5 * np.sin(2 * np.pi * 70 * t)
+    records["accel_z"] = 9.81
+    return records
+
+
+def make_analyzer() -> SpectrumAnalyzer:
+    return SpectrumAnalyzer(
+        RATE_HZ, segment=256, every_s=1.0, bands=((0, 20), (20, 40), (40, 100))
+    )
+
+
+def test_band_energy_and_peaks():
+    summaries = make_analyzer().push(vibration(2000))
+
+    # The first summary waits for 640 samples of history, then one per second
+    assert len(summaries) == 7
+    summary = summaries[-1]
+    assert summary.capture_time_ms == 1_700_000_000_000 + 1999 * 5
+
+    # A sine of amplitude A carries A^2 / 2
+    assert np.allclose(summary.band_energy[0], [0, 2.0, 0.125], atol=0.01)
+    assert np.isclose(summary.rms[0], np.sqrt(2.125), rtol=0.01)
+    assert abs(summary.peak_hz[0, 0] - 30) < 1
+    assert abs(summary.peak_hz[0, 1] - 70) < 1
+    # Gravity is removed with the mean
+    assert np.allclose(summary.band_energy[2], 0)
+
+
+def test_block_size_does_not_matter():
+    records = vibration(1500)
+    whole = make_analyzer().push(records)
+
+    analyzer = make_analyzer()
+    blocks = []
+    for start in range(0, len(records), 37):
+        blocks += analyzer.push(records[start : start + 37])
+
+    assert len(blocks) == len(whole)
+    for a, b in zip(whole, blocks):
+        assert np.allclose(a.band_energy, b.band_energy)
+        assert a.capture_time_ms == b.capture_time_ms
+
+
+def test_payload_round_trip():
+    summary = make_analyzer().push(vibration(1000))[-1]
+    payload = encode_spectrum(summary, 83)
+
+    assert payload.startswith(f"{SPECTRUM_PREFIX},1,83,")
+    assert len(payload) < 400
+    device_id, decoded = decode_spectrum(payload)
+    assert device_id == 83
+    assert decoded.fields == summary.fields
+    assert decoded.bands == summary.bands
+    assert np.allclose(decoded.band_energy, summary.band_energy, rtol=1e-5)
+    # Missing peaks aren't sent
+    n_peaks = decoded.peak_hz.shape[1]
+    assert np.isnan(summary.peak_hz[:, n_peaks:]).all()
+    assert np.allclose(decoded.peak_hz, summary.peak_hz[:, :n_peaks], equal_nan=True)
+
+    with pytest.raises(ValueError):
+        decode_payload(payload)
+
+
+def test_parse_bands():
+    assert parse_bands("0-5, 5-15,15-50") == ((0, 5), (5, 15), (15, 50))
+    for spec in ("5", "10-5", "a-b"):
+        with pytest.raises(ValueError):
+            parse_bands(spec)
+
+
+def test_data_writer_publishes_only_spectra(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+    output_csv = tmp_path / "spectrum.csv"
+
+    with DataWriter(
+        csv_fname=str(output_csv),
+        sample_rate_hz=RATE_HZ,
+        spectrum=SpectrumOptions(every_s=0.5),
+        mqtt=MQTTOptions(raw=False),
+    ) as writer:
+        records = vibration(1000)
+        writer.write_batch(IMUBatch.from_array(records[:500]))
+        for i in range(500, 1000):
+            writer.write_data(IMUBatch.from_array(records[i : i + 1])[0])
+
+    assert writer.mqtt_client.messages == []
+    messages = writer.mqtt_client.subtopic("spectrum")
+    # Every 100 samples once 640 samples of history are there
+    assert len(messages) == 4
+    assert all(message.startswith(SPECTRUM_PREFIX) for message in messages)
+    assert len(output_csv.read_text().splitlines()) == 1001
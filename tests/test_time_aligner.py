@@ -0,0 +1,156 @@
+import numpy as np
+import pytest
+
+from imu.TimeAligner import (
+    TimeAligner,
+    resample_hold,
+    resample_linear,
+    resample_nearest,
+    slerp,
+)
+
+TIMES = np.array([0, 10, 20], dtype=np.int64)
+VALUES = np.array([[0.0], [10.0], [30.0]])
+GRID = np.array([-5, 0, 4, 6, 15, 25], dtype=np.int64)
+
+
+def test_resample_methods():
+    assert np.array_equal(
+        resample_hold(TIMES, VALUES, GRID)[:, 0], [np.nan, 0, 0, 0, 10, 30], equal_nan=True
+    )
+    assert np.array_equal(
+        resample_nearest(TIMES, VALUES, GRID)[:, 0],
+        [np.nan, 0, 0, 10, 10, 30],
+        equal_nan=True,
+    )
+    assert np.allclose(
+        resample_linear(TIMES, VALUES, GRID)[:, 0],
+        [np.nan, 0, 4, 6, 20, 30],
+        equal_nan=True,
+    )
+
+
+def test_slerp_takes_the_short_way():
+    half = np.sqrt(0.5)
+    # 0 and 90 degrees around z, the second one as its negative
+    quats = np.array([[1.0, 0, 0, 0], [-half, 0, 0, -half]])
+    out = slerp(np.array([0, 10]), quats, np.array([5]))
+
+    angle = np.radians(22.5)
+    assert np.allclose(out[0], [np.cos(angle), 0, 0, np.sin(angle)])
+    assert np.isclose(np.linalg.norm(out[0]), 1)
+
+
+def test_fixed_grid_waits_for_every_channel():
+    aligner = TimeAligner({"fast": 1, "slow": 1}, interval_ms=1e-6 * 10)
+    aligner.push("fast", np.arange(0, 100, 5), np.arange(0, 100, 5))
+    aligner.push("slow", [3, 43], [[0.0], [40.0]])
+
+    times, aligned = aligner.align()
+
+    # Rows start once both channels reported and stop at the slowest one
+    assert list(times) == [10, 20, 30, 40]
+    assert np.allclose(aligned["fast"][:, 0], times)
+    assert np.allclose(aligned["slow"][:, 0], times - 3)
+
+    aligner.push("slow", [83], [[80.0]])
+    times, aligned = aligner.align()
+    assert list(times) == [50, 60, 70, 80]
+    assert np.allclose(aligned["slow"][:, 0], times - 3)
+
+    times, _ = aligner.align(flush=True)
+    assert list(times) == [90]
+
+
+def test_reference_timeline():
+    aligner = TimeAligner({"rot": 4, "acc": 1}, reference="rot", method="linear", quaternions=("rot",))
+    aligner.push("rot", [10, 20, 30], [[1.0, 0, 0, 0]] * 3)
+    aligner.push("acc", [0, 25], [[0.0], [25.0]])
+
+    times, aligned = aligner.align()
+    assert list(times) == [10, 20]
+    assert np.allclose(aligned["acc"][:, 0], [10, 20])
+    assert np.allclose(aligned["rot"], [[1, 0, 0, 0]] * 2)
+
+    aligner.push("acc", [40], [[40.0]])
+    times, aligned = aligner.align()
+    assert list(times) == [30]
+    assert np.allclose(aligned["acc"][:, 0], [30])
+
+
+MS = 1_000_000
+
+
+def test_rows_stop_waiting_for_a_silent_channel():
+    aligner = TimeAligner(
+        {"rot": 4, "acc": 1, "mag": 1}, reference="rot", method="nearest", timeout_ms=100
+    )
+    # mag never reports, acc stops after 50 ms
+    aligner.push("rot", np.arange(0, 300, 10) * MS, [[1.0, 0, 0, 0]] * 30)
+    aligner.push("acc", np.arange(0, 60, 10) * MS, np.arange(0, 60, 10)[:, None])
+
+    times, aligned = aligner.align()
+    assert list(times) == list(np.arange(0, 300, 10) * MS)
+    assert np.isnan(aligned["mag"]).all()
+    acc = aligned["acc"][:, 0]
+    # Held until the timeout, unknown after it
+    assert list(acc[:16]) == [0, 10, 20, 30, 40] + [50] * 11
+    assert np.isnan(acc[16:]).all()
+    # Nothing older than the last row stays buffered
+    assert aligner.pending("rot") == 1
+
+    aligner.push("rot", [300 * MS], [[1.0, 0, 0, 0]])
+    times, _ = aligner.align()
+    assert list(times) == [300 * MS]
+
+
+def test_rows_wait_for_a_late_first_report_within_the_timeout():
+    aligner = TimeAligner(
+        {"rot": 4, "acc": 1}, reference="rot", method="linear", timeout_ms=1000
+    )
+    aligner.push("rot", [0, 10 * MS, 20 * MS], [[1.0, 0, 0, 0]] * 3)
+    assert not len(aligner.align()[0])
+
+    # acc starts reporting late, but well within the timeout
+    aligner.push("acc", [5 * MS, 25 * MS], [[5.0], [25.0]])
+    times, aligned = aligner.align()
+    assert list(times) == [0, 10 * MS, 20 * MS]
+    assert np.isnan(aligned["acc"][0, 0])
+    assert np.allclose(aligned["acc"][1:, 0], [10, 20])
+
+
+def test_fixed_grid_starts_without_a_silent_channel():
+    aligner = TimeAligner({"a": 1, "b": 1}, interval_ms=10, timeout_ms=50)
+    aligner.push("a", np.arange(0, 100, 10) * MS, np.arange(10)[:, None])
+
+    times, aligned = aligner.align()
+    assert list(times) == list(np.arange(0, 100, 10) * MS)
+    assert np.isnan(aligned["b"]).all()
+
+    waiting = TimeAligner({"a": 1, "b": 1}, interval_ms=10, timeout_ms=None)
+    waiting.push("a", np.arange(0, 100, 10) * MS, np.arange(10)[:, None])
+    assert not len(waiting.align()[0])
+    assert waiting.pending("a") == 10
+
+
+def test_out_of_order_reports_are_sorted():
+    aligner = TimeAligner({"a": 1}, interval_ms=1e-6 * 10)
+    aligner.push("a", [20, 0], [[20.0], [0.0]])
+    aligner.push("a", [10], [[10.0]])
+
+    times, aligned = aligner.align()
+    assert list(times) == [0, 10, 20]
+    assert np.allclose(aligned["a"][:, 0], [0, 10, 20])
+
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError):
+        TimeAligner({"a": 1})
+    with pytest.raises(ValueError):
+        TimeAligner({"a": 1}, interval_ms=10, reference="a")
+    with pytest.raises(ValueError):
+        TimeAligner({"a": 1}, reference="b")
+    with pytest.raises(ValueError):
+        TimeAligner({"a": 1}, interval_ms=10, method="cubic")
+    with pytest.raises(ValueError):
+        TimeAligner({"a": 1}, interval_ms=10, timeout_ms=0)
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from imu.DataWriter import DataWriter
+from imu.IMUBatch import IMU_DTYPE, IMUBatch
+from imu.TriggerCapture import TriggerCapture, TriggerOptions
+
+from .test_counter import DummyClient
+
+
+def quiet(n: int) -> np.ndarray:
+    """n idle samples at 100 Hz with spikes to be placed by the tests"""
+    records = np.zeros(n, dtype=IMU_DTYPE)
+    records["counter"] = np.arange(n)
+    records["capture_time_ms"] = 1_700_000_000_000 + np.arange(n) * 10
+    return records
+
+
+def run(capture: TriggerCapture, records: np.ndarray, block: int) -> np.ndarray:
+    out = [capture.process(records[i : i + block]) for i in range(0, len(records), block)]
+    return np.concatenate(out)
+
+
+def test_pre_and_post_window():
+    records = quiet(100)
+    records["accel_x"][50] = 5.0
+    capture = TriggerCapture(accel_threshold=2.0, pre_samples=5, post_samples=10, heartbeat_ms=None)
+
+    out = run(capture, records, 100)
+
+    assert list(out["counter"]) == list(range(45, 61))
+    assert capture.stats()["events"] == 1
+    assert capture.stats()["captured"] == 16
+
+
+def test_retrigger_extends_capture():
+    records = quiet(200)
+    records["gyro_z"][[50, 58]] = -3.0
+    records["accel_y"][150] = 5.0
+    capture = TriggerCapture(
+        accel_threshold=2.0, gyro_threshold=1.0, pre_samples=5, post_samples=10, heartbeat_ms=None
+    )
+
+    out = run(capture, records, 200)
+
+    assert list(out["counter"]) == list(range(45, 69)) + list(range(145, 161))
+    stats = capture.stats()
+    assert (stats["events"], stats["triggers"]) == (2, 3)
+
+
+@pytest.mark.parametrize("block", [1, 3, 7, 64])
+def test_block_size_does_not_matter(block):
+    records = quiet(500)
+    records["accel_z"][[2, 120, 128, 300, 499]] = 9.0
+    records["yaw"][400] = 30.0
+
+    def make():
+        return TriggerCapture(
+            accel_threshold=5.0, orientation_deg=20.0, pre_samples=8, post_samples=12, heartbeat_ms=500
+        )
+
+    whole = make()
+    expected = whole.process(records)
+    blocks = make()
+    out = run(blocks, records, block)
+
+    assert list(out["counter"]) == list(expected["counter"])
+    assert blocks.stats() == whole.stats()
+    assert len(np.unique(out["counter"])) == len(out)
+
+
+def test_heartbeats_while_idle():
+    records = quiet(1000)
+    capture = TriggerCapture(gyro_threshold=1.0, pre_samples=10, post_samples=10, heartbeat_ms=2000)
+
+    out = run(capture, records, 50)
+    capture.flush()
+
+    # One sample every 2 s, the newest 10 are held until they can't be used
+    assert list(out["counter"]) == [0, 200, 400, 600, 800]
+    stats = capture.stats()
+    assert stats["heartbeats"] == 5
+    assert stats["suppressed"] == 995
+    assert stats["captured"] + stats["suppressed"] + stats["heartbeats"] == 1000
+
+
+def test_needs_a_condition():
+    with pytest.raises(ValueError):
+        TriggerCapture()
+
+
+def test_data_writer_records_only_events(monkeypatch, tmp_path):
+    monkeypatch.setattr("imu.DataWriter.Client", DummyClient)
+    output_csv = tmp_path / "trigger.csv"
+    records = quiet(1000)
+    records["accel_x"][500] = 8.0
+
+    with DataWriter(
+        csv_fname=str(output_csv),
+        sample_rate_hz=100,
+        trigger=TriggerOptions(accel=3.0, pre_s=0.1, post_s=0.2, heartbeat_s=None),
+    ) as writer:
+        writer.write_batch(IMUBatch.from_array(records[:600]))
+        for i in range(600, 1000):
+            writer.write_data(IMUBatch.from_array(records[i : i + 1])[0])
+
+    # Header and samples 490 to 520
+    assert len(output_csv.read_text().splitlines()) == 32
+    assert len(writer.mqtt_client.messages) == 31